@@ -0,0 +1,337 @@
+"""Batch manifests: many merged outputs that share inputs, described in one JSON file.
+
+    {
+        "defaults": {"dedup": true, "profile": "balanced"},
+        "outputs": [
+            {"output": "out/acme.pdf",
+             "inputs": ["cover.docx", "acme.pdf", {"path": "annex.pdf", "pages": "1-3"}]},
+            {"output": "out/globex.pdf", "linearize": true,
+             "inputs": ["cover.docx", "globex.pdf", {"path": "annex.pdf", "pages": "1-3"}]}
+        ]
+    }
+
+Relative paths are relative to the manifest. Every distinct DOCX input is
+converted once (through the conversion cache) and every output merge
+process keeps the PDFs it has parsed open for the next outputs, so shared
+covers and annexes are converted and parsed once instead of per output.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from cancellation import Cancelled, CancelToken
+from converter_logic import convert_many
+from linearize import linearize_in_place
+from merge_checkpoint import temp_output_path
+from output_profiles import PROFILES
+from page_ranges import PageRangeError, parse_page_ranges
+from pdf_input import PdfSource
+from preflight import run_preflight
+from stream_merge import DEFAULT_MEMORY_BUDGET, StreamingPdfWriter
+from tracing import NULL_TRACER
+
+# Merge options an output (or the manifest defaults) may set
+OUTPUT_OPTIONS = {"dedup": False, "profile": None, "linearize": False}
+
+# Parsed PDFs kept open per merge process
+DEFAULT_OPEN_READERS = 32
+
+# inputs is a list of (path, page range spec or None)
+ManifestOutput = namedtuple("ManifestOutput", ["output_path", "inputs", "options"])
+
+# reader_uses counts the inputs of the output, readers_opened how many of them had to be parsed
+OutputResult = namedtuple("OutputResult",
+                          ["output_path", "error", "pages", "reader_uses", "readers_opened",
+                           "started", "seconds", "pid"],
+                          defaults=(0, 0, 0, None, None, None))
+
+_worker_readers = None  # ReaderCache of a merge worker process
+_worker_cancel = None   # CancelToken of a merge worker process
+
+
+class ManifestError(ValueError):
+    """A manifest that cannot be read or does not describe valid outputs"""
+
+
+def load_manifest(path):
+    """Read a manifest file and return its list of ManifestOutput"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"Cannot read manifest {path}: {e}") from None
+    return parse_manifest(data, os.path.dirname(os.path.abspath(path)))
+
+
+def parse_manifest(data, base_dir="."):
+    """Validate manifest data (already decoded from JSON) and return its list of ManifestOutput"""
+    if not isinstance(data, dict) or not isinstance(data.get("outputs"), list) or not data["outputs"]:
+        raise ManifestError("The manifest needs a non-empty \"outputs\" list")
+    defaults = _options(data.get("defaults", {}), OUTPUT_OPTIONS, "defaults")
+    outputs = []
+    seen = set()
+    for number, entry in enumerate(data["outputs"], 1):
+        where = f"output {number}"
+        if not isinstance(entry, dict) or not isinstance(entry.get("output"), str):
+            raise ManifestError(f"{where}: needs an \"output\" path")
+        output_path = os.path.normpath(os.path.join(base_dir, entry["output"]))
+        if output_path in seen:
+            raise ManifestError(f"{where}: {entry['output']} is written by another output too")
+        seen.add(output_path)
+        if not isinstance(entry.get("inputs"), list) or not entry["inputs"]:
+            raise ManifestError(f"{where}: needs a non-empty \"inputs\" list")
+        inputs = [_input(item, base_dir, where) for item in entry["inputs"]]
+        options = {name: value for name, value in entry.items() if name not in ("output", "inputs")}
+        outputs.append(ManifestOutput(output_path, inputs, _options(options, defaults, where)))
+    return outputs
+
+
+def _input(item, base_dir, where):
+    if isinstance(item, str):
+        path, pages = item, None
+    elif isinstance(item, dict) and isinstance(item.get("path"), str):
+        path, pages = item["path"], item.get("pages")
+        if pages is not None and not isinstance(pages, str):
+            raise ManifestError(f"{where}: \"pages\" of {path} must be a string like \"1-3,10,-1\"")
+    else:
+        raise ManifestError(f"{where}: an input must be a path or an object with a \"path\"")
+    if not path.lower().endswith((".pdf", ".docx")):
+        raise ManifestError(f"{where}: {path} is not a DOCX or PDF file")
+    try:
+        parse_page_ranges(pages)
+    except PageRangeError as e:
+        raise ManifestError(f"{where}: {path}: {e}") from None
+    return os.path.normpath(os.path.join(base_dir, path)), pages or None
+
+
+def _options(options, defaults, where):
+    if not isinstance(options, dict):
+        raise ManifestError(f"{where}: options must be an object")
+    unknown = set(options) - set(OUTPUT_OPTIONS)
+    if unknown:
+        raise ManifestError(f"{where}: unknown option(s) {', '.join(sorted(unknown))}")
+    merged = dict(defaults, **options)
+    if merged["profile"] is not None and merged["profile"] not in PROFILES:
+        raise ManifestError(f"{where}: unknown profile {merged['profile']}")
+    return merged
+
+
+class ReaderCache:
+    """Parsed input PDFs kept open between outputs, at most max_open (least recently used closed first).
+
+    A reader also keeps the objects it has parsed, so the fonts and pages
+    of a shared annex are parsed once for all the outputs using it.
+    """
+
+    def __init__(self, max_open=DEFAULT_OPEN_READERS):
+        self.max_open = max_open
+        self.opened = 0
+        self._sources = OrderedDict()  # path -> (PdfSource, PdfReader)
+
+    def reader(self, path):
+        entry = self._sources.get(path)
+        if entry is not None:
+            self._sources.move_to_end(path)
+            return entry[1]
+        source = PdfSource(path)
+        try:
+            reader = source.reader()
+        except Exception:
+            source.close()
+            raise
+        self.opened += 1
+        self._sources[path] = (source, reader)
+        while len(self._sources) > self.max_open:
+            self._sources.popitem(last=False)[1][0].close()
+        return reader
+
+    def trim(self):
+        """Hand back the mapped file pages read so far, the parsed objects stay"""
+        for source, _ in self._sources.values():
+            source.trim()
+
+    def close(self):
+        while self._sources:
+            self._sources.popitem()[1][0].close()
+
+
+def merge_output(output, converted, readers, memory_budget=DEFAULT_MEMORY_BUDGET, cancel=None):
+    """Write one ManifestOutput, taking DOCX inputs from converted (DOCX path -> PDF path).
+
+    Inputs are read through the ReaderCache readers. Returns an OutputResult;
+    the output is written to a temporary file that replaces output_path
+    once complete, so a failed output is reported in its error and leaves
+    any previous file at output_path untouched.
+    """
+    started = time.time()
+    timer = time.perf_counter()
+    opened = readers.opened
+    part_path = None
+    try:
+        options = output.options
+        os.makedirs(os.path.dirname(output.output_path) or ".", exist_ok=True)
+        part_path = temp_output_path(output.output_path)
+        with open(part_path, "wb") as output_file:
+            writer = StreamingPdfWriter(output_file, memory_budget, options["dedup"], options["profile"],
+                                        cancel=cancel)
+            try:
+                for path, pages in output.inputs:
+                    pdf_path = converted.get(path, path)
+                    try:
+                        writer.append(readers.reader(pdf_path), page_ranges=pages)
+                    except PageRangeError as e:
+                        raise PageRangeError(f"{os.path.basename(path)}: {e}") from None
+                writer.close()
+            except BaseException:
+                writer.abort()
+                raise
+        if options["linearize"]:
+            linearize_in_place(part_path)
+        os.replace(part_path, output.output_path)
+        error = None
+    except Cancelled:
+        error = "Cancelled"
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    finally:
+        readers.trim()
+        if part_path is not None and os.path.exists(part_path):
+            os.remove(part_path)
+    return OutputResult(output.output_path, error, 0 if error else writer.pages_written, len(output.inputs),
+                        readers.opened - opened, started, time.perf_counter() - timer, os.getpid())
+
+
+def _init_merge_worker(cancel_event, max_open):
+    global _worker_readers, _worker_cancel
+    _worker_readers = ReaderCache(max_open)
+    _worker_cancel = CancelToken()
+    # Ctrl+C is handled by the parent, which relays it as a cancellation
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    threading.Thread(target=lambda: cancel_event.wait() and _worker_cancel.cancel(),
+                     name="vpdf-cancel", daemon=True).start()
+
+
+def _merge_in_worker(output, converted, memory_budget):
+    return merge_output(output, converted, _worker_readers, memory_budget, _worker_cancel)
+
+
+def run_manifest(outputs, max_workers=None, merge_workers=None, use_cache=True, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 tracer=None, timeout=None, cancel=None, on_result=None, max_open=DEFAULT_OPEN_READERS,
+                 preflight=True):
+    """Build every ManifestOutput of outputs and return an OutputResult per output, in order.
+
+    The page range specs are checked first. Unless preflight is False, each
+    distinct input and page selection is then checked (see preflight), so
+    a spec beyond the end of its file is caught here too. The outputs
+    using a bad input or spec fail without any work.
+    The distinct DOCX inputs are then converted, once each, on up to
+    max_workers processes. The outputs are then merged on merge_workers
+    processes (default: up to 4), each keeping max_open parsed inputs
+    open across the outputs it writes. An output whose input fails is
+    reported and does not stop the others. on_result, if given, is
+    called with each OutputResult as soon as it is done.
+    """
+    tracer = tracer or NULL_TRACER
+    outputs = list(outputs)
+    results = [None] * len(outputs)
+    temp_dir = tempfile.mkdtemp(prefix="vpdf_batch_")
+    try:
+        # (path, page range spec) -> error; an input may be used with different pages by different outputs
+        failed = {}
+        inputs = list(OrderedDict.fromkeys(item for output in outputs for item in output.inputs))
+        for path, pages in inputs:
+            try:
+                parse_page_ranges(pages)
+            except PageRangeError as e:
+                failed[(path, pages)] = str(e)
+        if preflight:
+            checked = [item for item in inputs if item not in failed]
+            with tracer.span("preflight", files=len(checked)):
+                try:
+                    reports = run_preflight([path for path, _ in checked], [pages for _, pages in checked],
+                                            max_workers=max_workers, cancel=cancel)
+                except Cancelled:
+                    # The outputs are reported as cancelled below
+                    reports = []
+            for item, report in zip(checked, reports):
+                if not report.ok:
+                    failed[item] = "; ".join(report.errors)
+        docx_paths = list(OrderedDict.fromkeys(
+            path for path, pages in inputs if path.lower().endswith(".docx") and (path, pages) not in failed))
+        jobs = [(path, os.path.join(temp_dir, f"{i:05d}.pdf")) for i, path in enumerate(docx_paths)]
+        converted = {}
+        with tracer.span("convert_inputs", files=len(jobs)):
+            for result in convert_many(jobs, max_workers, use_cache=use_cache, tracer=tracer, timeout=timeout,
+                                       cancel=cancel):
+                if result.error:
+                    for item in inputs:
+                        if item[0] == result.input_path:
+                            failed[item] = result.error
+                else:
+                    converted[result.input_path] = result.output_path
+
+        def done(index, result):
+            results[index] = result
+            if result.started is not None:
+                tracer.add_span("merge_output", result.started, result.seconds, pid=result.pid, tid=1,
+                                file=os.path.basename(result.output_path), error=result.error)
+            tracer.count("reader_uses", result.reader_uses)
+            tracer.count("readers_opened", result.readers_opened)
+            if on_result is not None:
+                on_result(result)
+
+        pending = []
+        for index, output in enumerate(outputs):
+            errors = [f"{os.path.basename(path)}: {failed[path, pages]}" for path, pages in output.inputs
+                      if (path, pages) in failed]
+            if errors:
+                done(index, OutputResult(output.output_path, "Failed input(s): " + "; ".join(errors)))
+            elif cancel is not None and cancel.cancelled:
+                done(index, OutputResult(output.output_path, "Cancelled"))
+            else:
+                pending.append(index)
+
+        workers = min(merge_workers or min(4, os.cpu_count() or 1), len(pending))
+        with tracer.span("merge", outputs=len(pending)):
+            if workers <= 1:
+                readers = ReaderCache(max_open)
+                try:
+                    for index in pending:
+                        done(index, merge_output(outputs[index], converted, readers, memory_budget, cancel))
+                finally:
+                    readers.close()
+            elif pending:
+                _merge_parallel(outputs, pending, converted, workers, memory_budget, cancel, max_open, done)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return results
+
+
+def _merge_parallel(outputs, pending, converted, workers, memory_budget, cancel, max_open, done):
+    context = multiprocessing.get_context()
+    cancel_event = context.Event()
+    unregister = cancel.on_cancel(cancel_event.set) if cancel is not None else None
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_merge_worker,
+                                   initargs=(cancel_event, max_open))
+    try:
+        futures = {index: executor.submit(_merge_in_worker, outputs[index], converted, memory_budget)
+                   for index in pending}
+        # Reported in manifest order, waiting is bounded by the slowest output anyway
+        for index, future in futures.items():
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died
+                result = OutputResult(outputs[index].output_path, str(e) or type(e).__name__)
+            done(index, result)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if unregister is not None:
+            unregister()
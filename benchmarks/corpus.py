@@ -0,0 +1,168 @@
+"""Deterministic synthetic PDF/DOCX corpus for the benchmarks.
+
+Files are written byte for byte the same for the same arguments, so
+results are comparable between runs and machines.
+"""
+import os
+import random
+import zipfile
+import zlib
+
+# Benchmark cases: name -> list of file specs (kind, count, options)
+CASES = {
+    "many_small": [("pdf", 200, {"pages": 2})],
+    "few_large": [("pdf", 4, {"pages": 250})],
+    "image_heavy": [("pdf", 10, {"pages": 5, "image_kb": 200})],
+    "template": [("pdf", 40, {"pages": 3, "image_kb": 60, "shared_assets": True})],
+    "mixed_docx": [("pdf", 10, {"pages": 4}), ("docx", 10, {"paragraphs": 120})],
+}
+
+# Smaller variant of every case for quick runs
+QUICK_CASES = {
+    "many_small": [("pdf", 40, {"pages": 2})],
+    "few_large": [("pdf", 2, {"pages": 60})],
+    "image_heavy": [("pdf", 3, {"pages": 3, "image_kb": 100})],
+    "template": [("pdf", 10, {"pages": 2, "image_kb": 30, "shared_assets": True})],
+    "mixed_docx": [("pdf", 4, {"pages": 2}), ("docx", 4, {"paragraphs": 60})],
+}
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua").split()
+
+
+def _sentence(rnd, words=12):
+    return " ".join(rnd.choice(WORDS) for _ in range(words))
+
+
+def _noise_image(rnd, kilobytes):
+    """Incompressible RGB image of roughly kilobytes, as (width, height, data)"""
+    side = max(8, int((kilobytes * 1024 / 3) ** 0.5))
+    return side, side, rnd.randbytes(side * side * 3)
+
+
+class _RawPdf:
+    """Minimal PDF serialiser, so the output does not depend on library versions"""
+
+    def __init__(self):
+        self.objects = []
+
+    def add(self, body, stream=None):
+        self.objects.append((body, stream))
+        return len(self.objects)
+
+    def reserve(self):
+        return self.add(None)
+
+    def set(self, number, body, stream=None):
+        self.objects[number - 1] = (body, stream)
+
+    def write(self, path, root):
+        out = bytearray(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, (body, stream) in enumerate(self.objects, 1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n" % number
+            if stream is None:
+                out += body.encode("latin-1")
+            else:
+                out += body.encode("latin-1")[:-2] + b" /Length %d >>\nstream\n" % len(stream)
+                out += stream + b"\nendstream"
+            out += b"\nendobj\n"
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1)
+        for offset in offsets:
+            out += b"%010d 00000 n \n" % offset
+        out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(offsets) + 1, root, xref)
+        with open(path, "wb") as f:
+            f.write(out)
+
+
+def make_pdf(path, pages, image_kb=0, shared_assets=False, seed=0):
+    """Write a PDF with text pages, optionally one image per page.
+
+    With shared_assets every file generated embeds the same logo image and
+    font dictionary bytes, like documents produced from one template.
+    """
+    rnd = random.Random(seed)
+    asset_rnd = random.Random(0) if shared_assets else rnd
+    pdf = _RawPdf()
+    pages_id = pdf.reserve()
+    font = pdf.add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    logo = None
+    if image_kb:
+        width, height, data = _noise_image(asset_rnd, max(4, image_kb // 4))
+        logo = pdf.add(f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                       f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode >>",
+                       zlib.compress(data, 1))
+    kids = []
+    for page_number in range(pages):
+        xobjects = ""
+        drawing = ""
+        if image_kb:
+            width, height, data = _noise_image(rnd, image_kb)
+            image = pdf.add(f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                            f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode >>",
+                            zlib.compress(data, 1))
+            xobjects = f"/XObject << /Im1 {image} 0 R /Logo {logo} 0 R >>"
+            drawing = "q 400 0 0 400 100 250 cm /Im1 Do Q q 120 0 0 40 60 740 cm /Logo Do Q\n"
+        lines = [f"({_sentence(rnd)}) Tj T*" for _ in range(30)]
+        content = (drawing + f"BT /F1 10 Tf 13 TL 56 700 Td (Page {page_number + 1}) Tj T* "
+                   + " ".join(lines) + " ET").encode("latin-1")
+        contents = pdf.add("<< /Filter /FlateDecode >>", zlib.compress(content, 6))
+        kids.append(pdf.add(f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 612 792] "
+                            f"/Resources << /Font << /F1 {font} 0 R >> {xobjects} >> "
+                            f"/Contents {contents} 0 R >>"))
+    pdf.set(pages_id, f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>")
+    root = pdf.add(f"<< /Type /Catalog /Pages {pages_id} 0 R >>")
+    pdf.write(path, root)
+
+
+def make_docx(path, paragraphs, seed=0):
+    """Write a minimal DOCX with the given number of paragraphs"""
+    rnd = random.Random(seed)
+    body = "".join(f"<w:p><w:r><w:t>{_sentence(rnd)}</w:t></w:r></w:p>" for _ in range(paragraphs))
+    files = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="word/document.xml" Type="http://schemas.openxmlformats.org/'
+            'officeDocument/2006/relationships/officeDocument"/></Relationships>'),
+        "word/document.xml": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{body}</w:body></w:document>'),
+    }
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        for name, data in files.items():
+            # Fixed timestamps keep the archive bytes identical between runs
+            info = zipfile.ZipInfo(name, date_time=(2024, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            docx.writestr(info, data)
+
+
+def generate_case(directory, specs):
+    """Generate the files of one case into directory and return their paths in merge order.
+
+    Files that already exist are reused, they are identical by construction.
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    for kind, count, options in specs:
+        for i in range(count):
+            path = os.path.join(directory, f"{kind}_{i:04d}.{kind}")
+            if not os.path.exists(path):
+                if kind == "pdf":
+                    make_pdf(path, seed=i, **options)
+                else:
+                    make_docx(path, seed=10000 + i, **options)
+            files.append((i, kind, path))
+    # Interleave DOCX and PDF inputs like a real mixed merge list
+    return [path for _, _, path in sorted(files)]
@@ -0,0 +1,208 @@
+"""Benchmarks for page counting, merging and mixed DOCX/PDF merges.
+
+    python benchmarks/run_benchmarks.py --quick
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+
+Every (case, stage) pair runs in its own process so peak RSS is measured
+per stage. DOCX conversion uses the fake converter backend, so the suite
+runs on Linux without Word.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import corpus  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Stages run for each case
+STAGES = {
+    "many_small": ["count", "check", "merge"],
+    "few_large": ["count", "check", "merge"],
+    "image_heavy": ["count", "merge", "merge_smallest"],
+    "template": ["count", "merge", "merge_dedup"],
+    "mixed_docx": ["mixed"],
+}
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_stage(stage, files, options):
+    """Run one stage in the current process and return its metrics"""
+    input_bytes = sum(os.path.getsize(f) for f in files)
+    output_dir = tempfile.mkdtemp(prefix="vpdf_bench_")
+    try:
+        return _timed_stage(stage, files, options, input_bytes, os.path.join(output_dir, "out.pdf"))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def _timed_stage(stage, files, options, input_bytes, output_path):
+    # pypdf is imported on first use by page_cache, the stages measure the work and not that import
+    import pdf_input  # noqa: F401
+    from page_cache import PageCountCache
+
+    started = time.perf_counter()
+    if stage == "count":
+        cache = PageCountCache(cache_path=None)
+        pages = sum(cache.get_page_count(f) for f in files)
+    elif stage == "check":
+        from preflight import run_preflight
+
+        reports = run_preflight(files, max_workers=options["workers"])
+        failed = [report for report in reports if not report.ok]
+        if failed:
+            raise RuntimeError(f"{failed[0].path}: {failed[0].errors[0]}")
+        pages = sum(report.pages for report in reports)
+    elif stage == "mixed":
+        import functools
+
+        import converter_logic
+        from converter_pool import FakeBackend
+
+        converter_logic.configure_converter(functools.partial(FakeBackend, delay=options["convert_delay"]))
+        success, message = converter_logic.process_and_merge_mixed_files(
+            files, output_path, max_workers=options["workers"], use_cache=False)
+        if not success:
+            raise RuntimeError(message)
+        pages = None
+    else:
+        from stream_merge import merge_pdfs
+
+        pages = merge_pdfs(files, output_path,
+                           dedup=stage == "merge_dedup",
+                           profile="smallest" if stage == "merge_smallest" else None)
+    seconds = time.perf_counter() - started
+    if pages is None:
+        from pypdf import PdfReader
+
+        pages = len(PdfReader(output_path).pages)
+    output_bytes = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    return {
+        "seconds": round(seconds, 4),
+        "pages": pages,
+        "pages_per_sec": round(pages / seconds, 1) if seconds else None,
+        "bytes_per_sec": round(input_bytes / seconds) if seconds else None,
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _stage_process(stage, files, options, queue):
+    try:
+        queue.put(_run_stage(stage, files, options))
+    except Exception as e:
+        queue.put({"error": str(e)})
+
+
+def run_case(name, specs, corpus_dir, options):
+    """Generate the corpus of a case and run each of its stages in a fresh process"""
+    files = corpus.generate_case(os.path.join(corpus_dir, name), specs)
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for stage in STAGES[name]:
+        queue = context.Queue()
+        process = context.Process(target=_stage_process, args=(stage, files, options, queue))
+        process.start()
+        results[stage] = queue.get()
+        process.join()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions of results against baseline"""
+    regressions = []
+    for case, stages in results.items():
+        for stage, metrics in stages.items():
+            base = baseline.get(case, {}).get(stage)
+            if not base or "error" in metrics or "error" in base:
+                continue
+            if base.get("pages_per_sec") and metrics["pages_per_sec"] < base["pages_per_sec"] * (1 - tolerance):
+                regressions.append(f"{case}/{stage}: {metrics['pages_per_sec']} pages/s, "
+                                   f"baseline {base['pages_per_sec']}")
+            if base.get("peak_rss_mb") and metrics["peak_rss_mb"] and \
+                    metrics["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+                regressions.append(f"{case}/{stage}: peak RSS {metrics['peak_rss_mb']:.1f} MB, "
+                                   f"baseline {base['peak_rss_mb']:.1f} MB")
+    return regressions
+
+
+def format_results(results):
+    lines = [f"{'case/stage':<28}{'seconds':>9}{'pages':>7}{'pages/s':>10}{'MB/s':>8}{'out MB':>8}{'RSS MB':>8}"]
+    for case, stages in results.items():
+        for stage, m in stages.items():
+            label = f"{case}/{stage}"
+            if "error" in m:
+                lines.append(f"{label:<28}ERROR {m['error']}")
+                continue
+            rss = f"{m['peak_rss_mb']:.1f}" if m["peak_rss_mb"] else "-"
+            lines.append(f"{label:<28}{m['seconds']:>9.3f}{m['pages']:>7}{m['pages_per_sec']:>10.1f}"
+                         f"{m['bytes_per_sec'] / 1e6:>8.1f}{m['output_bytes'] / 1e6:>8.2f}{rss:>8}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller corpus")
+    parser.add_argument("--cases", nargs="+", choices=sorted(STAGES), help="cases to run (default: all)")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "vpdf_bench_corpus"))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression (default: 0.2)")
+    parser.add_argument("--convert-delay", type=float, default=0.05, help="fake conversion time in seconds")
+    parser.add_argument("--workers", type=int, default=2, help="conversion workers for mixed merges, check processes")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    cases = corpus.QUICK_CASES if args.quick else corpus.CASES
+    corpus_dir = os.path.join(args.corpus_dir, "quick" if args.quick else "full")
+    options = {"convert_delay": args.convert_delay, "workers": args.workers}
+    results = {}
+    for name in args.cases or list(STAGES):
+        results[name] = run_case(name, cases[name], corpus_dir, options)
+    print(format_results(results))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    mode = "quick" if args.quick else "full"
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"mode": mode, "results": results}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("mode") != mode:
+            print(f"\nBaseline was recorded in {baseline.get('mode')} mode, not comparing")
+            return 0
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
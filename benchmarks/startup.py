@@ -0,0 +1,183 @@
+"""Startup time of the front ends: import time and time to the first window.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --save-baseline
+    python benchmarks/startup.py --repeat 10 --baseline benchmarks/startup_baseline.json
+
+Every measurement runs in a fresh interpreter and the median of --repeat
+runs is reported. "engine" is the import of the conversion and PDF
+modules the front ends defer to their first use, for reference.
+
+Besides comparing the timings with a baseline, the run fails if one of
+LAZY_MODULES is already loaded when a window is shown: a regression that
+timings on a fast machine would hide. Tk needs a display, Qt runs on its
+offscreen platform; a front end whose toolkit is missing or cannot open
+a window is reported as skipped.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "startup_baseline.json")
+
+# Loaded on first use only; any of them at the first window is a regression
+LAZY_MODULES = ("converter_logic", "stream_merge", "preflight", "pdf_input", "pypdf", "PIL", "comtypes", "fitz")
+
+# Timing differences below this are noise, whatever the tolerance says
+MIN_REGRESSION_MS = 15
+
+_PROBE_START = """
+import json, os, sys, time
+started = time.perf_counter()
+
+def report(shown=None, skipped=None):
+    print(json.dumps({"import_ms": None if imported is None else (imported - started) * 1000,
+                      "window_ms": None if shown is None else (shown - started) * 1000,
+                      "skipped": skipped, "modules": sorted(sys.modules)}), flush=True)
+    # No teardown: closing the window would ask for confirmation
+    os._exit(0)
+"""
+
+PROBES = {
+    "tk": _PROBE_START + """
+import main
+imported = time.perf_counter()
+import tkinter
+
+def first_window(self, n=0):
+    self.update()
+    report(time.perf_counter())
+
+tkinter.Misc.mainloop = first_window
+try:
+    main.main()
+except tkinter.TclError as e:
+    report(skipped=f"no display ({e})")
+""",
+    "qt": _PROBE_START + """
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+try:
+    import gui
+except ImportError as e:
+    imported = None
+    report(skipped=f"PyQt5 not installed ({e})")
+imported = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv[:1])
+window = gui.FileConverterApp()
+window.show()
+app.processEvents()
+report(time.perf_counter())
+""",
+    "engine": _PROBE_START + """
+import converter_logic, preflight
+imported = time.perf_counter()
+report()
+""",
+}
+
+
+def run_probe(name):
+    """Run one probe in a fresh interpreter and return its measurements"""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", PROBES[name]], cwd=REPO_DIR, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=REPO_DIR, PYTHONDONTWRITEBYTECODE="1"))
+    elapsed = (time.perf_counter() - started) * 1000
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return {"error": (result.stderr.strip().splitlines() or ["no output"])[-1]}
+    measured = json.loads(lines[-1])
+    # Includes starting the interpreter, which the user waits for too
+    measured["process_ms"] = elapsed
+    return measured
+
+
+def measure(name, repeat):
+    runs = [run_probe(name) for _ in range(repeat)]
+    for run in runs:
+        if "error" in run or run["import_ms"] is None:
+            return run
+    # Without a window (no display) the import is still measured
+    result = {"skipped": runs[-1]["skipped"]}
+    for metric in ("import_ms", "window_ms", "process_ms"):
+        values = [run[metric] for run in runs if run[metric] is not None]
+        result[metric] = round(statistics.median(values), 1) if values else None
+    if name != "engine":
+        result["lazy_loaded"] = [module for module in LAZY_MODULES if module in runs[-1]["modules"]]
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions of results against baseline"""
+    regressions = []
+    for name, metrics in results.items():
+        if metrics.get("lazy_loaded"):
+            regressions.append(f"{name}: loaded at startup: {', '.join(metrics['lazy_loaded'])}")
+        base = baseline.get(name)
+        if not base or "error" in metrics or "error" in base or metrics.get("import_ms") is None:
+            continue
+        for metric in ("import_ms", "window_ms"):
+            now, before = metrics.get(metric), base.get(metric)
+            if now is not None and before is not None and now > before * (1 + tolerance) + MIN_REGRESSION_MS:
+                regressions.append(f"{name}/{metric}: {now:.1f} ms, baseline {before:.1f} ms")
+    return regressions
+
+
+def format_results(results):
+    lines = [f"{'front end':<10}{'import ms':>11}{'window ms':>11}{'process ms':>12}  deferred modules loaded"]
+    for name, m in results.items():
+        if "error" in m:
+            lines.append(f"{name:<10}ERROR {m['error']}")
+        elif m["import_ms"] is None:
+            lines.append(f"{name:<10}skipped: {m['skipped']}")
+        else:
+            window = f"{m['window_ms']:.1f}" if m["window_ms"] is not None else "-"
+            loaded = (", ".join(m["lazy_loaded"]) or "none") if "lazy_loaded" in m else ""
+            lines.append(f"{name:<10}{m['import_ms']:>11.1f}{window:>11}{m['process_ms']:>12.1f}  {loaded}")
+            if m["skipped"]:
+                lines.append(f"{'':<10}no window: {m['skipped']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--front-ends", nargs="+", choices=sorted(PROBES), help="probes to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per probe, the median is kept (default: 5)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression (default: 0.25)")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {name: measure(name, args.repeat) for name in args.front_ends or ["tk", "qt", "engine"]}
+    print(format_results(results))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    errors = [f"{name}: {m['error']}" for name, m in results.items() if "error" in m]
+    regressions = errors + compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    print("\nNo regressions" + (" against the baseline" if baseline else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Pre-scale the images the front ends show at startup, so they are not resized on every start.
+
+    python build_assets.py           # (re)build the scaled assets
+    python build_assets.py --check   # exit 1 if one is missing or out of date
+
+Run it before packaging and after changing a source image; the outputs
+live next to their source in assets/ and are bundled with it. The front
+ends fall back to scaling the source image when an output is missing.
+"""
+import argparse
+import io
+import os
+import sys
+
+from PIL import Image
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+# (source, output, size): a (width, height) size is exact, a single number fits the image in that square
+SCALED_ASSETS = [
+    ("logo vibia.png", "logo_220x75.png", (220, 75)),   # main.py window
+    ("logo vibia.png", "logo_90.png", 90),               # gui.py title bar
+]
+
+
+def scaled_png(source_path, size):
+    """PNG bytes of the image at source_path resized to size"""
+    with Image.open(source_path) as image:
+        if isinstance(size, int):
+            scale = size / max(image.size)
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        scaled = image.resize(size, Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    scaled.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+
+def _same_pixels(path, data):
+    # Compared decoded: the PNG encoding itself may differ between Pillow and zlib versions
+    try:
+        with Image.open(path) as current, Image.open(io.BytesIO(data)) as wanted:
+            return current.size == wanted.size and current.mode == wanted.mode and \
+                current.tobytes() == wanted.tobytes()
+    except OSError:
+        return False
+
+
+def build(check=False):
+    """Write every scaled asset (or with check=True only compare them). Returns the outputs out of date"""
+    stale = []
+    for source, output, size in SCALED_ASSETS:
+        output_path = os.path.join(ASSETS_DIR, output)
+        data = scaled_png(os.path.join(ASSETS_DIR, source), size)
+        if _same_pixels(output_path, data):
+            continue
+        stale.append(output)
+        if not check:
+            with open(output_path, "wb") as f:
+                f.write(data)
+    return stale
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only check that the assets are up to date")
+    args = parser.parse_args(argv)
+    stale = build(check=args.check)
+    if args.check and stale:
+        print(f"Out of date: {', '.join(stale)} (run python build_assets.py)", file=sys.stderr)
+        return 1
+    print(f"{len(stale)} asset(s) {'out of date' if args.check else 'written'}, "
+          f"{len(SCALED_ASSETS) - len(stale)} up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
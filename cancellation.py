@@ -0,0 +1,61 @@
+import threading
+
+
+class Cancelled(Exception):
+    """Raised inside a job when its CancelToken was cancelled"""
+
+    def __init__(self, message="Cancelled"):
+        super().__init__(message)
+
+
+class CancelToken:
+    """Cooperative cancellation flag shared between a job and whoever may stop it.
+
+    Engines call check() between files and pages; code blocked in a
+    backend registers on_cancel() callbacks that stop it from outside.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Cancel the job and run the registered callbacks, once"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def check(self):
+        """Raise Cancelled if the job was cancelled"""
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout=None):
+        """Block until cancelled or timeout seconds passed. Returns cancelled"""
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback):
+        """Call callback on cancellation (now if already cancelled). Returns an unregister function"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
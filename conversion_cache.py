@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def default_cache_dir():
+    """Location of the on-disk DOCX -> PDF conversion cache"""
+    return os.path.join(os.path.expanduser("~"), ".vpdf", "conversions")
+
+
+def conversion_key(input_path, backend_name, backend_version, options=None):
+    """Hash of the DOCX content plus the converter name, version and options"""
+    digest = hashlib.sha256()
+    with open(input_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    digest.update(b"\0" + json.dumps([backend_name, backend_version, options or {}],
+                                     sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """Content-addressed store of converted PDFs with a size cap and LRU eviction.
+
+    Entries are files named after their key; the file mtime is the LRU
+    timestamp so the order survives restarts. Inserts are written to a
+    temporary file and renamed into place, so readers never see a partial
+    PDF.
+    """
+
+    # Extension of the entry files
+    suffix = ".pdf"
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "inserts": 0, "evictions": 0}
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._scan()
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def _scan(self):
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.suffix):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            found.append((st.st_mtime, name[:-len(self.suffix)], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def lookup(self, key):
+        """Return the cached PDF path for key, or None"""
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = None
+            if key in self._entries:
+                # Another process may have evicted or replaced the entry
+                self._total_bytes -= self._entries.pop(key)
+            if size is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries[key] = size
+            self._total_bytes += size
+            self.stats["hits"] += 1
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return path
+
+    def fetch(self, key, dest_path, link=False):
+        """Place the cached PDF for key at dest_path. Returns False on a miss.
+
+        With link=True a hard link is made when possible; it keeps the data
+        alive even if the entry is evicted meanwhile, but dest_path must
+        then never be modified in place.
+        """
+        path = self.lookup(key)
+        if path is None:
+            return False
+        if link:
+            try:
+                os.link(path, dest_path)
+                return True
+            except OSError:
+                pass
+        try:
+            shutil.copyfile(path, dest_path)
+        except OSError:
+            return False
+        return True
+
+    def insert(self, key, pdf_path):
+        """Copy pdf_path into the cache under key"""
+        def copy(tmp):
+            with open(pdf_path, "rb") as src:
+                shutil.copyfileobj(src, tmp)
+        self._insert(key, copy)
+
+    def insert_bytes(self, key, data):
+        """Store data in the cache under key"""
+        self._insert(key, lambda tmp: tmp.write(data))
+
+    def _insert(self, key, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                write(tmp)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self.stats["inserts"] += 1
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.stats["evictions"] += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total_bytes = 0
@@ -0,0 +1,479 @@
+import atexit
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+
+from cancellation import Cancelled, CancelToken
+
+from conversion_cache import ConversionCache, conversion_key
+from converter_pool import BACKENDS, ConverterPool
+from linearize import linearize_in_place
+from merge_checkpoint import MergeCheckpoint, merge_signature, temp_output_path
+from page_ranges import PageRangeError, parse_page_ranges
+from preflight import format_report, run_preflight
+from progress import CONVERSION_WEIGHT, ProgressTracker
+from stream_merge import DEFAULT_MEMORY_BUDGET, StreamingPdfWriter
+from tracing import NULL_TRACER
+
+# Options that influence the converter output, part of the conversion cache key
+CONVERSION_OPTIONS = {"format": "pdf"}
+
+# Seconds a single conversion may take before its converter instance is killed
+DEFAULT_CONVERT_TIMEOUT = 600
+
+_pool = None
+_pool_lock = threading.Lock()
+_cache = None
+_worker_cancel = None  # CancelToken of a conversion worker process
+
+
+def configure_converter(backend="word", size=1, max_jobs_per_instance=50):
+    """Select the converter backend (a name from BACKENDS or a factory) and pool size"""
+    global _pool
+    factory = BACKENDS[backend] if isinstance(backend, str) else backend
+    with _pool_lock:
+        old_pool = _pool
+        _pool = ConverterPool(factory, size=size, max_jobs_per_instance=max_jobs_per_instance)
+    if old_pool is not None:
+        old_pool.close()
+    return _pool
+
+
+def get_converter_pool():
+    """Return the shared converter pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConverterPool(BACKENDS[os.environ.get("VPDF_CONVERTER", "word")])
+        return _pool
+
+
+@atexit.register
+def _close_pool():
+    if _pool is not None:
+        _pool.close()
+
+
+def get_conversion_cache():
+    """Return the shared conversion cache, or None when VPDF_CACHE=0"""
+    global _cache
+    if os.environ.get("VPDF_CACHE", "1") == "0":
+        return None
+    with _pool_lock:
+        if _cache is None:
+            _cache = ConversionCache(os.environ.get("VPDF_CACHE_DIR"))
+        return _cache
+
+
+def _cache_key(input_path):
+    pool = get_converter_pool()
+    return conversion_key(input_path, pool.backend_name, pool.backend_version, CONVERSION_OPTIONS)
+
+
+def _convert(input_path, output_path, timeout=None, cancel=None):
+    if timeout is None:
+        timeout = default_convert_timeout()
+    get_converter_pool().convert(input_path, output_path, timeout=timeout, cancel=cancel)
+
+
+# started (a time.time() value), seconds and pid describe where and when the conversion ran
+ConversionResult = namedtuple("ConversionResult",
+                              ["input_path", "output_path", "error", "started", "seconds", "pid"],
+                              defaults=(None, None, None))
+
+
+def default_convert_workers():
+    """Number of parallel conversion processes (VPDF_CONVERT_WORKERS overrides)"""
+    try:
+        return max(1, int(os.environ["VPDF_CONVERT_WORKERS"]))
+    except (KeyError, ValueError):
+        return min(4, os.cpu_count() or 1)
+
+
+def default_convert_timeout():
+    """Per-file conversion timeout in seconds (VPDF_CONVERT_TIMEOUT overrides, 0 disables)"""
+    try:
+        return max(0.0, float(os.environ["VPDF_CONVERT_TIMEOUT"]))
+    except (KeyError, ValueError):
+        return DEFAULT_CONVERT_TIMEOUT
+
+
+def _init_convert_worker(backend_factory, cancel_event=None):
+    global _worker_cancel
+    # Every worker process keeps its own warm converter instance
+    configure_converter(backend_factory, size=1)
+    if cancel_event is not None:
+        # Ctrl+C is handled by the parent, which relays it as a cancellation
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        _worker_cancel = CancelToken()
+        threading.Thread(target=lambda: cancel_event.wait() and _worker_cancel.cancel(),
+                         name="vpdf-cancel", daemon=True).start()
+
+
+def _convert_one(input_path, output_path, timeout=None, cancel=None):
+    started = time.time()
+    timer = time.perf_counter()
+    try:
+        _convert(input_path, output_path, timeout, cancel or _worker_cancel)
+        error = None
+    except Exception as e:
+        output_path, error = None, str(e)
+    return ConversionResult(input_path, output_path, error, started, time.perf_counter() - timer, os.getpid())
+
+
+def _trace_conversion(tracer, result):
+    if result.started is not None:
+        tracer.add_span("convert", result.started, result.seconds, pid=result.pid, tid=1,
+                        file=os.path.basename(result.input_path), error=result.error)
+    tracer.count("conversions")
+
+
+def _result(future, cancel):
+    # Wait for a conversion, but raise Cancelled within 0.1 s of a cancellation
+    if cancel is not None:
+        while not future.done():
+            cancel.check()
+            wait_futures([future], timeout=0.1)
+        cancel.check()
+    return future.result()
+
+
+def iter_conversions(jobs, max_workers=None, queue_limit=None, on_done=None, timeout=None,
+                     cancel=None):
+    """Convert (input_path, output_path) pairs and yield a ConversionResult per job, in order.
+
+    Conversions run ahead of the consumer on up to max_workers processes
+    (a single worker thread sharing the in-process pool when max_workers
+    is 1), with at most queue_limit jobs converting or waiting to be
+    consumed. A failing file is reported in its ConversionResult.error
+    and does not stop the other conversions. on_done, if given, is called
+    with the input path as soon as a conversion ends, from a pool thread.
+
+    A conversion running longer than timeout seconds fails and its
+    converter instance is killed. Cancelling the CancelToken cancel
+    raises Cancelled in the consumer and kills the running conversions.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return
+    workers = min(max_workers or default_convert_workers(), len(jobs))
+    queue_limit = max(queue_limit or 2 * workers, workers)
+    unregister = None
+    if workers <= 1:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vpdf-convert")
+        job_cancel = cancel
+    else:
+        context = multiprocessing.get_context()
+        cancel_event = None
+        if cancel is not None:
+            cancel_event = context.Event()
+            unregister = cancel.on_cancel(cancel_event.set)
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                       initializer=_init_convert_worker,
+                                       initargs=(get_converter_pool().backend_factory, cancel_event))
+        # Worker processes get the cancellation through cancel_event
+        job_cancel = None
+    try:
+        pending = deque()
+        next_job = 0
+        while pending or next_job < len(jobs):
+            while next_job < len(jobs) and len(pending) < queue_limit:
+                input_path, output_path = jobs[next_job]
+                future = executor.submit(_convert_one, input_path, output_path, timeout, job_cancel)
+                if on_done is not None:
+                    future.add_done_callback(lambda _, path=input_path: on_done(path))
+                pending.append((input_path, future))
+                next_job += 1
+            input_path, future = pending.popleft()
+            try:
+                result = _result(future, cancel)
+            except Cancelled:
+                raise
+            except Exception as e:
+                # The worker process itself died
+                result = ConversionResult(input_path, None, str(e))
+            yield result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if unregister is not None:
+            unregister()
+
+
+def convert_many(jobs, max_workers=None, progress_callback=None, use_cache=True, tracer=None,
+                 timeout=None, cancel=None):
+    """Convert (input_path, output_path) pairs in parallel, returning results in order.
+
+    Inputs found in the conversion cache are copied instead of converted.
+    progress_callback, if given, is called with (done, total). After a
+    cancellation the unfinished jobs are reported with error "Cancelled".
+    """
+    jobs = list(jobs)
+    tracer = tracer or NULL_TRACER
+    cache = get_conversion_cache() if use_cache else None
+    results = [None] * len(jobs)
+    keys = {}
+    pending = []
+    done = 0
+    for i, (input_path, output_path) in enumerate(jobs):
+        if cache is not None:
+            with tracer.span("cache_lookup"):
+                keys[i] = _cache_key(input_path)
+                hit = cache.fetch(keys[i], output_path)
+            if hit:
+                tracer.count("cache_hits")
+                results[i] = ConversionResult(input_path, output_path, None)
+                done += 1
+                continue
+        pending.append(i)
+
+    conversions = iter_conversions([jobs[i] for i in pending], max_workers, queue_limit=len(pending),
+                                   timeout=timeout, cancel=cancel)
+    try:
+        for i, result in zip(pending, conversions):
+            _trace_conversion(tracer, result)
+            if cache is not None and not result.error:
+                with tracer.span("cache_insert"):
+                    cache.insert(keys[i], result.output_path)
+            results[i] = result
+            done += 1
+            if progress_callback:
+                progress_callback(done, len(jobs))
+    except Cancelled:
+        for i in pending:
+            if results[i] is None:
+                results[i] = ConversionResult(jobs[i][0], None, "Cancelled")
+    return results
+
+
+def convert_docx_to_pdf(input_path, output_dir, progress_callback=None, use_cache=True, tracer=None,
+                        timeout=None, cancel=None):
+    """Convert a DOCX file into output_dir. Returns (success, message)"""
+    tracer = tracer or NULL_TRACER
+    base = os.path.splitext(os.path.basename(input_path))[0]
+    output_path = os.path.join(output_dir, base + '.pdf')
+    try:
+        if progress_callback:
+            progress_callback(10)
+        cache = get_conversion_cache() if use_cache else None
+        hit = False
+        if cache is not None:
+            with tracer.span("cache_lookup"):
+                key = _cache_key(input_path)
+                hit = cache.fetch(key, output_path)
+        if not hit:
+            with tracer.span("convert", file=os.path.basename(input_path)):
+                _convert(input_path, output_path, timeout, cancel)
+            if cache is not None:
+                with tracer.span("cache_insert"):
+                    cache.insert(key, output_path)
+        if progress_callback:
+            progress_callback(100)
+        return True, output_path
+    except Cancelled:
+        return False, "Conversion cancelled"
+    except Exception as e:
+        return False, f"Conversion failed: {str(e)}"
+
+
+def process_and_merge_mixed_files(file_paths, output_path, progress_callback=None,
+                                  memory_budget=DEFAULT_MEMORY_BUDGET, max_workers=None,
+                                  use_cache=True, queue_limit=None, page_cache=None, dedup=False,
+                                  profile=None, linearize=False, tracer=None, convert_timeout=None,
+                                  cancel=None, page_ranges=None, resumable=False, preflight=True,
+                                  on_preflight=None):
+    """Convert the DOCX files in file_paths and merge everything, in order, into output_path.
+
+    Conversion and merging are pipelined: file i is appended as soon as it
+    is ready while later DOCX files are still converting on up to
+    max_workers processes, with at most queue_limit converted files
+    waiting. DOCX files found in the conversion cache are not converted
+    again. Page counts of the inputs are recorded in page_cache if given.
+    With dedup=True identical fonts, images and other streams are written
+    once and shared. profile names an output profile from
+    output_profiles.PROFILES. With linearize=True the result is written
+    as a linearized ("fast web view") PDF. tracer (a tracing.Tracer)
+    records per-stage and per-file spans.
+
+    page_ranges, if given, holds one page range spec like "1-3,10,-1" (or
+    None for all pages) per entry of file_paths; only the selected pages
+    of each file are read and copied.
+
+    Unless preflight is False, every input is checked first (see
+    preflight), in parallel, and the merge fails before any conversion if
+    one is damaged, encrypted or truncated. on_preflight, if given, is
+    called with the list of preflight.FileReport.
+
+    progress_callback, if given, is called with a progress.ProgressUpdate
+    at most every 0.25 s. Progress is weighted by input bytes, spread over
+    the pages of each file while merging, and covers the conversions too.
+
+    Conversions taking longer than convert_timeout seconds fail. The
+    CancelToken cancel is checked between files and pages.
+
+    The output is written to a temporary file that replaces output_path
+    only once it is complete, so output_path never holds a truncated PDF.
+    A failed or cancelled merge removes its partial output, unless
+    resumable is True: then the partial output, the converted DOCX files
+    and a checkpoint taken between inputs every few seconds are kept next
+    to the output (see merge_checkpoint), and the same merge run again
+    continues after the last checkpoint. Returns (success, message).
+    """
+    tracer = tracer or NULL_TRACER
+    progress = ProgressTracker(progress_callback)
+    cache = get_conversion_cache() if use_cache else None
+    results = writer = checkpoint = temp_dir = part_path = None
+    try:
+        pdf_paths = list(file_paths)
+        page_ranges = list(page_ranges) if page_ranges is not None else [None] * len(pdf_paths)
+        # Check the syntax now rather than after the conversions
+        for path, ranges in zip(file_paths, page_ranges):
+            try:
+                parse_page_ranges(ranges)
+            except PageRangeError as e:
+                return False, f"{os.path.basename(path)}: {e}"
+        if preflight:
+            progress.advance(0, phase="checking")
+            with tracer.span("preflight", files=len(file_paths)):
+                reports = run_preflight(file_paths, page_ranges, max_workers, cancel)
+            if on_preflight is not None:
+                on_preflight(reports)
+            bad = [report for report in reports if not report.ok]
+            if bad:
+                return False, f"Pre-flight check failed for {len(bad)} file(s):\n{format_report(bad)}"
+        if resumable:
+            checkpoint = MergeCheckpoint(output_path, merge_signature(
+                file_paths, page_ranges, [dedup, profile, linearize, memory_budget]))
+            part_path = checkpoint.part_path
+        else:
+            temp_dir = tempfile.mkdtemp(prefix="vpdf_")
+            part_path = temp_output_path(output_path)
+        done_inputs = checkpoint.done_inputs if checkpoint is not None else 0
+        jobs = []
+        keys = {}
+        sizes = {}  # input path -> size in bytes, the work unit of the progress
+        for i, path in enumerate(file_paths):
+            if i < done_inputs:
+                # Already in the partial output
+                continue
+            sizes[path] = os.path.getsize(path)
+            if path.lower().endswith('.docx'):
+                if checkpoint is not None:
+                    pdf_paths[i] = checkpoint.converted_path(i)
+                    if checkpoint.is_converted(i):
+                        sizes[pdf_paths[i]] = os.path.getsize(pdf_paths[i])
+                        progress.add_total(sizes[pdf_paths[i]])
+                        continue
+                else:
+                    pdf_paths[i] = os.path.join(temp_dir, f"{i:05d}.pdf")
+                if cache is not None:
+                    with tracer.span("cache_lookup", file=os.path.basename(path)):
+                        keys[pdf_paths[i]] = _cache_key(path)
+                        hit = cache.fetch(keys[pdf_paths[i]], pdf_paths[i], link=True)
+                    if hit:
+                        tracer.count("cache_hits")
+                        sizes[pdf_paths[i]] = os.path.getsize(pdf_paths[i])
+                        progress.add_total(sizes[pdf_paths[i]])
+                        continue
+                jobs.append((path, pdf_paths[i]))
+                # Until it is converted, assume the PDF is about as large as the DOCX
+                sizes[pdf_paths[i]] = sizes[path]
+                progress.add_total(sizes[path] * (CONVERSION_WEIGHT + 1))
+            else:
+                progress.add_total(sizes[path])
+        converting = {output for _, output in jobs}
+
+        def conversion_done(input_path):
+            progress.advance(sizes[input_path] * CONVERSION_WEIGHT, nbytes=sizes[input_path],
+                             phase="converting")
+
+        def page_done(weight):
+            return lambda done, pages: progress.advance(weight / pages, pages=1, nbytes=weight / pages,
+                                                        phase="merging")
+
+        # Results arrive in job order, which is the order of file_paths
+        results = iter_conversions(jobs, max_workers, queue_limit, on_done=conversion_done,
+                                   timeout=convert_timeout, cancel=cancel)
+        failed = []
+        resuming = checkpoint is not None and checkpoint.resuming
+        with open(part_path, "r+b" if resuming else "wb") as output_file:
+            writer = StreamingPdfWriter(output_file, memory_budget, dedup, profile, tracer=tracer,
+                                        cancel=cancel, resume_from=checkpoint.writer_state if resuming else None)
+            for index, (pdf_path, ranges, input_path) in enumerate(zip(pdf_paths, page_ranges, file_paths)):
+                if index < done_inputs:
+                    continue
+                if pdf_path in converting:
+                    with tracer.span("wait_conversion"):
+                        result = next(results)
+                    _trace_conversion(tracer, result)
+                    if result.error:
+                        failed.append(result)
+                        continue
+                    if cache is not None:
+                        with tracer.span("cache_insert"):
+                            cache.insert(keys[pdf_path], pdf_path)
+                    if checkpoint is not None:
+                        checkpoint.converted.add(index)
+                    converted_size = os.path.getsize(pdf_path)
+                    progress.add_total(converted_size - sizes[pdf_path])
+                    sizes[pdf_path] = converted_size
+                if failed:
+                    # Keep converting to report every bad file, but stop merging
+                    continue
+                try:
+                    page_count = writer.append_file(pdf_path, on_page=page_done(sizes[pdf_path]),
+                                                    page_ranges=ranges)
+                except PageRangeError as e:
+                    raise PageRangeError(f"{os.path.basename(input_path)}: {e}") from None
+                if page_cache is not None and pdf_path not in converting and ranges is None:
+                    page_cache.put(pdf_path, page_count)
+                if checkpoint is not None and checkpoint.due(output_file):
+                    with tracer.span("checkpoint"):
+                        checkpoint.save(index + 1, writer.checkpoint(), output_file)
+            if not failed:
+                progress.advance(0, phase="finishing")
+                writer.close()
+
+        if failed:
+            details = "\n".join(f"{os.path.basename(r.input_path)}: {r.error}" for r in failed)
+            return False, f"Conversion failed for {len(failed)} file(s):\n{details}"
+        if linearize:
+            if cancel is not None:
+                cancel.check()
+            with tracer.span("linearize"):
+                linearize_in_place(part_path)
+        if checkpoint is not None:
+            checkpoint.commit(output_path)
+        else:
+            os.replace(part_path, output_path)
+        part_path = None
+        progress.finish()
+        message = f"{writer.pages_written} pages merged to {output_path}"
+        if done_inputs:
+            message += f"\nResumed after {done_inputs} of {len(pdf_paths)} files"
+        if dedup:
+            stats = writer.dedup_stats
+            message += (f"\nDeduplication: {stats['objects']} shared objects, "
+                        f"{stats['bytes_saved'] / 1024:.0f} KB saved in {stats['seconds']:.2f} s")
+        return True, message
+    except Cancelled:
+        return False, "Merge cancelled" + (" (run it again to resume)" if checkpoint is not None else "")
+    except Exception as e:
+        return False, f"Merge failed: {str(e)}"
+    finally:
+        if results is not None:
+            # Stops and waits for the conversions still running
+            results.close()
+        if writer is not None:
+            writer.abort()
+        # A resumable merge keeps its partial output for the next run
+        if part_path is not None and checkpoint is None and os.path.exists(part_path):
+            os.remove(part_path)
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
@@ -0,0 +1,424 @@
+import os
+import queue
+import re
+import signal
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from cancellation import Cancelled
+
+WD_FORMAT_PDF = 17  # Word SaveAs format code for PDF
+
+
+class ConversionTimeout(TimeoutError):
+    """A conversion did not finish in time and its instance was killed"""
+
+
+class ConverterBackend:
+    """Interface of a DOCX -> PDF converter instance managed by ConverterPool.
+
+    start() is called once before the first job, convert() for every
+    document, is_alive() as a health check between jobs and close() when
+    the instance is recycled or the pool shuts down. kill() may be called
+    from another thread while convert() runs; it must make convert()
+    return or raise promptly.
+    """
+
+    name = "base"
+    version = "0"
+
+    def start(self):
+        pass
+
+    def convert(self, input_path, output_path):
+        raise NotImplementedError
+
+    def is_alive(self):
+        return True
+
+    def close(self):
+        pass
+
+    def kill(self):
+        self.close()
+
+
+class WordBackend(ConverterBackend):
+    """Microsoft Word through COM (Windows only).
+
+    COM objects are bound to the thread that created them, so every
+    instance owns one thread that starts Word and runs all of its jobs.
+    """
+
+    name = "word"
+    version = "1"
+
+    def __init__(self):
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vpdf-word")
+        self._word = None
+        self._pid = None
+        self._killed = threading.Event()
+
+    def _call(self, fn, *args):
+        future = self._thread.submit(fn, *args)
+        # A killed Word may leave the COM call hanging, so do not wait for it
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except FutureTimeoutError:
+                if self._killed.is_set():
+                    raise RuntimeError("Word was stopped") from None
+
+    def start(self):
+        self._call(self._start)
+
+    def _start(self):
+        import comtypes
+        import comtypes.client
+
+        comtypes.CoInitialize()
+        self._word = comtypes.client.CreateObject('Word.Application')
+        self._word.Visible = False
+        self._word.DisplayAlerts = 0
+        self._pid = _word_pid(self._word)
+
+    def convert(self, input_path, output_path):
+        self._call(self._convert, os.path.abspath(input_path), os.path.abspath(output_path))
+
+    def _convert(self, input_path, output_path):
+        doc = self._word.Documents.Open(input_path, ReadOnly=True, AddToRecentFiles=False)
+        try:
+            doc.SaveAs(output_path, FileFormat=WD_FORMAT_PDF)
+        finally:
+            doc.Close(False)
+        if not os.path.exists(output_path):
+            raise RuntimeError("Output file not created")
+
+    def is_alive(self):
+        try:
+            return self._call(self._ping)
+        except Exception:
+            return False
+
+    def _ping(self):
+        self._word.Documents.Count
+        return True
+
+    def close(self):
+        try:
+            self._call(self._quit)
+        except Exception:
+            pass
+        self._thread.shutdown(wait=False)
+
+    def _quit(self):
+        if self._word is not None:
+            self._word.Quit()
+            self._word = None
+
+    def kill(self):
+        self._killed.set()
+        if self._pid is not None:
+            try:
+                os.kill(self._pid, signal.SIGTERM)
+            except OSError:
+                pass
+        self._thread.shutdown(wait=False, cancel_futures=True)
+
+
+def _word_pid(word):
+    """Process id of a Word instance, found through its (hidden) main window"""
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        caption = word.Caption
+        word.Caption = f"vpdf-{os.getpid()}-{id(word)}"
+        try:
+            hwnd = ctypes.windll.user32.FindWindowW("OpusApp", word.Caption)
+        finally:
+            word.Caption = caption
+        pid = wintypes.DWORD()
+        ctypes.windll.user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        return pid.value or None
+    except Exception:
+        return None
+
+
+class FakeBackend(ConverterBackend):
+    """In-process backend that renders the DOCX paragraphs as plain PDF text.
+
+    Used to exercise pooling, recycling and throughput on machines without
+    Word. delay simulates the conversion cost, crash_after makes the
+    instance die after that many jobs and hang_after makes it block after
+    that many jobs until it is killed.
+    """
+
+    name = "fake"
+    version = "1"
+    lines_per_page = 40
+
+    def __init__(self, delay=0.0, start_delay=0.0, crash_after=None, hang_after=None):
+        self.delay = delay
+        self.start_delay = start_delay
+        self.crash_after = crash_after
+        self.hang_after = hang_after
+        self.jobs = 0
+        self._alive = False
+        self._killed = threading.Event()
+
+    def start(self):
+        time.sleep(self.start_delay)
+        self._alive = True
+
+    def convert(self, input_path, output_path):
+        if not self._alive:
+            raise RuntimeError("Converter instance is not running")
+        if self.crash_after is not None and self.jobs >= self.crash_after:
+            self._alive = False
+            raise RuntimeError("Converter instance crashed")
+        if self.hang_after is not None and self.jobs >= self.hang_after:
+            self._killed.wait()
+        if self._killed.wait(self.delay):
+            raise RuntimeError("Converter instance was killed")
+        write_text_pdf(docx_paragraphs(input_path), output_path, self.lines_per_page)
+        self.jobs += 1
+
+    def is_alive(self):
+        return self._alive
+
+    def close(self):
+        self._alive = False
+
+    def kill(self):
+        self._alive = False
+        self._killed.set()
+
+
+def docx_paragraphs(path):
+    """Return the plain text of every paragraph of a DOCX file"""
+    with zipfile.ZipFile(path) as docx:
+        xml = docx.read("word/document.xml").decode("utf-8")
+    paragraphs = []
+    for body in re.findall(r"<w:p[ >].*?</w:p>", xml, re.S):
+        paragraphs.append("".join(re.findall(r"<w:t(?: [^>]*)?>([^<]*)</w:t>", body)))
+    return paragraphs
+
+
+def write_text_pdf(lines, output_path, lines_per_page=40):
+    """Write lines as Helvetica text, lines_per_page per page"""
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    resources = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)})
+    })
+    lines = list(lines) or [""]
+    for start in range(0, len(lines), lines_per_page):
+        page = writer.add_blank_page(612, 792)
+        text = ["BT /F1 11 Tf 14 TL 56 740 Td"]
+        for line in lines[start:start + lines_per_page]:
+            line = line.encode("latin-1", "replace").decode("latin-1")
+            line = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            text.append(f"({line}) Tj T*")
+        text.append("ET")
+        content = DecodedStreamObject()
+        content.set_data("\n".join(text).encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = resources
+    with open(output_path, "wb") as f:
+        writer.write(f)
+
+
+BACKENDS = {
+    "word": WordBackend,
+    "fake": FakeBackend,
+}
+
+
+class _PooledInstance:
+    def __init__(self, backend):
+        self.backend = backend
+        self.jobs = 0
+
+
+class ConverterPool:
+    """Keep up to size converter instances warm and reuse them across documents.
+
+    An instance is health-checked before it is handed out and replaced when
+    it has died, when a job failed and it no longer answers, or after
+    max_jobs_per_instance conversions. An instance that is still busy
+    after timeout seconds, or whose job is cancelled, is killed.
+    """
+
+    def __init__(self, backend_factory=WordBackend, size=1, max_jobs_per_instance=50, timeout=None):
+        self.backend_factory = backend_factory
+        self.size = max(1, size)
+        self.max_jobs_per_instance = max_jobs_per_instance
+        self.timeout = timeout
+        self.stats = {"started": 0, "recycled": 0, "jobs": 0, "failures": 0, "killed": 0}
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def backend_name(self):
+        return getattr(self._backend_class, "name", "custom")
+
+    @property
+    def backend_version(self):
+        return getattr(self._backend_class, "version", "0")
+
+    @property
+    def _backend_class(self):
+        # Factories may be functools.partial objects wrapping the class
+        return getattr(self.backend_factory, "func", self.backend_factory)
+
+    def warm_up(self):
+        """Start every instance now instead of on first use"""
+        instances = [self._acquire() for _ in range(self.size)]
+        for instance in instances:
+            self._idle.put(instance)
+
+    def convert(self, input_path, output_path, retries=1, timeout=None, cancel=None):
+        """Convert input_path to output_path on a pooled instance.
+
+        If the instance dies during the job, the job is retried up to
+        retries times on a fresh instance. timeout (default: the pool's)
+        raises ConversionTimeout and cancelling the CancelToken cancel
+        raises Cancelled; both kill the instance and remove any partial
+        output.
+        """
+        if cancel is not None:
+            cancel.check()
+        timeout = timeout if timeout is not None else self.timeout
+        instance = self._acquire()
+        stopped = []
+
+        def stop(reason):
+            if not stopped:
+                stopped.append(reason)
+                self._kill(instance)
+
+        watchdog = None
+        if timeout:
+            watchdog = threading.Timer(timeout, stop, ("timeout",))
+            watchdog.daemon = True
+            watchdog.start()
+        unregister = cancel.on_cancel(lambda: stop("cancelled")) if cancel is not None else None
+        converted = healthy = False
+        try:
+            instance.backend.convert(input_path, output_path)
+            converted = True
+        except Exception:
+            with self._lock:
+                self.stats["failures"] += 1
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            if stopped == ["timeout"]:
+                raise ConversionTimeout(f"Conversion did not finish within {timeout:g} s") from None
+            if stopped:
+                raise Cancelled() from None
+            # A bad document is not a reason to throw away a working instance
+            healthy = self._is_alive(instance)
+            if healthy or retries <= 0:
+                raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            if unregister is not None:
+                unregister()
+            healthy = healthy or (converted and not stopped)
+            instance.jobs += 1
+            with self._lock:
+                self.stats["jobs"] += 1
+            self._release(instance, healthy)
+        if not converted:
+            self.convert(input_path, output_path, retries - 1, timeout, cancel)
+
+    def close(self):
+        """Shut down all idle instances"""
+        self._closed = True
+        while True:
+            try:
+                instance = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._retire(instance)
+
+    def _acquire(self):
+        while True:
+            instance = self._take()
+            if self._is_alive(instance):
+                return instance
+            self._retire(instance)
+
+    def _take(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                return self._start_instance()
+            # Poll so that a retired instance frees a slot for a waiter
+            try:
+                return self._idle.get(timeout=0.05)
+            except queue.Empty:
+                continue
+
+    def _start_instance(self):
+        try:
+            backend = self.backend_factory()
+            backend.start()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            self.stats["started"] += 1
+        return _PooledInstance(backend)
+
+    def _release(self, instance, healthy):
+        if self._closed or not healthy or instance.jobs >= self.max_jobs_per_instance:
+            self._retire(instance)
+        else:
+            self._idle.put(instance)
+
+    def _kill(self, instance):
+        with self._lock:
+            self.stats["killed"] += 1
+        try:
+            instance.backend.kill()
+        except Exception:
+            pass
+
+    def _retire(self, instance):
+        try:
+            instance.backend.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+            self.stats["recycled"] += 1
+
+    @staticmethod
+    def _is_alive(instance):
+        try:
+            return instance.backend.is_alive()
+        except Exception:
+            return False
@@ -1,17 +1,26 @@
 # gui.py
 import sys
 import os
+import multiprocessing
+import time
+from collections import OrderedDict
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
     QHBoxLayout, QPushButton, QLineEdit, QLabel,
-    QFileDialog, QTabWidget, QListWidget, QListWidgetItem,
-    QMessageBox, QProgressBar
+    QFileDialog, QTabWidget, QListView, QAbstractItemView,
+    QMessageBox, QProgressBar, QInputDialog, QCheckBox
 )
 from PyQt5.QtCore import QDir
-from PyQt5.QtGui import QPixmap, QPalette, QBrush, QFont
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtGui import QPixmap, QPalette, QBrush, QFont, QIcon, QColor
+from PyQt5.QtCore import Qt, QThread, QTimer, QSize, pyqtSignal, QAbstractListModel, QModelIndex
 from PyQt5.QtGui import QCloseEvent
-from converter_logic import convert_docx_to_pdf, process_and_merge_mixed_files
+# converter_logic dan pypdf diimpor oleh worker saat pertama dipakai, jendela terbuka tanpa memuatnya
+from cancellation import CancelToken
+from page_cache import PageCountCache
+from page_ranges import PageRangeError, parse_page_ranges, resolve_page_ranges
+from progress import format_eta
+from thumbnails import ThumbnailService
+from tracing import Tracer
 
 def resource_path(relative_path):
     """ Mendapatkan path absolut ke sumber daya, berfungsi untuk mode pengembangan dan PyInstaller """
@@ -23,7 +32,34 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
-class ConversionWorker(QThread):
+class TracedWorker(QThread):
+    """Worker yang mengirim rincian waktu per tahap selama pekerjaan berjalan"""
+    # Rincian dikirim paling sering sekali per interval ini (detik)
+    STAGE_INTERVAL = 0.25
+
+    stage = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        # Hanya total per tahap yang disimpan, memori tidak bertambah per halaman
+        self.tracer = Tracer(on_span=self._on_span, keep_events=False)
+        self.cancel_token = CancelToken()
+        self._last_stage = 0.0
+
+    def cancel(self):
+        # Mesin berhenti di antara file/halaman, konversi yang macet dihentikan paksa
+        self.cancel_token.cancel()
+
+    def _on_span(self, name, seconds):
+        now = time.monotonic()
+        if now - self._last_stage >= self.STAGE_INTERVAL:
+            self._last_stage = now
+            self.stage.emit(self.tracer.format_summary())
+
+    def _emit_final_stage(self):
+        self.stage.emit(self.tracer.format_summary())
+
+class ConversionWorker(TracedWorker):
     progress = pyqtSignal(int)
     finished = pyqtSignal(bool, str)
 
@@ -33,26 +69,316 @@ class ConversionWorker(QThread):
         self.output_dir = output_dir
 
     def run(self):
-        success, message = convert_docx_to_pdf(self.input_path, self.output_dir, self.progress.emit)
+        from converter_logic import convert_docx_to_pdf
+
+        success, message = convert_docx_to_pdf(self.input_path, self.output_dir, self.progress.emit,
+                                               tracer=self.tracer, cancel=self.cancel_token)
+        self._emit_final_stage()
         self.finished.emit(success, message)
 
-class MergeWorker(QThread):
+class MergeWorker(TracedWorker):
     progress = pyqtSignal(int)
+    # Teks status: tahap, halaman, kecepatan dan perkiraan sisa waktu
+    throughput = pyqtSignal(str)
+    # Laporan pemeriksaan awal: daftar preflight.FileReport
+    preflight_done = pyqtSignal(object)
     finished = pyqtSignal(bool, str)
 
-    def __init__(self, file_paths, output_path):
+    PHASES = {"checking": "Verificando", "converting": "Convirtiendo", "merging": "Combinando",
+              "finishing": "Finalizando", "done": "Completado"}
+
+    def __init__(self, file_paths, output_path, page_ranges=None, resumable=False):
         super().__init__()
         self.file_paths = file_paths
         self.output_path = output_path
+        self.page_ranges = page_ranges
+        self.resumable = resumable
+
+    def _on_progress(self, update):
+        # Dipanggil paling sering tiap 0,25 detik oleh mesin penggabung
+        self.progress.emit(update.percent)
+        text = (f"Estado: {self.PHASES.get(update.phase, update.phase)}... {update.pages} páginas, "
+                f"{update.pages_per_sec:.1f} pág/s, {update.bytes_per_sec / 1e6:.1f} MB/s")
+        if update.eta is not None and update.phase != "done":
+            text += f", quedan {format_eta(update.eta)}"
+        self.throughput.emit(text)
 
     def run(self):
-        success, message = process_and_merge_mixed_files(self.file_paths, self.output_path)
+        from converter_logic import process_and_merge_mixed_files
+
+        success, message = process_and_merge_mixed_files(self.file_paths, self.output_path,
+                                                         progress_callback=self._on_progress,
+                                                         tracer=self.tracer,
+                                                         cancel=self.cancel_token,
+                                                         page_ranges=self.page_ranges,
+                                                         resumable=self.resumable,
+                                                         on_preflight=self.preflight_done.emit)
+        self._emit_final_stage()
         self.finished.emit(success, message)
 
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+class FileEntry:
+    """Satu baris daftar penggabungan: jalur file, metadatanya, halaman yang dipilih dan hasil pemeriksaan"""
+    __slots__ = ("path", "size", "pages", "status", "ranges", "report")
+
+    def __init__(self, path):
+        self.path = path
+        self.size = None
+        self.pages = None
+        self.status = "Pendiente"
+        self.ranges = None
+        self.report = None   # preflight.FileReport, None jika belum diperiksa
+
+    def selected_pages(self):
+        """Jumlah halaman yang akan digabung, None jika belum diketahui atau rentangnya tidak cocok"""
+        if self.pages is None:
+            return None
+        try:
+            return len(resolve_page_ranges(self.ranges, self.pages))
+        except PageRangeError:
+            return None
+
+class FileListModel(QAbstractListModel):
+    """Model daftar file untuk QListView: hanya baris yang terlihat yang digambar.
+
+    Metadata yang datang dari latar belakang dikumpulkan dan view
+    diberi tahu paling sering sekali per FLUSH_MS, bukan per file.
+    Thumbnail halaman pertama diminta hanya saat barisnya digambar dan
+    dirender di latar belakang oleh ThumbnailService.
+    """
+    FLUSH_MS = 100
+    # Jumlah ikon thumbnail yang disimpan di memori
+    MAX_ICONS = 300
+
+    # Total halaman/ukuran berubah
+    totals_changed = pyqtSignal(int, int, int)
+    # Dipancarkan dari thread latar belakang, diterima di thread GUI: jalur, PNG (atau None)
+    thumbnail_ready = pyqtSignal(str, object)
+
+    def __init__(self, parent=None, thumbnails=None):
+        super().__init__(parent)
+        self.thumbnails = thumbnails
+        self._icons = OrderedDict()   # jalur -> QIcon, yang paling lama dipakai di depan
+        self._no_thumbnail = set()
+        self.thumbnail_ready.connect(self._on_thumbnail)
+        self._entries = []
+        self._by_path = {}   # jalur -> daftar FileEntry (file yang sama boleh muncul dua kali)
+        self._dirty = False
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(self.FLUSH_MS)
+        self._flush_timer.timeout.connect(self._flush)
+        self._flush_timer.start()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._entries[index.row()]
+        if role == Qt.DisplayRole:
+            details = [entry.status if entry.pages is None else f"{entry.pages} páginas"]
+            if entry.size is not None:
+                details.append(format_size(entry.size))
+            if entry.ranges:
+                details.append(f"páginas {entry.ranges}")
+                if entry.pages is not None and entry.selected_pages() is None:
+                    details.append("fuera de rango")
+            if entry.report is not None:
+                if entry.report.errors:
+                    details.append(f"ERROR: {entry.report.errors[0]}")
+                else:
+                    details.append("verificado" + (" con avisos" if entry.report.warnings else ""))
+            return f"{index.row() + 1}. {os.path.basename(entry.path)}  ({', '.join(details)})"
+        if role == Qt.DecorationRole:
+            return self._icon(entry.path)
+        if role == Qt.ForegroundRole and entry.report is not None:
+            if entry.report.errors:
+                return QColor("#dc3545")
+            if entry.report.warnings:
+                return QColor("#b8860b")
+            return None
+        if role == Qt.ToolTipRole:
+            if entry.report is not None and (entry.report.errors or entry.report.warnings):
+                # Semua temuan pemeriksaan, satu per baris
+                return "\n".join([entry.path] + [f"Error: {e}" for e in entry.report.errors]
+                                  + [f"Aviso: {w}" for w in entry.report.warnings])
+            return entry.path
+        if role == Qt.UserRole:
+            return entry.path
+        return None
+
+    def paths(self):
+        return [entry.path for entry in self._entries]
+
+    def page_ranges(self):
+        return [entry.ranges for entry in self._entries]
+
+    def ranges_at(self, row):
+        return self._entries[row].ranges or ""
+
+    def set_page_ranges(self, rows, spec):
+        """Pilih halaman baris-baris rows, misalnya "1-3,10,-1"; spec kosong berarti semua halaman"""
+        spec = spec.strip()
+        parse_page_ranges(spec)
+        for row in rows:
+            self._entries[row].ranges = spec or None
+            # Rentang baru belum diperiksa
+            self._entries[row].report = None
+        self._dirty = True
+
+    def _icon(self, path):
+        icon = self._icons.get(path)
+        if icon is not None:
+            self._icons.move_to_end(path)
+            return icon
+        if self.thumbnails is None or path in self._no_thumbnail or not path.lower().endswith('.pdf'):
+            return None
+        # Tidak pernah menunggu render: jika belum siap, ikon datang lewat thumbnail_ready
+        png = self.thumbnails.get(path, 0, lambda p, page, data: self.thumbnail_ready.emit(p, data))
+        if png is not None:
+            return self._store_icon(path, png)
+        return None
+
+    def _store_icon(self, path, png):
+        pixmap = QPixmap()
+        if not pixmap.loadFromData(png, "PNG"):
+            self._no_thumbnail.add(path)
+            return None
+        icon = self._icons[path] = QIcon(pixmap)
+        while len(self._icons) > self.MAX_ICONS:
+            self._icons.popitem(last=False)
+        return icon
+
+    def _on_thumbnail(self, path, png):
+        if png is None:
+            self._no_thumbnail.add(path)
+        elif path in self._by_path:
+            self._store_icon(path, png)
+            self._dirty = True
+
+    def add_files(self, paths):
+        first = len(self._entries)
+        self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        for path in paths:
+            entry = FileEntry(path)
+            self._entries.append(entry)
+            self._by_path.setdefault(path, []).append(entry)
+        self.endInsertRows()
+        self._dirty = True
+
+    def remove_rows(self, rows):
+        # Dari bawah ke atas supaya nomor baris yang tersisa tetap benar
+        for row in sorted(set(rows), reverse=True):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            entry = self._entries.pop(row)
+            self._by_path[entry.path].remove(entry)
+            if not self._by_path[entry.path]:
+                del self._by_path[entry.path]
+            self.endRemoveRows()
+        self._dirty = True
+
+    def move_row(self, row, delta):
+        """Tukar baris dengan tetangganya (delta -1 atau 1), O(1) tanpa membangun ulang apa pun"""
+        other = row + delta
+        if not (0 <= row < len(self._entries) and 0 <= other < len(self._entries)):
+            return False
+        # Qt mengharapkan posisi tujuan sebelum baris dipindahkan
+        self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), other + 1 if delta > 0 else other)
+        self._entries[row], self._entries[other] = self._entries[other], self._entries[row]
+        self.endMoveRows()
+        # Nomor urut di teks kedua baris ikut berubah
+        top = min(row, other)
+        self.dataChanged.emit(self.index(top), self.index(top + 1))
+        return True
+
+    def set_metadata(self, path, size, pages, error):
+        for entry in self._by_path.get(path, ()):
+            entry.size = size
+            entry.pages = pages if pages >= 0 else None
+            entry.status = f"Error: {error}" if error else ("Listo" if pages >= 0 else "DOCX")
+        self._dirty = True
+
+    def set_preflight(self, reports):
+        """Simpan laporan pemeriksaan awal di baris-baris file yang jalurnya cocok"""
+        for report in reports:
+            for entry in self._by_path.get(report.path, ()):
+                entry.report = report
+        self._dirty = True
+
+    def totals(self):
+        pages = sum(e.selected_pages() or 0 for e in self._entries)
+        size = sum(e.size for e in self._entries if e.size is not None)
+        return len(self._entries), pages, size
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        if self._entries:
+            # View hanya menggambar ulang baris yang terlihat
+            self.dataChanged.emit(self.index(0), self.index(len(self._entries) - 1))
+        self.totals_changed.emit(*self.totals())
+
+class MetadataWorker(QThread):
+    """Membaca ukuran dan jumlah halaman file di thread pool tanpa memblokir UI"""
+    # jalur, ukuran, halaman (-1 jika bukan PDF), pesan error
+    loaded = pyqtSignal(str, 'qint64', int, str)
+
+    def __init__(self, file_paths, page_cache):
+        super().__init__()
+        self.file_paths = file_paths
+        self.page_cache = page_cache
+
+    def _on_counted(self, index, path, count, error):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        self.loaded.emit(path, size, -1 if count is None else count, error or "")
+
+    def run(self):
+        pdf_files = [f for f in self.file_paths if f.lower().endswith('.pdf')]
+        for path in self.file_paths:
+            if not path.lower().endswith('.pdf'):
+                self._on_counted(None, path, None, None)
+        self.page_cache.get_page_counts(pdf_files, callback=self._on_counted)
+        self.page_cache.save()
+
+class PreflightWorker(QThread):
+    """Memeriksa semua file (rusak, terenkripsi, terpotong) secara paralel tanpa menggabungkan"""
+    # Daftar preflight.FileReport
+    checked = pyqtSignal(object)
+
+    def __init__(self, file_paths, page_ranges):
+        super().__init__()
+        self.file_paths = file_paths
+        self.page_ranges = page_ranges
+
+    def run(self):
+        from preflight import run_preflight
+
+        self.checked.emit(run_preflight(self.file_paths, self.page_ranges))
+
 class FileConverterApp(QMainWindow):
+    # Batas waktu menunggu pekerjaan yang dibatalkan saat jendela ditutup (ms)
+    CANCEL_WAIT_MS = 10000
+    # Logo judul 90 px yang sudah diperkecil saat build (build_assets.py)
+    LOGO_ASSET = "assets/logo_90.png"
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("VPDF - DOCX/PDF Utility")
+
+        # Jumlah halaman disimpan antar sesi, dipakai oleh daftar penggabungan
+        self.page_cache = PageCountCache.load()
+        self.metadata_workers = []
+        self.thumbnails = ThumbnailService()
         self.setGeometry(100, 100, 800, 600)
 
         # Atur latar belakang jendela
@@ -77,13 +403,15 @@ class FileConverterApp(QMainWindow):
 
         title_layout.addStretch()
 
-        # Logo
+        # Logo, sudah diperkecil oleh build_assets.py; diperkecil di sini hanya jika belum dibuat
         self.logo_label = QLabel()
-        logo_path = resource_path("assets/logo vibia.png")
-        pixmap = QPixmap(logo_path)
+        pixmap = QPixmap(resource_path(self.LOGO_ASSET))
+        if pixmap.isNull():
+            pixmap = QPixmap(resource_path("assets/logo vibia.png"))
+            if not pixmap.isNull():
+                pixmap = pixmap.scaled(90,90, Qt.KeepAspectRatio, Qt.SmoothTransformation)
         if not pixmap.isNull():
-            scaled_pixmap = pixmap.scaled(90,90, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.logo_label.setPixmap(scaled_pixmap)
+            self.logo_label.setPixmap(pixmap)
         else:
             self.logo_label.hide()
         title_layout.addWidget(self.logo_label)
@@ -196,18 +524,18 @@ class FileConverterApp(QMainWindow):
                 color: #333333;
                 font-weight: bold;
             }
-            QListWidget {
+            QListView {
                 background-color: #ffffff;
                 border: 1px solid #ced4da;
                 border-radius: 5px;
                 padding: 5px;
                 color: #333333;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 5px;
                 border-bottom: 1px solid #dee2e6;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #6c757d;
                 color: white;
             }
@@ -255,6 +583,12 @@ class FileConverterApp(QMainWindow):
         self.btn_convert.clicked.connect(self._start_conversion)
         layout.addWidget(self.btn_convert)
 
+        # Tombol Batal
+        self.btn_cancel_convert = QPushButton("Cancelar")
+        self.btn_cancel_convert.setEnabled(False)
+        self.btn_cancel_convert.clicked.connect(self._cancel_conversion)
+        layout.addWidget(self.btn_cancel_convert)
+
         # Progress Bar
         self.convert_progress_bar = QProgressBar()
         self.convert_progress_bar.setVisible(False)
@@ -264,6 +598,11 @@ class FileConverterApp(QMainWindow):
         self.convert_status_label = QLabel("Estado: Listo")
         layout.addWidget(self.convert_status_label)
 
+        # Rincian waktu per tahap
+        self.convert_stage_label = QLabel("")
+        self.convert_stage_label.setStyleSheet("color: #6c757d; font-size: 11px;")
+        layout.addWidget(self.convert_stage_label)
+
         layout.addStretch(1)
 
     def _select_docx_file(self):
@@ -290,19 +629,32 @@ class FileConverterApp(QMainWindow):
 
         self.convert_status_label.setText("Estado: Convirtiendo...")
         self.btn_convert.setEnabled(False)
+        self.btn_cancel_convert.setEnabled(True)
         self.convert_progress_bar.setVisible(True)
         self.convert_progress_bar.setValue(0)
+        self.convert_stage_label.setText("")
 
         # Start worker thread
         self.conversion_worker = ConversionWorker(input_path, output_dir)
         self.conversion_worker.progress.connect(self.convert_progress_bar.setValue)
+        self.conversion_worker.stage.connect(self.convert_stage_label.setText)
         self.conversion_worker.finished.connect(self._on_conversion_finished)
         self.conversion_worker.start()
 
+    def _cancel_conversion(self):
+        if self._is_running(getattr(self, "conversion_worker", None)):
+            self.conversion_worker.cancel()
+            self.btn_cancel_convert.setEnabled(False)
+            self.convert_status_label.setText("Estado: Cancelando...")
+
     def _on_conversion_finished(self, success, message):
         self.convert_progress_bar.setVisible(False)
         self.btn_convert.setEnabled(True)
+        self.btn_cancel_convert.setEnabled(False)
 
+        if self.conversion_worker.cancel_token.cancelled:
+            self.convert_status_label.setText("Estado: Cancelado")
+            return
         if success:
             QMessageBox.information(self, "Éxito", f"¡Conversión exitosa!\n{message}")
         else:
@@ -321,9 +673,21 @@ class FileConverterApp(QMainWindow):
 
         # Daftar File Input
         layout.addWidget(QLabel("Lista de archivos de entrada (.docx o .pdf):"))
-        self.file_list_widget = QListWidget()
-        self.file_list_widget.setMaximumHeight(200)
-        layout.addWidget(self.file_list_widget)
+        self.file_list_model = FileListModel(self, self.thumbnails)
+        self.file_list_view = QListView()
+        self.file_list_view.setModel(self.file_list_model)
+        self.file_list_view.setIconSize(QSize(32, 32))
+        self.file_list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        # Semua baris sama tinggi: view tidak perlu mengukur ribuan baris
+        self.file_list_view.setUniformItemSizes(True)
+        self.file_list_view.setMaximumHeight(200)
+        layout.addWidget(self.file_list_view)
+
+        self.merge_totals_label = QLabel("")
+        self.file_list_model.totals_changed.connect(
+            lambda files, pages, size: self.merge_totals_label.setText(
+                f"Total: {files} archivos, {pages} páginas, {format_size(size)}"))
+        layout.addWidget(self.merge_totals_label)
 
         # Tombol Aksi untuk Daftar
         h_layout_actions = QHBoxLayout()
@@ -335,13 +699,39 @@ class FileConverterApp(QMainWindow):
         self.btn_remove_file.clicked.connect(self._remove_selected_file)
         h_layout_actions.addWidget(self.btn_remove_file)
 
+        self.btn_move_up = QPushButton("Subir")
+        self.btn_move_up.clicked.connect(lambda: self._move_selected_file(-1))
+        h_layout_actions.addWidget(self.btn_move_up)
+
+        self.btn_move_down = QPushButton("Bajar")
+        self.btn_move_down.clicked.connect(lambda: self._move_selected_file(1))
+        h_layout_actions.addWidget(self.btn_move_down)
+
+        self.btn_page_ranges = QPushButton("Páginas...")
+        self.btn_page_ranges.clicked.connect(self._choose_page_ranges)
+        h_layout_actions.addWidget(self.btn_page_ranges)
+
+        self.btn_check_files = QPushButton("Verificar archivos")
+        self.btn_check_files.clicked.connect(self._check_files)
+        h_layout_actions.addWidget(self.btn_check_files)
+
         layout.addLayout(h_layout_actions)
 
+        # Penggabungan yang dapat dilanjutkan menyimpan kemajuannya di samping file output
+        self.check_resumable = QCheckBox("Reanudable: si se interrumpe, continuar donde se quedó")
+        layout.addWidget(self.check_resumable)
+
         # Tombol Gabung
         self.btn_merge = QPushButton("Comenzar a combinar en PDF")
         self.btn_merge.clicked.connect(self._start_merging)
         layout.addWidget(self.btn_merge)
 
+        # Tombol Batal
+        self.btn_cancel_merge = QPushButton("Cancelar")
+        self.btn_cancel_merge.setEnabled(False)
+        self.btn_cancel_merge.clicked.connect(self._cancel_merging)
+        layout.addWidget(self.btn_cancel_merge)
+
         # Progress Bar
         self.merge_progress_bar = QProgressBar()
         self.merge_progress_bar.setVisible(False)
@@ -351,6 +741,11 @@ class FileConverterApp(QMainWindow):
         self.merge_status_label = QLabel("Estado: Listo")
         layout.addWidget(self.merge_status_label)
 
+        # Rincian waktu per tahap
+        self.merge_stage_label = QLabel("")
+        self.merge_stage_label.setStyleSheet("color: #6c757d; font-size: 11px;")
+        layout.addWidget(self.merge_stage_label)
+
         layout.addStretch(1)
         
     def _add_file_to_merge_list(self):
@@ -362,19 +757,69 @@ class FileConverterApp(QMainWindow):
             "Documentos (*.docx *.pdf)"
         )
         if files:
-            for file_path in files:
-                # Tambahkan jalur file ke QListWidget
-                QListWidgetItem(file_path, self.file_list_widget)
+            self.file_list_model.add_files(files)
             self.merge_status_label.setText(f"Estado: Agregado {len(files)} archivo")
 
+            # Ukuran dan jumlah halaman dibaca di latar belakang, baris diperbarui saat hasilnya datang
+            worker = MetadataWorker(files, self.page_cache)
+            worker.loaded.connect(self.file_list_model.set_metadata)
+            worker.finished.connect(lambda: self.metadata_workers.remove(worker))
+            self.metadata_workers.append(worker)
+            worker.start()
+
     def _remove_selected_file(self):
-        for item in self.file_list_widget.selectedItems():
-            self.file_list_widget.takeItem(self.file_list_widget.row(item))
+        rows = [index.row() for index in self.file_list_view.selectionModel().selectedRows()]
+        self.file_list_model.remove_rows(rows)
         self.merge_status_label.setText("Estado: Archivo eliminado")
 
+    def _move_selected_file(self, delta):
+        index = self.file_list_view.currentIndex()
+        if index.isValid() and self.file_list_model.move_row(index.row(), delta):
+            self.file_list_view.setCurrentIndex(self.file_list_model.index(index.row() + delta))
+
+    def _choose_page_ranges(self):
+        rows = sorted(index.row() for index in self.file_list_view.selectionModel().selectedRows())
+        if not rows:
+            QMessageBox.warning(self, "Advertencia", "Seleccione uno o más archivos.")
+            return
+        spec, ok = QInputDialog.getText(
+            self, "Páginas",
+            "Páginas a combinar, por ejemplo 1-3,10,-1 (-1 es la última).\nVacío para todas:",
+            text=self.file_list_model.ranges_at(rows[0]))
+        if not ok:
+            return
+        try:
+            self.file_list_model.set_page_ranges(rows, spec)
+        except PageRangeError as e:
+            QMessageBox.warning(self, "Advertencia", str(e))
+
+    def _check_files(self):
+        file_paths = self.file_list_model.paths()
+        if not file_paths:
+            QMessageBox.warning(self, "Advertencia", "Por favor, agregue un archivo para combinar.")
+            return
+        if self._is_running(getattr(self, "preflight_worker", None)):
+            return
+        self.btn_check_files.setEnabled(False)
+        self.merge_status_label.setText("Estado: Verificando archivos...")
+        self.preflight_worker = PreflightWorker(file_paths, self.file_list_model.page_ranges())
+        self.preflight_worker.checked.connect(self._on_files_checked)
+        self.preflight_worker.start()
+
+    def _on_files_checked(self, reports):
+        self.btn_check_files.setEnabled(True)
+        self.file_list_model.set_preflight(reports)
+        bad = sum(1 for report in reports if not report.ok)
+        warned = sum(1 for report in reports if report.ok and report.warnings)
+        if bad:
+            self.merge_status_label.setText(f"Estado: {bad} archivo(s) con errores, vea la lista")
+        else:
+            self.merge_status_label.setText(f"Estado: {len(reports)} archivo(s) verificados"
+                                            + (f", {warned} con avisos" if warned else ""))
+
     def _start_merging(self):
-        # Kumpulkan semua jalur file dari QListWidget
-        file_paths = [self.file_list_widget.item(i).text() for i in range(self.file_list_widget.count())]
+        # Kumpulkan semua jalur file dari model daftar
+        file_paths = self.file_list_model.paths()
 
         if not file_paths:
             QMessageBox.warning(self, "Advertencia", "Por favor, agregue un archivo para combinar.")
@@ -393,23 +838,49 @@ class FileConverterApp(QMainWindow):
 
         self.merge_status_label.setText("Estado: Procesando y Combinando...")
         self.btn_merge.setEnabled(False)
+        self.btn_cancel_merge.setEnabled(True)
         self.merge_progress_bar.setVisible(True)
         self.merge_progress_bar.setValue(0)
+        self.merge_stage_label.setText("")
 
         # Start worker thread
-        self.merge_worker = MergeWorker(file_paths, output_path)
+        self.merge_worker = MergeWorker(file_paths, output_path, self.file_list_model.page_ranges(),
+                                        resumable=self.check_resumable.isChecked())
         self.merge_worker.progress.connect(self.merge_progress_bar.setValue)
+        self.merge_worker.throughput.connect(self.merge_status_label.setText)
+        self.merge_worker.stage.connect(self.merge_stage_label.setText)
+        self.merge_worker.preflight_done.connect(self.file_list_model.set_preflight)
         self.merge_worker.finished.connect(self._on_merge_finished)
         self.merge_worker.start()
 
+    def _cancel_merging(self):
+        if self._is_running(getattr(self, "merge_worker", None)):
+            self.merge_worker.cancel()
+            self.btn_cancel_merge.setEnabled(False)
+            self.merge_status_label.setText("Estado: Cancelando...")
+
     def _on_merge_finished(self, success, message):
         self.merge_progress_bar.setVisible(False)
         self.btn_merge.setEnabled(True)
-
+        self.btn_cancel_merge.setEnabled(False)
+
+        # Beritahu pengguna bila kemajuan disimpan untuk dilanjutkan
+        kept = ""
+        if not success and self.merge_worker.resumable:
+            from merge_checkpoint import partial_directory
+
+            if os.path.isdir(partial_directory(self.merge_worker.output_path)):
+                kept = (f"El progreso se guardó en {partial_directory(self.merge_worker.output_path)}; "
+                        "combine los mismos archivos de nuevo para continuar o borre esa carpeta.")
+        if self.merge_worker.cancel_token.cancelled:
+            self.merge_status_label.setText("Estado: Cancelado" + (", progreso guardado" if kept else ""))
+            if kept:
+                QMessageBox.information(self, "Cancelado", kept)
+            return
         if success:
             QMessageBox.information(self, "Éxito", f"¡Fusión exitosa!\n{message}")
         else:
-            QMessageBox.critical(self, "Fallido", f"¡Fusión fallida!\n{message}")
+            QMessageBox.critical(self, "Fallido", f"¡Fusión fallida!\n{message}" + (f"\n\n{kept}" if kept else ""))
 
         self.merge_status_label.setText("Estado: Completado")
 
@@ -424,11 +895,29 @@ class FileConverterApp(QMainWindow):
         )
 
         if reply == QMessageBox.Yes:
+            # Batalkan pekerjaan yang masih berjalan dan tunggu sampai sumber dayanya dilepas
+            workers = [w for w in (getattr(self, "conversion_worker", None),
+                                   getattr(self, "merge_worker", None)) if self._is_running(w)]
+            for worker in workers:
+                worker.cancel()
+            for worker in workers:
+                worker.wait(self.CANCEL_WAIT_MS)
+            preflight_worker = getattr(self, "preflight_worker", None)
+            if self._is_running(preflight_worker):
+                # Pemeriksaan hanya membaca dan selesai dalam beberapa detik
+                preflight_worker.wait(self.CANCEL_WAIT_MS)
+            self.thumbnails.close()
             event.accept()
         else:
             event.ignore()
 
+    @staticmethod
+    def _is_running(worker):
+        return worker is not None and worker.isRunning()
+
 if __name__ == '__main__':
+    # Diperlukan oleh proses konversi paralel pada build PyInstaller
+    multiprocessing.freeze_support()
     # Untuk pengujian cepat, tapi sebaiknya jalankan dari main.py
     app = QApplication(sys.argv)
     window = FileConverterApp()
@@ -0,0 +1,485 @@
+"""Local HTTP service for convert and merge jobs, built on asyncio streams only.
+
+    POST   /uploads?name=contract.pdf    raw file body -> {"id": ...}
+    POST   /jobs/convert                 {"input": upload id}
+    POST   /jobs/merge                   {"inputs": [upload id | {"upload": id, "pages": "1-3"}, ...],
+                                          "dedup": false, "profile": null, "linearize": false}
+    GET    /jobs/<id>                    status, progress and timings
+    GET    /jobs/<id>/result             the PDF, once the job is done
+    DELETE /jobs/<id>                    cancel a job or drop its result
+    DELETE /uploads/<id>                 drop an upload (409 while a job uses it)
+    GET    /metrics                      queue, latency and throughput (Prometheus text format)
+
+Uploads and results are streamed between the socket and disk in chunks,
+never held in memory. At most max_queue jobs wait for the workers; more
+are refused with 503 and a Retry-After header. Finished jobs and unused
+uploads are removed after result_ttl seconds.
+"""
+import asyncio
+import json
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import converter_logic
+from cancellation import CancelToken
+from linearize import UNAVAILABLE_MESSAGE, linearize_available
+from output_profiles import PROFILES
+from page_ranges import PageRangeError, parse_page_ranges
+
+DEFAULT_PORT = 8765
+CHUNK_SIZE = 256 * 1024
+MAX_JSON_BYTES = 1024 * 1024
+DEFAULT_MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+
+# Upper bounds of the queue wait histogram, in seconds
+LATENCY_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+_ID_RE = re.compile(r"^[0-9a-f]{16}$")
+
+_REASONS = {200: "OK", 201: "Created", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 409: "Conflict", 411: "Length Required", 413: "Payload Too Large",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Job:
+    """A queued, running or finished job and its timings"""
+
+    def __init__(self, job_id, kind, inputs, options, output_path):
+        self.id = job_id
+        self.kind = kind
+        self.inputs = inputs          # list of (path, page range spec or None)
+        self.options = options
+        self.output_path = output_path
+        self.state = "queued"
+        self.message = None
+        self.progress = 0
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel = CancelToken()
+
+    def status(self):
+        status = {"id": self.id, "kind": self.kind, "state": self.state, "progress": self.progress,
+                  "queued_at": self.queued_at, "started_at": self.started_at, "finished_at": self.finished_at}
+        if self.message is not None:
+            status["message" if self.state == "done" else "error"] = self.message
+        if self.state == "done":
+            status["result"] = f"/jobs/{self.id}/result"
+        return status
+
+
+class JobService:
+    """The HTTP job service; see the module docstring for the endpoints.
+
+    Jobs run on `workers` threads, which call converter_logic (conversions
+    themselves use its process pool). use_cache and convert_timeout are
+    passed on to converter_logic.
+    """
+
+    def __init__(self, work_dir=None, workers=2, max_queue=16, max_upload_bytes=DEFAULT_MAX_UPLOAD_BYTES,
+                 result_ttl=3600, use_cache=True, convert_timeout=None):
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="vpdf_service_")
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.max_upload_bytes = max_upload_bytes
+        self.result_ttl = result_ttl
+        self.use_cache = use_cache
+        self.convert_timeout = convert_timeout
+        self.jobs = {}
+        self.uploads = {}   # id -> (path, original name, time of upload)
+        self.metrics = {"uploaded_bytes": 0, "rejected": 0, "output_bytes": 0, "wait_sum": 0.0, "wait_count": 0,
+                        "run_sum": 0.0, "run_count": 0, "finished": {}}
+        self._latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._finish_times = deque()  # finish times of the last minute, for the rate
+        self._queue = None
+        self._waiting = 0   # queued jobs not cancelled yet, limited to max_queue
+        self._executor = None
+        for name in ("uploads", "jobs"):
+            os.makedirs(os.path.join(self.work_dir, name), exist_ok=True)
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, cancel=None, on_ready=None):
+        """Serve until the CancelToken cancel is cancelled"""
+        # Unbounded: a job cancelled while queued stays in it but frees its slot at once
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="vpdf-job")
+        stopped = asyncio.Event()
+        if cancel is not None:
+            loop = asyncio.get_running_loop()
+            cancel.on_cancel(lambda: loop.call_soon_threadsafe(stopped.set))
+        server = await asyncio.start_server(self._handle, host, port)
+        tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        tasks.append(asyncio.create_task(self._clean_up()))
+        if on_ready is not None:
+            on_ready(server.sockets[0].getsockname())
+        try:
+            async with server:
+                await stopped.wait()
+        finally:
+            for job in self.jobs.values():
+                job.cancel.cancel()
+            for task in tasks:
+                task.cancel()
+            self._executor.shutdown(wait=True)
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, path, query, headers = await asyncio.wait_for(_read_head(reader), 30)
+                await self._route(method, path, query, headers, reader, writer)
+            except HttpError as e:
+                await _send_json(writer, e.status, {"error": str(e)}, e.headers)
+            except (asyncio.TimeoutError, ValueError):
+                await _send_json(writer, 400, {"error": "Malformed request"})
+            except (ConnectionError, asyncio.IncompleteReadError):
+                raise
+            except Exception as e:
+                await _send_json(writer, 500, {"error": str(e) or type(e).__name__})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, query, headers, reader, writer):
+        parts = [part for part in path.split("/") if part]
+        if parts == ["uploads"] and method == "POST":
+            await _send_json(writer, 201, await self._upload(query, headers, reader))
+        elif len(parts) == 2 and parts[0] == "uploads" and method == "DELETE":
+            await _send_json(writer, 200, self._delete_upload(self._id(parts[1], self.uploads)))
+        elif len(parts) == 2 and parts[0] == "jobs" and parts[1] in ("convert", "merge") and method == "POST":
+            body = await _read_json(reader, headers)
+            await _send_json(writer, 202, self._submit(parts[1], body).status())
+        elif len(parts) == 2 and parts[0] == "jobs" and method == "GET":
+            await _send_json(writer, 200, self.jobs[self._id(parts[1], self.jobs)].status())
+        elif len(parts) == 2 and parts[0] == "jobs" and method == "DELETE":
+            await _send_json(writer, 200, self._delete_job(self.jobs[self._id(parts[1], self.jobs)]))
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result" and method == "GET":
+            job = self.jobs[self._id(parts[1], self.jobs)]
+            if job.state != "done":
+                raise HttpError(409, f"Job is {job.state}")
+            await _send_file(writer, job.output_path, f"{job.id}.pdf")
+        elif parts == ["metrics"] and method == "GET":
+            await _send(writer, 200, self._metrics_text().encode("utf-8"), "text/plain; version=0.0.4")
+        elif parts in (["uploads"], ["metrics"]) or (parts and parts[0] == "jobs"):
+            raise HttpError(405, f"{method} is not allowed here")
+        else:
+            raise HttpError(404, "Not found")
+
+    @staticmethod
+    def _id(value, table):
+        if not _ID_RE.match(value) or value not in table:
+            raise HttpError(404, f"Unknown id {value}")
+        return value
+
+    async def _upload(self, query, headers, reader):
+        name = os.path.basename(query.get("name", [""])[0])
+        extension = os.path.splitext(name)[1].lower()
+        if extension not in (".pdf", ".docx"):
+            raise HttpError(400, "The name parameter must be a .pdf or .docx file name")
+        length = _content_length(headers)
+        if length > self.max_upload_bytes:
+            raise HttpError(413, f"Uploads are limited to {self.max_upload_bytes} bytes")
+        upload_id = secrets.token_hex(8)
+        path = os.path.join(self.work_dir, "uploads", upload_id + extension)
+        try:
+            with open(path, "wb") as f:
+                remaining = length
+                while remaining:
+                    chunk = await reader.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise HttpError(400, "Upload ended early")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            _remove(path)
+            raise
+        self.uploads[upload_id] = (path, name, time.time())
+        self.metrics["uploaded_bytes"] += length
+        return {"id": upload_id, "name": name, "size": length}
+
+    def _submit(self, kind, body):
+        if not isinstance(body, dict):
+            raise HttpError(400, "Expected a JSON object")
+        if kind == "convert":
+            upload = self._upload_of(body.get("input"))
+            if upload is None or not upload[0].lower().endswith(".docx"):
+                raise HttpError(400, "input must be the id of an uploaded .docx file")
+            inputs, options = [(upload[0], None)], {}
+        else:
+            items = body.get("inputs")
+            if not isinstance(items, list) or not items:
+                raise HttpError(400, "inputs must be a non-empty list of upload ids")
+            inputs = [self._merge_input(item) for item in items]
+            options = {"dedup": bool(body.get("dedup", False)), "profile": body.get("profile"),
+                       "linearize": bool(body.get("linearize", False))}
+            if options["profile"] is not None and (not isinstance(options["profile"], str)
+                                                   or options["profile"] not in PROFILES):
+                raise HttpError(400, f"Unknown profile {options['profile']}")
+            if options["linearize"] and not linearize_available():
+                raise HttpError(400, UNAVAILABLE_MESSAGE)
+        if self._waiting >= self.max_queue:
+            self.metrics["rejected"] += 1
+            raise HttpError(503, "Too many jobs waiting, try again later", {"Retry-After": "5"})
+        job_id = secrets.token_hex(8)
+        job = Job(job_id, kind, inputs, options, os.path.join(self.work_dir, "jobs", job_id + ".pdf"))
+        self._queue.put_nowait(job)
+        self._waiting += 1
+        self.jobs[job_id] = job
+        return job
+
+    def _upload_of(self, upload_id):
+        # JSON may give any value as an id, only strings can name an upload
+        return self.uploads.get(upload_id) if isinstance(upload_id, str) else None
+
+    def _merge_input(self, item):
+        upload_id, pages = (item, None) if isinstance(item, str) else (
+            (item.get("upload"), item.get("pages")) if isinstance(item, dict) else (None, None))
+        upload = self._upload_of(upload_id)
+        if upload is None:
+            raise HttpError(400, f"Unknown upload {upload_id}")
+        if pages is not None and not isinstance(pages, str):
+            raise HttpError(400, f"Invalid pages for upload {upload_id}: expected a string like \"1-3,10,-1\"")
+        try:
+            parse_page_ranges(pages)
+        except PageRangeError as e:
+            raise HttpError(400, f"Invalid pages for upload {upload_id}: {e}") from None
+        return upload[0], pages
+
+    def _delete_job(self, job):
+        if job.state in ("queued", "running"):
+            job.cancel.cancel()
+            if job.state == "queued":
+                self._waiting -= 1
+                self._finish(job, "cancelled", "Cancelled")
+            return job.status()
+        del self.jobs[job.id]
+        _remove(job.output_path)
+        return {"deleted": job.id}
+
+    def _delete_upload(self, upload_id):
+        path = self.uploads[upload_id][0]
+        if path in self._inputs_in_use():
+            raise HttpError(409, "Upload is used by a queued or running job")
+        del self.uploads[upload_id]
+        _remove(path)
+        return {"deleted": upload_id}
+
+    def _inputs_in_use(self):
+        """Input paths of the jobs not finished yet"""
+        return {path for job in self.jobs.values() if job.finished_at is None for path, _ in job.inputs}
+
+    # Workers
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            if job.state != "queued":
+                # Cancelled while waiting, its slot is already free
+                continue
+            self._waiting -= 1
+            job.state = "running"
+            job.started_at = time.time()
+            self._record_wait(job.started_at - job.queued_at)
+            try:
+                success, message = await loop.run_in_executor(self._executor, self._run, job)
+            except Exception as e:
+                success, message = False, str(e)
+            if job.cancel.cancelled:
+                self._finish(job, "cancelled", "Cancelled")
+            else:
+                self._finish(job, "done" if success else "failed", message)
+
+    def _run(self, job):
+        if job.kind == "convert":
+            result = converter_logic.convert_many([(job.inputs[0][0], job.output_path)], 1,
+                                                  use_cache=self.use_cache, timeout=self.convert_timeout,
+                                                  cancel=job.cancel)[0]
+            return not result.error, result.error or "Converted"
+
+        def progress(update):
+            job.progress = update.percent
+
+        paths, page_ranges = zip(*job.inputs)
+        return converter_logic.process_and_merge_mixed_files(
+            list(paths), job.output_path, progress_callback=progress, use_cache=self.use_cache,
+            convert_timeout=self.convert_timeout, cancel=job.cancel, page_ranges=page_ranges, **job.options)
+
+    def _finish(self, job, state, message):
+        job.state = state
+        # Clients get the result URL, not where the server keeps its files
+        job.message = message.replace(job.output_path, f"/jobs/{job.id}/result").replace(
+            os.path.join(self.work_dir, ""), "")
+        job.finished_at = time.time()
+        if state == "done":
+            job.progress = 100
+            self.metrics["output_bytes"] += os.path.getsize(job.output_path)
+        if job.started_at is not None:
+            self.metrics["run_sum"] += job.finished_at - job.started_at
+            self.metrics["run_count"] += 1
+        key = (job.kind, state)
+        self.metrics["finished"][key] = self.metrics["finished"].get(key, 0) + 1
+        self._finish_times.append(job.finished_at)
+
+    def _record_wait(self, seconds):
+        self.metrics["wait_sum"] += seconds
+        self.metrics["wait_count"] += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self._latency_buckets[i] += 1
+                return
+        self._latency_buckets[-1] += 1
+
+    async def _clean_up(self):
+        while True:
+            await asyncio.sleep(min(60, self.result_ttl))
+            cutoff = time.time() - self.result_ttl
+            for job in [j for j in self.jobs.values() if j.finished_at is not None and j.finished_at < cutoff]:
+                del self.jobs[job.id]
+                _remove(job.output_path)
+            in_use = self._inputs_in_use()
+            for upload_id, (path, _, uploaded) in list(self.uploads.items()):
+                if uploaded < cutoff and path not in in_use:
+                    del self.uploads[upload_id]
+                    _remove(path)
+
+    def _metrics_text(self):
+        now = time.time()
+        while self._finish_times and self._finish_times[0] < now - 60:
+            self._finish_times.popleft()
+        m = self.metrics
+        running = sum(1 for job in self.jobs.values() if job.state == "running")
+        lines = [
+            "# HELP vpdf_queue_depth Jobs waiting for a worker.",
+            "# TYPE vpdf_queue_depth gauge",
+            f"vpdf_queue_depth {sum(1 for job in self.jobs.values() if job.state == 'queued')}",
+            "# TYPE vpdf_queue_capacity gauge",
+            f"vpdf_queue_capacity {self.max_queue}",
+            "# TYPE vpdf_jobs_running gauge",
+            f"vpdf_jobs_running {running}",
+            "# HELP vpdf_jobs_finished_total Finished jobs by kind and final state.",
+            "# TYPE vpdf_jobs_finished_total counter",
+        ]
+        lines += [f'vpdf_jobs_finished_total{{kind="{kind}",state="{state}"}} {count}'
+                  for (kind, state), count in sorted(m["finished"].items())]
+        lines += [
+            "# HELP vpdf_jobs_rejected_total Jobs refused because the queue was full.",
+            "# TYPE vpdf_jobs_rejected_total counter",
+            f"vpdf_jobs_rejected_total {m['rejected']}",
+            "# HELP vpdf_queue_wait_seconds Time from submission until a worker started the job.",
+            "# TYPE vpdf_queue_wait_seconds histogram",
+        ]
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), self._latency_buckets):
+            cumulative += count
+            lines.append(f'vpdf_queue_wait_seconds_bucket{{le="{bound}"}} {cumulative}')
+        lines += [
+            f"vpdf_queue_wait_seconds_sum {m['wait_sum']:.6f}",
+            f"vpdf_queue_wait_seconds_count {m['wait_count']}",
+            "# HELP vpdf_job_run_seconds Time workers spent on jobs.",
+            "# TYPE vpdf_job_run_seconds summary",
+            f"vpdf_job_run_seconds_sum {m['run_sum']:.6f}",
+            f"vpdf_job_run_seconds_count {m['run_count']}",
+            "# HELP vpdf_jobs_per_minute Jobs finished during the last 60 seconds.",
+            "# TYPE vpdf_jobs_per_minute gauge",
+            f"vpdf_jobs_per_minute {len(self._finish_times)}",
+            "# TYPE vpdf_uploaded_bytes_total counter",
+            f"vpdf_uploaded_bytes_total {m['uploaded_bytes']}",
+            "# TYPE vpdf_output_bytes_total counter",
+            f"vpdf_output_bytes_total {m['output_bytes']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+async def _read_head(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        raise ConnectionResetError
+    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    return method.upper(), url.path, parse_qs(url.query), headers
+
+
+def _content_length(headers):
+    if "chunked" in headers.get("transfer-encoding", "").lower() or "content-length" not in headers:
+        raise HttpError(411, "A Content-Length header is required")
+    try:
+        length = int(headers["content-length"])
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length") from None
+    if length < 0:
+        raise HttpError(400, "Invalid Content-Length")
+    return length
+
+
+async def _read_json(reader, headers):
+    length = _content_length(headers)
+    if length > MAX_JSON_BYTES:
+        raise HttpError(413, "Request body too large")
+    try:
+        return json.loads(await reader.readexactly(length) or b"{}")
+    except ValueError:
+        raise HttpError(400, "Invalid JSON") from None
+
+
+async def _send(writer, status, body, content_type, headers=None):
+    head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}", "Connection: close"]
+    head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def _send_json(writer, status, payload, headers=None):
+    await _send(writer, status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+
+async def _send_file(writer, path, name):
+    size = os.path.getsize(path)
+    head = ["HTTP/1.1 200 OK", "Content-Type: application/pdf", f"Content-Length: {size}",
+            f'Content-Disposition: attachment; filename="{name}"', "Connection: close"]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            writer.write(chunk)
+            # Backpressure: wait while the client is slower than the disk
+            await writer.drain()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def run_service(host="127.0.0.1", port=DEFAULT_PORT, cancel=None, work_dir=None, on_ready=None, **options):
+    """Run a JobService until cancel is cancelled. The work directory is removed afterwards unless given"""
+    service = JobService(work_dir, **options)
+    try:
+        asyncio.run(service.serve(host, port, cancel, on_ready))
+    finally:
+        if work_dir is None:
+            shutil.rmtree(service.work_dir, ignore_errors=True)
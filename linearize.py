@@ -0,0 +1,114 @@
+"""Linearized ("fast web view") output.
+
+The hint tables are written by qpdf, an optional dependency: install
+pikepdf (pip install pikepdf, which bundles qpdf) or put the qpdf command
+on the PATH. Without either, linearize_available() is False and callers
+reject linearized output before starting any work.
+"""
+import os
+import re
+import shutil
+import subprocess
+
+# The linearization dictionary must be the first object, within the first 1024 bytes
+_FIRST_OBJECT_RE = re.compile(rb"%PDF-\d\.\d.*?(\d+)\s+(\d+)\s+obj\s*<<(.*?)>>", re.S)
+_ENTRY_RE = re.compile(rb"/(Linearized|L|O|E|N|T)\s+(\d+(?:\.\d+)?)")
+_HINT_RE = re.compile(rb"/H\s*\[\s*(\d+)\s+(\d+)(?:\s+(\d+)\s+(\d+))?\s*\]")
+_OBJECT_AT_RE = re.compile(rb"\s*\d+\s+\d+\s+obj\b")
+
+UNAVAILABLE_MESSAGE = "Linearized output needs pikepdf (pip install pikepdf) or the qpdf command"
+
+
+def _import_pikepdf():
+    try:
+        import pikepdf
+    except ImportError:
+        return None
+    return pikepdf
+
+
+def linearize_available():
+    """True when pikepdf can be imported or the qpdf command is on the PATH"""
+    return _import_pikepdf() is not None or shutil.which("qpdf") is not None
+
+
+def linearize_pdf(input_path, output_path):
+    """Write a linearized ("fast web view") copy of input_path to output_path.
+
+    The page-offset and shared-object hint tables are produced by qpdf,
+    through pikepdf when it is installed or the qpdf command otherwise.
+    """
+    pikepdf = _import_pikepdf()
+    if pikepdf is not None:
+        with pikepdf.open(input_path) as pdf:
+            pdf.save(output_path, linearize=True)
+        return
+    qpdf = shutil.which("qpdf")
+    if qpdf is None:
+        raise RuntimeError(UNAVAILABLE_MESSAGE)
+    result = subprocess.run([qpdf, "--linearize", input_path, output_path],
+                            capture_output=True, text=True)
+    # qpdf exits with 3 when it only emitted warnings
+    if result.returncode not in (0, 3):
+        raise RuntimeError(f"qpdf failed: {result.stderr.strip()}")
+
+
+def linearize_in_place(path):
+    """Replace path with its linearized version"""
+    tmp_path = path + ".linearizing"
+    try:
+        linearize_pdf(path, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def verify_linearization(path):
+    """Check the linearization dictionary of path. Returns (valid, message)"""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(1024)
+        match = _FIRST_OBJECT_RE.match(head)
+        if match is None or b"/Linearized" not in match.group(3):
+            return False, "No linearization dictionary at the start of the file"
+        body = match.group(3)
+        entries = {name.decode(): float(value) for name, value in _ENTRY_RE.findall(body)}
+        hint = _HINT_RE.search(body)
+
+        missing = [name for name in ("L", "O", "E", "N", "T") if name not in entries]
+        if hint is None:
+            missing.append("H")
+        if missing:
+            return False, f"Linearization dictionary lacks /{', /'.join(missing)}"
+
+        problems = []
+        if int(entries["L"]) != file_size:
+            problems.append(f"/L is {int(entries['L'])} but the file has {file_size} bytes "
+                            "(modified after linearization?)")
+        hint_offset, hint_length = int(hint.group(1)), int(hint.group(2))
+        if hint_offset + hint_length > file_size:
+            problems.append("Hint stream /H lies outside the file")
+        else:
+            f.seek(hint_offset)
+            if not _OBJECT_AT_RE.match(f.read(64)):
+                problems.append("/H does not point to the hint stream object")
+        if not 0 < entries["E"] <= file_size:
+            problems.append("/E (end of first page) lies outside the file")
+        if not 0 < entries["T"] < file_size:
+            problems.append("/T (main xref offset) lies outside the file")
+
+    from pdf_input import PdfSource
+
+    with PdfSource(path) as source:
+        reader = source.reader()
+        page_count = int(reader.trailer["/Root"]["/Pages"]["/Count"])
+        first_page = reader.pages[0].indirect_reference.idnum if page_count else None
+    if int(entries["N"]) != page_count:
+        problems.append(f"/N is {int(entries['N'])} but the document has {page_count} pages")
+    if first_page is not None and int(entries["O"]) != first_page:
+        problems.append(f"/O is {int(entries['O'])} but the first page is object {first_page}")
+
+    if problems:
+        return False, "\n".join(problems)
+    return True, f"Linearized, {page_count} pages, first page ends at byte {int(entries['E'])}"
@@ -1,32 +1,51 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-import comtypes.client
-from pypdf import PdfWriter, PdfReader
-from PIL import Image, ImageTk
+from tkinter import filedialog, messagebox, simpledialog, ttk
+import io
+import multiprocessing
 import os
+import queue
 import sys
+import threading
+# Only light modules here: converter_logic, pypdf and PIL are imported where first used,
+# so the window opens without loading them (see benchmarks/startup.py)
+from cancellation import CancelToken
+from page_cache import PageCountCache
+from page_ranges import PageRangeError, parse_page_ranges, resolve_page_ranges
+from progress import ProgressUpdate, format_progress
+from thumbnails import ThumbnailService
+
+# Page counts shared by the merge preview and do_merge, persisted between sessions
+page_cache = PageCountCache.load()
+
+# Main window, created by main()
+root = None
+
+# Background renderer of the merge preview thumbnails, created by main()
+thumbnails = None
+
+# CancelToken of the merge running in the background, if any
+merge_cancel = None
+THUMBNAIL_SIZE = 32
+
+# Logo pre-scaled by build_assets.py, which Tk reads without PIL
+LOGO_ASSET = "assets/logo_220x75.png"
 
 def convert_docx_to_pdf():
     file_path = filedialog.askopenfilename(filetypes=[("Word files", "*.docx")])
     if file_path:
         file_path = os.path.abspath(file_path)
-        base, ext = os.path.splitext(file_path)
-        output_path = base + '.pdf'
-        try:
-            word = comtypes.client.CreateObject('Word.Application')
-            doc = word.Documents.Open(file_path)
-            doc.SaveAs(output_path, FileFormat=17)  # 17 is PDF format
-            doc.Close()
-            word.Quit()
-            if os.path.exists(output_path):
-                messagebox.showinfo("Success", f"Converted to {output_path}")
-            else:
-                messagebox.showerror("Error", "Conversion failed: Output file not created")
-        except Exception as e:
-            messagebox.showerror("Error", f"Conversion failed: {str(e)}")
+        import converter_logic
+        # Word stays running in the converter pool between conversions
+        success, message = converter_logic.convert_docx_to_pdf(file_path, os.path.dirname(file_path))
+        if success:
+            messagebox.showinfo("Success", f"Converted to {message}")
+        else:
+            messagebox.showerror("Error", message)
 
 def preview_merge():
     """Show preview of PDFs to be merged"""
+    from preflight import FileReport, format_report, run_preflight
+
     files = list(filedialog.askopenfilenames(filetypes=[("PDF files", "*.pdf")]))
     if not files:
         return
@@ -50,109 +69,279 @@ def preview_merge():
     list_frame.pack(fill='both', expand=True, padx=20, pady=(0, 20))
 
     # Header
-    header_label = tk.Label(list_frame, text="Selected PDFs (drag to reorder):", font=("Segoe UI", 12, "bold"),
+    header_label = tk.Label(list_frame, text="Selected PDFs (drag to reorder, double-click to pick pages):", font=("Segoe UI", 12, "bold"),
                            bg='#ffffff', fg='#4a5568')
     header_label.pack(anchor='w', pady=(0, 10))
 
-    # PDF list with scrollbar
-    canvas = tk.Canvas(list_frame, bg='#f7fafc', height=250)
-    scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=canvas.yview)
-    scrollable_frame = tk.Frame(canvas, bg='#f7fafc')
-
-    scrollable_frame.bind(
-        "<Configure>",
-        lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-    )
-
-    canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-    canvas.configure(yscrollcommand=scrollbar.set)
+    # PDF list: a Treeview only draws the visible rows, so thousands of files stay responsive
+    # No position column: renumbering would make every move cost the rows in between
+    columns = ("file", "pages", "range", "size", "status")
+    # The tree column holds the first page thumbnail
+    ttk.Style().configure("Preview.Treeview", rowheight=THUMBNAIL_SIZE + 4)
+    tree = ttk.Treeview(list_frame, columns=columns, show="tree headings", height=8, selectmode="browse",
+                        style="Preview.Treeview")
+    tree.column("#0", width=THUMBNAIL_SIZE + 20, stretch=False)
+    for column, heading, width, anchor in (("file", "File", 230, "w"),
+                                           ("pages", "Pages", 50, "e"), ("range", "Use", 70, "w"),
+                                           ("size", "Size", 70, "e"), ("status", "Status", 80, "w")):
+        tree.heading(column, text=heading)
+        tree.column(column, width=width, anchor=anchor, stretch=(column == "file"))
+    tree.tag_configure("bad", foreground="#e53e3e")
+    tree.tag_configure("warning", foreground="#b7791f")
+    scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=tree.yview)
 
     # Summary
     summary_frame = tk.Frame(list_frame, bg='#ffffff')
-    summary_frame.pack(fill='x', pady=(10, 0))
+    summary_frame.pack(side='bottom', fill='x', pady=(10, 0))
 
     summary_label = tk.Label(summary_frame, text="", font=("Segoe UI", 11, "bold"),
                            bg='#ffffff', fg='#2d3748')
     summary_label.pack()
 
-    def refresh_display():
-        """Refresh the PDF list display after reordering"""
-        # Clear existing items
-        for widget in scrollable_frame.winfo_children():
-            widget.destroy()
-
-        # Re-add PDF info with updated order
-        total_pages = 0
-        for i, pdf_path in enumerate(files, 1):
-            idx = i - 1
+    # Row ids are indexes into files, which keeps the paths in their original order
+    for i, pdf_path in enumerate(files):
+        tree.insert("", "end", iid=str(i), values=(os.path.basename(pdf_path), "…", "all", "", "Loading"))
+    # Merge order as row ids; a move is one pop/insert here and one Treeview.move
+    order = [str(i) for i in range(len(files))]
+
+    # Page counts and sizes are read on a background thread; Tk is not thread-safe,
+    # so results go through a queue that the UI drains with after()
+    page_counts = {}
+    # Page range spec per row id, rows without one take every page
+    page_ranges = {}
+    # Pre-flight report per path, damaged inputs are refused before merging
+    reports = {}
+    results = queue.Queue()
+
+    def counted(index, pdf_path, page_count, error):
+        try:
+            size = os.path.getsize(pdf_path)
+        except OSError:
+            size = None
+        results.put((pdf_path, page_count, size, error))
+
+    def count_in_background():
+        page_cache.get_page_counts(files, callback=counted)
+        # Then check every file for damage, encryption or truncation, in parallel
+        run_preflight(list(dict.fromkeys(files)), on_report=results.put)
+        results.put(None)
+
+    threading.Thread(target=count_in_background, daemon=True).start()
+
+    # Rows of each path (the same file may be selected twice)
+    rows_by_path = {}
+    for i, pdf_path in enumerate(files):
+        rows_by_path.setdefault(pdf_path, []).append(str(i))
+
+    def apply_results():
+        """Show the metadata counted since the last call"""
+        if not preview_window.winfo_exists():
+            return
+        done = False
+        while True:
             try:
-                reader = PdfReader(pdf_path)
-                page_count = len(reader.pages)
-                total_pages += page_count
-                filename = os.path.basename(pdf_path)
-
-                # PDF item frame
-                item_frame = tk.Frame(scrollable_frame, bg='#f7fafc')
-                item_frame.pack(fill='x', pady=2)
-
-                # Buttons frame
-                buttons_frame = tk.Frame(item_frame, bg='#f7fafc')
-                buttons_frame.pack(side='right', padx=(0, 10))
-
-                # Up button
-                up_btn = tk.Button(buttons_frame, text="↑", command=lambda idx=idx: move_up(idx),
-                                  bg='#e2e8f0', fg='#4a5568', font=('Segoe UI', 8, 'bold'),
-                                  relief='flat', borderwidth=1, padx=5, pady=2,
-                                  activebackground='#cbd5e0', activeforeground='#2d3748')
-                up_btn.pack(side='top', pady=(0, 2))
-
-                # Down button
-                down_btn = tk.Button(buttons_frame, text="↓", command=lambda idx=idx: move_down(idx),
-                                    bg='#e2e8f0', fg='#4a5568', font=('Segoe UI', 8, 'bold'),
-                                    relief='flat', borderwidth=1, padx=5, pady=2,
-                                    activebackground='#cbd5e0', activeforeground='#2d3748')
-                down_btn.pack(side='top')
-
-                # PDF info
-                info_text = f"{i}. {filename} - {page_count} pages"
-                info_label = tk.Label(item_frame, text=info_text, font=("Segoe UI", 10),
-                                    bg='#f7fafc', fg='#2d3748', anchor='w')
-                info_label.pack(side='left', fill='x', padx=10, pady=2)
-
-            except Exception as e:
-                error_label = tk.Label(scrollable_frame, text=f"Error reading {os.path.basename(pdf_path)}: {str(e)}",
-                                     font=("Segoe UI", 9), bg='#fed7d7', fg='#c53030')
-                error_label.pack(fill='x', padx=10, pady=2)
-
-        # Update summary
+                item = results.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                done = True
+                continue
+            if isinstance(item, FileReport):
+                show_report(item)
+                continue
+            pdf_path, page_count, size, error = item
+            page_counts[pdf_path] = page_count
+            for iid in rows_by_path[pdf_path]:
+                tree.set(iid, "pages", page_count if page_count is not None else "-")
+                tree.set(iid, "size", f"{size / 1024:.0f} KB" if size is not None else "")
+                tree.set(iid, "status", "Checking" if error is None else f"Error: {error}")
+        update_summary()
+        if not done:
+            preview_window.after(100, apply_results)
+
+    def show_report(report):
+        reports[report.path] = report
+        if report.errors:
+            status, tags = f"Error: {report.errors[0]}", ("bad",)
+        elif report.warnings:
+            status, tags = f"Warning: {report.warnings[0]}", ("warning",)
+        else:
+            status, tags = "OK", ()
+        for iid in rows_by_path[report.path]:
+            tree.set(iid, "status", status)
+            tree.item(iid, tags=tags)
+
+    def selected_pages(iid, page_count):
+        try:
+            return len(resolve_page_ranges(page_ranges.get(iid), page_count))
+        except PageRangeError:
+            return 0
+
+    def update_summary():
+        total_pages = sum(selected_pages(iid, counts) if iid in page_ranges else counts
+                          for path, counts in page_counts.items() if counts is not None
+                          for iid in rows_by_path[path])
+        pending = len(rows_by_path) - len(page_counts)
         summary_text = f"Total: {len(files)} files, {total_pages} pages"
+        if pending:
+            summary_text += f" ({pending} still counting)"
         summary_label.config(text=summary_text)
 
-    def move_up(index):
-        """Move PDF up in the list"""
-        if index > 0:
-            files[index], files[index-1] = files[index-1], files[index]
-            refresh_display()
-
-    def move_down(index):
-        """Move PDF down in the list"""
-        if index < len(files) - 1:
-            files[index], files[index+1] = files[index+1], files[index]
-            refresh_display()
-
-    # Initial display
-    refresh_display()
+    def move_row(iid, index):
+        """Move a row to index, without touching the rows in between"""
+        order.insert(index, order.pop(tree.index(iid)))
+        tree.move(iid, "", index)
+        tree.selection_set(iid)
+        tree.see(iid)
+
+    def move_up():
+        """Move the selected PDF up in the list"""
+        selection = tree.selection()
+        if selection and tree.prev(selection[0]):
+            move_row(selection[0], tree.index(selection[0]) - 1)
+
+    def move_down():
+        """Move the selected PDF down in the list"""
+        selection = tree.selection()
+        if selection and tree.next(selection[0]):
+            move_row(selection[0], tree.index(selection[0]) + 1)
+
+    def drag(event):
+        """Drag the selected row to the row under the pointer"""
+        selection = tree.selection()
+        target = tree.identify_row(event.y)
+        if selection and target and target != selection[0]:
+            move_row(selection[0], tree.index(target))
+
+    tree.bind("<B1-Motion>", drag)
+
+    def choose_pages(event):
+        """Ask which pages of the double-clicked file to merge"""
+        iid = tree.identify_row(event.y)
+        if not iid:
+            return
+        spec = simpledialog.askstring(
+            "Pages", "Pages to merge, e.g. 1-3,10,-1 (-1 is the last page).\nLeave empty for all pages:",
+            initialvalue=page_ranges.get(iid, ""), parent=preview_window)
+        if spec is None:
+            return
+        spec = spec.strip()
+        try:
+            parse_page_ranges(spec)
+            page_count = page_counts.get(files[int(iid)])
+            if spec and page_count is not None:
+                resolve_page_ranges(spec, page_count)
+        except PageRangeError as e:
+            messagebox.showerror("Pages", str(e), parent=preview_window)
+            return
+        if spec:
+            page_ranges[iid] = spec
+        else:
+            page_ranges.pop(iid, None)
+        tree.set(iid, "range", spec or "all")
+        update_summary()
+
+    tree.bind("<Double-1>", choose_pages)
+
+    # Thumbnails are requested only for the rows on screen and never rendered on the UI thread;
+    # the PhotoImages are kept here because Tk does not hold a reference to them
+    photos = {}
+    rendered = queue.Queue()
+    refresh_pending = []
+
+    def show_thumbnail(pdf_path, png):
+        from PIL import Image, ImageTk
+
+        photo = photos[pdf_path] = ImageTk.PhotoImage(Image.open(io.BytesIO(png)))
+        for iid in rows_by_path[pdf_path]:
+            tree.item(iid, image=photo)
+
+    def request_visible():
+        """Ask for the thumbnails of the rows currently on screen"""
+        refresh_pending.clear()
+        iid = tree.identify_row(THUMBNAIL_SIZE)
+        rows = tree.winfo_height() // (THUMBNAIL_SIZE + 4) + 1
+        while iid and rows > 0:
+            pdf_path = files[int(iid)]
+            # Asked again while on screen until shown: the service ignores requests already in
+            # progress, and a request it dropped or a render that failed is retried this way
+            if pdf_path not in photos:
+                png = thumbnails.get(pdf_path, 0, lambda path, page, data: rendered.put((path, data)))
+                if png is not None:
+                    show_thumbnail(pdf_path, png)
+            iid = tree.next(iid)
+            rows -= 1
+
+    def scrolled(first, last):
+        scrollbar.set(first, last)
+        if not refresh_pending:
+            refresh_pending.append(preview_window.after_idle(request_visible))
+
+    tree.configure(yscrollcommand=scrolled)
+
+    def apply_thumbnails():
+        if not preview_window.winfo_exists():
+            return
+        while True:
+            try:
+                pdf_path, png = rendered.get_nowait()
+            except queue.Empty:
+                break
+            if png is not None:
+                show_thumbnail(pdf_path, png)
+        preview_window.after(100, apply_thumbnails)
+
+    def ordered_files():
+        return [files[int(iid)] for iid in order], [page_ranges.get(iid) for iid in order]
+
+    update_summary()
+    apply_results()
+    apply_thumbnails()
+
+    # Move buttons
+    move_frame = tk.Frame(list_frame, bg='#ffffff')
+    move_frame.pack(side='right', fill='y', padx=(10, 0))
+    for text, command in (("↑", move_up), ("↓", move_down)):
+        tk.Button(move_frame, text=text, command=command,
+                  bg='#e2e8f0', fg='#4a5568', font=('Segoe UI', 8, 'bold'),
+                  relief='flat', borderwidth=1, padx=5, pady=2,
+                  activebackground='#cbd5e0', activeforeground='#2d3748').pack(side='top', pady=(0, 2))
 
     # Buttons
     button_frame = tk.Frame(preview_window, bg='#ffffff')
     button_frame.pack(fill='x', padx=20, pady=(0, 20))
 
+    # Fast web view option
+    linearize_var = tk.BooleanVar(value=False)
+    linearize_check = tk.Checkbutton(button_frame, text="Fast web view", variable=linearize_var,
+                                     bg='#ffffff', fg='#4a5568', font=('Segoe UI', 10),
+                                     activebackground='#ffffff')
+    linearize_check.pack(side='left')
+
+    # Resumable merges keep their progress next to the output when interrupted
+    resumable_var = tk.BooleanVar(value=False)
+    resumable_check = tk.Checkbutton(button_frame, text="Resumable", variable=resumable_var,
+                                     bg='#ffffff', fg='#4a5568', font=('Segoe UI', 10),
+                                     activebackground='#ffffff')
+    resumable_check.pack(side='left')
+
     def confirm_merge():
+        bad = [report for report in reports.values() if not report.ok]
+        if bad:
+            # Fail now rather than after converting and copying the files before them
+            messagebox.showerror("Error", "These files cannot be merged:\n"
+                                 + format_report(bad), parent=preview_window)
+            return
+        linearize, resumable = linearize_var.get(), resumable_var.get()
+        merge_files, merge_ranges = ordered_files()
+        # Files the preview has already checked (all of them passed) are not checked again
+        checked = all(path in reports for path in merge_files)
         preview_window.destroy()
-        do_merge(files)
+        do_merge(merge_files, linearize, merge_ranges, resumable, preflight=not checked)
 
     def cancel_merge():
         preview_window.destroy()
+        page_cache.save()
 
     cancel_btn = tk.Button(button_frame, text="Cancel", command=cancel_merge,
                           bg='#f7fafc', fg='#718096', font=('Segoe UI', 10),
@@ -166,59 +355,100 @@ def preview_merge():
                            activebackground="#89898a", activeforeground='white')
     confirm_btn.pack(side='right')
 
-    canvas.pack(side="left", fill="both", expand=True)
-    scrollbar.pack(side="right", fill="y")
+    tree.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="left", fill="y")
 
-def do_merge(files):
-    """Perform the actual PDF merging"""
-    writer = PdfWriter()
-    try:
-        for pdf_path in files:
-            reader = PdfReader(pdf_path)
-            for page in reader.pages:
-                writer.add_page(page)
-        output_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
-        if output_path:
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
+def do_merge(files, linearize=False, page_ranges=None, resumable=False, preflight=True):
+    """Merge on a background thread, showing its progress in a dialog with a Cancel button"""
+    global merge_cancel
+    output_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
+    if not output_path:
+        page_cache.save()
+        return
+
+    progress_window = tk.Toplevel(root)
+    progress_window.title("Merging")
+    progress_window.geometry("420x150")
+    progress_window.configure(bg='#ffffff')
+    progress_window.resizable(False, False)
+    progress_window.transient(root)
+    progress_window.grab_set()
+
+    status_label = tk.Label(progress_window, text="Starting...", font=('Segoe UI', 10),
+                            bg='#ffffff', fg='#4a5568', anchor='w')
+    status_label.pack(fill='x', padx=20, pady=(20, 10))
+    progress_bar = ttk.Progressbar(progress_window, maximum=100, mode='determinate')
+    progress_bar.pack(fill='x', padx=20)
+
+    # The engine stops between files and pages, a conversion in progress is killed
+    cancel = merge_cancel = CancelToken()
+    # Progress updates and finally the (success, message) result; Tk is only touched from after()
+    updates = queue.Queue()
+
+    def cancel_merge():
+        cancel.cancel()
+        cancel_btn.config(state='disabled')
+        status_label.config(text="Cancelling...")
+
+    cancel_btn = tk.Button(progress_window, text="Cancel", command=cancel_merge,
+                           bg='#f7fafc', fg='#718096', font=('Segoe UI', 10),
+                           relief='flat', borderwidth=1, padx=15, pady=6,
+                           activebackground='#e2e8f0', activeforeground='#4a5568')
+    cancel_btn.pack(side='right', padx=20, pady=15)
+    progress_window.protocol("WM_DELETE_WINDOW", cancel_merge)
+
+    def merge_in_background():
+        import converter_logic
+        # Pages are streamed to the output as they are copied, memory stays bounded
+        try:
+            result = converter_logic.process_and_merge_mixed_files(
+                files, output_path, progress_callback=updates.put, page_cache=page_cache, linearize=linearize,
+                page_ranges=page_ranges, cancel=cancel, resumable=resumable, preflight=preflight)
+        except Exception as e:
+            result = (False, str(e))
+        updates.put(result)
+
+    def poll():
+        global merge_cancel
+        result = None
+        while True:
+            try:
+                item = updates.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, ProgressUpdate):
+                progress_bar['value'] = item.percent
+                if not cancel.cancelled:
+                    status_label.config(text=format_progress(item))
+            else:
+                result = item
+        if result is None:
+            progress_window.after(100, poll)
+            return
+        merge_cancel = None
+        progress_window.destroy()
+        page_cache.save()
+        success, message = result
+        if success:
             messagebox.showinfo("Success", f"Merged to {output_path}")
-    except Exception as e:
-        messagebox.showerror("Error", f"Merge failed: {str(e)}")
+            return
+        from merge_checkpoint import partial_directory
+
+        if resumable and os.path.isdir(partial_directory(output_path)):
+            message += (f"\n\nProgress was kept in {partial_directory(output_path)}; merge the same files "
+                        "again to continue, or delete that folder.")
+        if cancel.cancelled:
+            messagebox.showinfo("Cancelled", message)
+        else:
+            messagebox.showerror("Error", message)
+
+    threading.Thread(target=merge_in_background, name="vpdf-merge").start()
+    poll()
 
 def merge_pdfs():
     """Entry point for PDF merging with preview"""
     preview_merge()
 
-root = tk.Tk()
-root.title("DOCX to PDF Converter and PDF Merger")
-root.geometry("450x400")
-root.configure(bg='#ffffff')
-root.resizable(False, False)
-
-# Modern styling
-style = ttk.Style()
-
-# Configure main buttons
-style.configure('Modern.TButton',
-                font=('Segoe UI', 11, 'bold'),
-                padding=10,
-                relief='flat',
-                borderwidth=0)
-style.map('Modern.TButton',
-          background=[('active', "#000000"), ('pressed', "#000000"), ('!active', "#000000")],
-          foreground=[('active', 'white'), ('pressed', 'white'), ('!active', 'white')])
-
-# Configure secondary buttons
-style.configure('Secondary.TButton',
-                font=('Segoe UI', 10),
-                padding=8,
-                relief='flat',
-                borderwidth=0)
-style.map('Secondary.TButton',
-          background=[('active', '#e2e8f0'), ('pressed', '#cbd5e0'), ('!active', '#f7fafc')],
-          foreground=[('active', '#4a5568'), ('pressed', '#2d3748'), ('!active', '#718096')])
-
-# Load logo image
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
     try:
@@ -229,44 +459,95 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
-logo_image = Image.open(resource_path("assets/logo vibia.png"))
-logo_image = logo_image.resize((220, 75), Image.Resampling.LANCZOS)
-logo_photo = ImageTk.PhotoImage(logo_image)
-
-# Main container
-main_frame = tk.Frame(root, bg='#ffffff')
-main_frame.pack(fill='both', expand=True, padx=20, pady=20)
-
-# Logo image
-logo_label = tk.Label(main_frame, image=logo_photo, bg='#ffffff')
-logo_label.pack(pady=(0, 15))
-
-# Title with modern styling
-title_frame = tk.Frame(main_frame, bg='#ffffff')
-title_frame.pack(pady=(0, 25))
-
-text_label = tk.Label(title_frame, text="PDF Tools", font=("Segoe UI", 24, "bold"), bg='#ffffff', fg='#2d3748')
-text_label.pack()
-
-subtitle_label = tk.Label(title_frame, text="Convert and merge your documents", font=("Segoe UI", 10), bg='#ffffff', fg='#718096')
-subtitle_label.pack(pady=(5, 0))
-
-# Buttons container
-buttons_frame = tk.Frame(main_frame, bg='#ffffff')
-buttons_frame.pack(pady=(0, 20))
-
-# Convert button with icon-like styling
-btn_convert = ttk.Button(buttons_frame, text="📄 Convert DOCX to PDF",
-                        command=convert_docx_to_pdf, style='Modern.TButton')
-btn_convert.pack(fill='x', pady=(0, 15), ipady=8)
-
-# Merge button with icon-like styling
-btn_merge = ttk.Button(buttons_frame, text="📑 Merge PDFs",
-                      command=merge_pdfs, style='Modern.TButton')
-btn_merge.pack(fill='x', ipady=8)
-
-# Footer
-footer_label = tk.Label(main_frame, text="Ready to process your files", font=("Segoe UI", 9), bg='#ffffff', fg='#a0aec0')
-footer_label.pack(side='bottom', pady=(20, 0))
-
-root.mainloop()
+def load_logo():
+    """The main window logo, resized here only when the pre-scaled asset has not been built"""
+    path = resource_path(LOGO_ASSET)
+    if os.path.exists(path):
+        return tk.PhotoImage(file=path)
+    from PIL import Image, ImageTk
+
+    logo_image = Image.open(resource_path("assets/logo vibia.png"))
+    return ImageTk.PhotoImage(logo_image.resize((220, 75), Image.Resampling.LANCZOS))
+
+def main():
+    """Build the Tk window and run the event loop"""
+    global root, thumbnails
+    thumbnails = ThumbnailService(size=THUMBNAIL_SIZE)
+    root = tk.Tk()
+    root.title("DOCX to PDF Converter and PDF Merger")
+    root.geometry("450x400")
+    root.configure(bg='#ffffff')
+    root.resizable(False, False)
+
+    # Modern styling
+    style = ttk.Style()
+
+    # Configure main buttons
+    style.configure('Modern.TButton',
+                    font=('Segoe UI', 11, 'bold'),
+                    padding=10,
+                    relief='flat',
+                    borderwidth=0)
+    style.map('Modern.TButton',
+              background=[('active', "#000000"), ('pressed', "#000000"), ('!active', "#000000")],
+              foreground=[('active', 'white'), ('pressed', 'white'), ('!active', 'white')])
+
+    # Configure secondary buttons
+    style.configure('Secondary.TButton',
+                    font=('Segoe UI', 10),
+                    padding=8,
+                    relief='flat',
+                    borderwidth=0)
+    style.map('Secondary.TButton',
+              background=[('active', '#e2e8f0'), ('pressed', '#cbd5e0'), ('!active', '#f7fafc')],
+              foreground=[('active', '#4a5568'), ('pressed', '#2d3748'), ('!active', '#718096')])
+
+    # Load logo image
+    logo_photo = load_logo()
+
+    # Main container
+    main_frame = tk.Frame(root, bg='#ffffff')
+    main_frame.pack(fill='both', expand=True, padx=20, pady=20)
+
+    # Logo image
+    logo_label = tk.Label(main_frame, image=logo_photo, bg='#ffffff')
+    logo_label.pack(pady=(0, 15))
+
+    # Title with modern styling
+    title_frame = tk.Frame(main_frame, bg='#ffffff')
+    title_frame.pack(pady=(0, 25))
+
+    text_label = tk.Label(title_frame, text="PDF Tools", font=("Segoe UI", 24, "bold"), bg='#ffffff', fg='#2d3748')
+    text_label.pack()
+
+    subtitle_label = tk.Label(title_frame, text="Convert and merge your documents", font=("Segoe UI", 10), bg='#ffffff', fg='#718096')
+    subtitle_label.pack(pady=(5, 0))
+
+    # Buttons container
+    buttons_frame = tk.Frame(main_frame, bg='#ffffff')
+    buttons_frame.pack(pady=(0, 20))
+
+    # Convert button with icon-like styling
+    btn_convert = ttk.Button(buttons_frame, text="📄 Convert DOCX to PDF",
+                            command=convert_docx_to_pdf, style='Modern.TButton')
+    btn_convert.pack(fill='x', pady=(0, 15), ipady=8)
+
+    # Merge button with icon-like styling
+    btn_merge = ttk.Button(buttons_frame, text="📑 Merge PDFs",
+                          command=merge_pdfs, style='Modern.TButton')
+    btn_merge.pack(fill='x', ipady=8)
+
+    # Footer
+    footer_label = tk.Label(main_frame, text="Ready to process your files", font=("Segoe UI", 9), bg='#ffffff', fg='#a0aec0')
+    footer_label.pack(side='bottom', pady=(20, 0))
+
+    root.mainloop()
+    if merge_cancel is not None:
+        # Window closed during a merge: stop it, the thread removes its partial output
+        merge_cancel.cancel()
+    thumbnails.close()
+
+if __name__ == '__main__':
+    # Thumbnails are rendered in worker processes, also from a PyInstaller build
+    multiprocessing.freeze_support()
+    main()
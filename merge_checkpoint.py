@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+CHECKPOINT_VERSION = 1
+
+# Read once: os.umask() can only be queried by setting it, which races with other threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def temp_output_path(output_path):
+    """A free hidden path next to output_path, so os.replace() onto it is atomic"""
+    directory, name = os.path.split(os.path.abspath(output_path))
+    fd, path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".part")
+    os.close(fd)
+    # mkstemp creates the file private, give it the mode open() would
+    os.chmod(path, 0o666 & ~_UMASK)
+    return path
+
+
+def partial_directory(output_path):
+    """Work directory a resumable merge into output_path keeps until it finishes"""
+    return os.path.abspath(output_path) + ".vpdf-partial"
+
+
+def discard_partial(output_path):
+    """Remove the work directory of an interrupted merge that will not be resumed"""
+    shutil.rmtree(partial_directory(output_path), ignore_errors=True)
+
+
+def merge_signature(file_paths, page_ranges, options):
+    """Digest of everything that decides the merged output: the inputs as they are now and the options"""
+    items = []
+    for path, ranges in zip(file_paths, page_ranges):
+        st = os.stat(path)
+        items.append([os.path.abspath(path), st.st_size, st.st_mtime_ns, ranges])
+    data = json.dumps([CHECKPOINT_VERSION, items, options], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class MergeCheckpoint:
+    """Work directory of a resumable merge, next to its output.
+
+    It holds the partial output, the PDFs converted from DOCX inputs and
+    checkpoint.json, which records how many inputs have been merged and
+    the writer state after them (see StreamingPdfWriter.checkpoint()).
+    A checkpoint left by a merge of other inputs or options is discarded.
+
+    Saving costs an fsync and a rewrite of a state that grows with the
+    output, so the merge saves only when due(): every INTERVAL seconds or
+    MAX_BYTES of output, whichever comes first.
+    """
+    INTERVAL = 5.0
+    MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, output_path, signature):
+        self.directory = partial_directory(output_path)
+        self.part_path = os.path.join(self.directory, "output.pdf")
+        self.path = os.path.join(self.directory, "checkpoint.json")
+        self.signature = signature
+        self.done_inputs = 0
+        self.writer_state = None
+        self.converted = set()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("signature") == signature and os.path.exists(self.part_path):
+                self.done_inputs = data["done_inputs"]
+                self.writer_state = data["writer"]
+                self.converted = set(data["converted"])
+        except (OSError, ValueError, KeyError):
+            pass
+        if self.writer_state is None:
+            self.discard()
+        os.makedirs(self.directory, exist_ok=True)
+        self._saved_at = time.monotonic()
+        self._saved_bytes = self.writer_state["length"] if self.writer_state is not None else 0
+
+    @property
+    def resuming(self):
+        return self.writer_state is not None
+
+    def converted_path(self, index):
+        return os.path.join(self.directory, f"{index:05d}.pdf")
+
+    def is_converted(self, index):
+        return index in self.converted and os.path.exists(self.converted_path(index))
+
+    def due(self, output_file):
+        """Whether enough time has passed or output been written since the last save"""
+        return (time.monotonic() - self._saved_at >= self.INTERVAL
+                or output_file.tell() - self._saved_bytes >= self.MAX_BYTES)
+
+    def save(self, done_inputs, writer_state, output_file):
+        """Record progress once the partial output is safely on disk"""
+        output_file.flush()
+        os.fsync(output_file.fileno())
+        self.done_inputs = done_inputs
+        self.writer_state = writer_state
+        data = {"signature": self.signature, "done_inputs": done_inputs, "writer": writer_state,
+                "converted": sorted(self.converted)}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._saved_at = time.monotonic()
+        self._saved_bytes = writer_state["length"]
+
+    def commit(self, output_path):
+        """Move the finished output into place and remove the work directory"""
+        os.replace(self.part_path, output_path)
+        self.discard()
+
+    def discard(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,165 @@
+import io
+import re
+import zlib
+from collections import namedtuple
+
+from pypdf.generic import NameObject, NumberObject
+
+OutputProfile = namedtuple("OutputProfile", [
+    "name",
+    "compress_level",      # zlib level for content streams, None keeps them as they are
+    "max_image_side",      # images with a longer side are downsampled, None disables
+    "jpeg_quality",        # quality of re-encoded images
+    "reencode_min_bytes",  # lossless images above this size are re-encoded as JPEG, None disables
+    "strip_unused",        # drop metadata, thumbnails and resources the page never uses
+])
+
+PROFILES = {
+    "fast": OutputProfile("fast", None, None, None, None, False),
+    "balanced": OutputProfile("balanced", 6, 2500, 85, None, True),
+    "smallest": OutputProfile("smallest", 9, 1600, 70, 64 * 1024, True),
+}
+
+# Keys that never affect rendering and are dropped by strip_unused
+STRIP_KEYS = ("/Thumb", "/PieceInfo", "/Metadata", "/LastModified")
+
+# Resource categories that are referenced by name from content streams
+PRUNABLE_RESOURCES = ("/XObject", "/Font", "/ExtGState", "/Pattern", "/Shading")
+
+_NAME_RE = re.compile(rb"/([^\s/\[\]()<>{}%]+)")
+_NAME_ESCAPE_RE = re.compile(rb"#([0-9A-Fa-f]{2})")
+
+
+def get_profile(profile):
+    """Return the OutputProfile for a name, an OutputProfile or None"""
+    if profile is None or isinstance(profile, OutputProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown output profile: {profile}") from None
+
+
+def _filters(obj):
+    value = obj.get("/Filter")
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def recompress_stream(obj, level):
+    """Flate-compress an unfiltered stream, or recompress a Flate one at level 9"""
+    filters = _filters(obj)
+    if "/DecodeParms" in obj:
+        return
+    if not filters:
+        data = zlib.compress(obj._data, level)
+    elif filters == ["/FlateDecode"] and level >= 9:
+        try:
+            data = zlib.compress(zlib.decompress(obj._data), level)
+        except zlib.error:
+            return
+    else:
+        return
+    if len(data) < len(obj._data):
+        obj._data = data
+        obj[NameObject("/Filter")] = NameObject("/FlateDecode")
+
+
+def wants_image_work(obj, profile):
+    """True if obj is an image this profile may downsample or re-encode"""
+    if obj.get("/Subtype") != "/Image" or profile.max_image_side is None:
+        return False
+    if obj.get("/ImageMask") or "/Mask" in obj or "/Decode" in obj or "/DecodeParms" in obj:
+        return False
+    if obj.get("/BitsPerComponent") != 8 or obj.get("/ColorSpace") not in ("/DeviceRGB", "/DeviceGray"):
+        return False
+    return _filters(obj) in ([], ["/FlateDecode"], ["/DCTDecode"])
+
+
+def optimize_image(obj, profile):
+    """Downsample and/or re-encode an image stream as JPEG, in place.
+
+    Runs on worker threads: Pillow releases the GIL while resizing and
+    encoding, so images of different pages are processed on all cores.
+    """
+    from PIL import Image
+
+    width, height = int(obj["/Width"]), int(obj["/Height"])
+    filters = _filters(obj)
+    mode = "RGB" if obj["/ColorSpace"] == "/DeviceRGB" else "L"
+    if filters == ["/DCTDecode"]:
+        image = Image.open(io.BytesIO(obj._data))
+        if image.mode != mode:
+            return obj
+    else:
+        raw = zlib.decompress(obj._data) if filters else obj._data
+        image = Image.frombytes(mode, (width, height), raw)
+
+    scale = profile.max_image_side / max(width, height)
+    if scale < 1:
+        width, height = max(1, round(width * scale)), max(1, round(height * scale))
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+    elif filters == ["/DCTDecode"]:
+        return obj
+    elif profile.reencode_min_bytes is None or len(obj._data) < profile.reencode_min_bytes:
+        return obj
+
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=profile.jpeg_quality, optimize=True)
+    candidates = [(len(output.getvalue()), output.getvalue(), "/DCTDecode")]
+    if filters != ["/DCTDecode"] and scale < 1:
+        # Line art often stays smaller as lossless Flate after downsampling
+        flate = zlib.compress(image.tobytes(), 6)
+        candidates.append((len(flate), flate, "/FlateDecode"))
+    size, data, filter_name = min(candidates, key=lambda c: c[0])
+    if size >= len(obj._data):
+        return obj
+    obj._data = data
+    obj[NameObject("/Filter")] = NameObject(filter_name)
+    obj[NameObject("/Width")] = NumberObject(width)
+    obj[NameObject("/Height")] = NumberObject(height)
+    return obj
+
+
+def used_resource_names(page):
+    """Names referenced from the page's content streams, or None if they cannot be read"""
+    try:
+        contents = page.get_contents()
+        if contents is None:
+            return set()
+        names = _NAME_RE.findall(contents.get_data())
+    except Exception:
+        return None
+    return {"/" + _NAME_ESCAPE_RE.sub(lambda m: bytes([int(m.group(1), 16)]), name).decode("latin-1")
+            for name in names}
+
+
+def prune_resources(resources, used_names):
+    """Return a copy of a resource dictionary without entries the content never names.
+
+    The dictionary is returned unchanged when a used form XObject has no
+    resources of its own, since it then draws with the page's resources.
+    """
+    xobjects = resources.get("/XObject")
+    xobjects = xobjects.get_object() if xobjects is not None else {}
+    for name in used_names:
+        xobject = xobjects.get(name) if hasattr(xobjects, "get") else None
+        if xobject is not None:
+            xobject = xobject.get_object()
+            if xobject.get("/Subtype") == "/Form" and "/Resources" not in xobject:
+                return resources
+    pruned = resources.__class__()
+    for category, value in resources.items():
+        entries = value.get_object() if category in PRUNABLE_RESOURCES else None
+        if entries is None or not hasattr(entries, "items"):
+            pruned[category] = value
+            continue
+        kept = entries.__class__()
+        for name, entry in entries.items():
+            if name in used_names:
+                kept[name] = entry
+        pruned[category] = kept
+    return pruned
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def default_cache_path():
+    """Location of the on-disk page-count cache shared between sessions"""
+    return os.path.join(os.path.expanduser("~"), ".vpdf", "page_cache.json")
+
+
+def file_key(path):
+    """Cache key for a file: (absolute path, size, mtime)"""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    return (path, st.st_size, st.st_mtime_ns)
+
+
+class PageCountCache:
+    """LRU cache of PDF page counts keyed by (path, size, mtime).
+
+    A file that is modified gets a new key, so stale counts are never
+    returned; old entries simply age out of the LRU.
+    """
+
+    def __init__(self, max_entries=5000, cache_path=None):
+        self.max_entries = max_entries
+        self.cache_path = cache_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, path):
+        """Return the cached page count for path, or None"""
+        try:
+            key = file_key(path)
+        except OSError:
+            return None
+        with self._lock:
+            count = self._entries.get(key)
+            if count is not None:
+                self._entries.move_to_end(key)
+            return count
+
+    def put(self, path, page_count):
+        """Record the page count of path"""
+        try:
+            key = file_key(path)
+        except OSError:
+            return
+        with self._lock:
+            self._store(key, page_count)
+
+    def get_page_count(self, path):
+        """Return the page count of path, parsing the PDF only on a cache miss"""
+        count = self.lookup(path)
+        if count is None:
+            # pypdf is loaded on the first miss, not when a front end starts
+            from pdf_input import count_pages
+
+            count = count_pages(path)
+            self.put(path, count)
+        return count
+
+    def get_page_counts(self, paths, max_workers=None, callback=None):
+        """Return the page counts of paths in order, counting cache misses on a thread pool.
+
+        Unreadable files get None. callback, if given, is called with
+        (index, path, count, error) for every file: cached ones first, the
+        others from pool threads as they are counted.
+        """
+        paths = list(paths)
+        counts = [self.lookup(path) for path in paths]
+        missing = [i for i, count in enumerate(counts) if count is None]
+        if callback is not None:
+            for i, count in enumerate(counts):
+                if count is not None:
+                    callback(i, paths[i], count, None)
+
+        def counted(j, path, count, error):
+            counts[missing[j]] = count
+            if count is not None:
+                self.put(path, count)
+            if callback is not None:
+                callback(missing[j], path, count, error)
+
+        from pdf_input import count_pages_many
+
+        count_pages_many([paths[i] for i in missing], max_workers, counted)
+        return counts
+
+    def _store(self, key, page_count):
+        self._entries[key] = page_count
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+    @classmethod
+    def load(cls, cache_path=None, max_entries=5000):
+        """Create a cache and fill it from cache_path if that file exists"""
+        cache = cls(max_entries=max_entries, cache_path=cache_path or default_cache_path())
+        try:
+            with open(cache.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for path, size, mtime_ns, page_count in data.get("entries", []):
+                cache._store((path, size, mtime_ns), page_count)
+        except (OSError, ValueError, TypeError):
+            # Missing or corrupt cache file: start empty
+            pass
+        cache._dirty = False
+        return cache
+
+    def save(self):
+        """Write the cache to disk (atomically) if it changed"""
+        if not self.cache_path or not self._dirty:
+            return
+        with self._lock:
+            entries = [list(key) + [count] for key, count in self._entries.items()]
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "entries": entries}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # The cache is only an optimisation, never fail the caller
+            pass
@@ -0,0 +1,59 @@
+import re
+
+# One item of a spec: "3", "-1" (last page), "2-5", "5-" (to the end), "-3--1", "5-2" (backwards)
+_ITEM_RE = re.compile(r"^(-?\d+)(?:(-)(-?\d+)?)?$")
+
+
+class PageRangeError(ValueError):
+    """A page range spec that is malformed or does not fit the document"""
+
+
+def parse_page_ranges(spec):
+    """Parse a spec like "1-3,10,-1" into (first, last) pairs of 1-based page numbers.
+
+    Negative numbers count from the end (-1 is the last page) and last is
+    None for an open range ("5-"). Pages are taken in the order given,
+    repeats included. An empty spec selects every page and returns None.
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    ranges = []
+    for item in spec.split(","):
+        match = _ITEM_RE.match(item.replace(" ", ""))
+        if match is None:
+            raise PageRangeError(f"Invalid page range '{item.strip()}'")
+        first = int(match.group(1))
+        if match.group(2) is None:
+            last = first
+        else:
+            last = int(match.group(3)) if match.group(3) is not None else None
+        if first == 0 or last == 0:
+            raise PageRangeError(f"Invalid page range '{item.strip()}': pages start at 1")
+        ranges.append((first, last))
+    return ranges
+
+
+def resolve_page_ranges(spec, page_count):
+    """Return the 0-based page indices a spec selects in a document of page_count pages.
+
+    spec is a string or the result of parse_page_ranges(); None or an
+    empty spec selects every page.
+    """
+    ranges = parse_page_ranges(spec) if spec is None or isinstance(spec, str) else spec
+    if ranges is None:
+        return list(range(page_count))
+    indices = []
+    for first, last in ranges:
+        start = _index(first, page_count)
+        end = page_count - 1 if last is None else _index(last, page_count)
+        step = 1 if end >= start else -1
+        indices.extend(range(start, end + step, step))
+    return indices
+
+
+def _index(number, page_count):
+    index = number - 1 if number > 0 else page_count + number
+    if not 0 <= index < page_count:
+        raise PageRangeError(f"Page {number} is out of range (the document has {page_count} pages)")
+    return index
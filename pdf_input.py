@@ -0,0 +1,191 @@
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from pypdf import PdfReader
+from pypdf._page import PageObject
+from pypdf.generic import IndirectObject, NameObject
+
+# Not available on Windows, where the working set is trimmed by the OS
+_MADV_DONTNEED = getattr(mmap, "MADV_DONTNEED", None)
+
+# Page attributes a page inherits from its ancestors in the page tree
+INHERITED_PAGE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+# Deeper page trees are treated as damaged (they are normally 2-4 levels deep)
+_MAX_TREE_DEPTH = 64
+
+
+def map_file(f):
+    """Return a read-only memory map of an open file, or None if it cannot be mapped"""
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Empty files, pipes and some network filesystems
+        return None
+
+
+class PdfSource:
+    """A PDF input file opened through a read-only memory map.
+
+    Nothing is read up front: pypdf locates the xref from the end of the
+    file and parses objects only when they are accessed, so reading a page
+    touches just the byte ranges of the objects it uses, straight from the
+    page cache without copying through file buffers. Falls back to the
+    plain file object when the file cannot be mapped.
+
+    Mapped pages that were read count towards the process RSS until
+    trim() hands them back; the data stays in the OS page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            self._map = map_file(self._file)
+        except Exception:
+            self._file.close()
+            raise
+
+    @property
+    def stream(self):
+        return self._map if self._map is not None else self._file
+
+    def reader(self, strict=False):
+        """Return a PdfReader over the source, valid until close()"""
+        return PdfReader(self.stream, strict=strict)
+
+    def trim(self):
+        """Unmap the file pages read so far (they are faulted in again if needed)"""
+        if self._map is not None and _MADV_DONTNEED is not None:
+            self._map.madvise(_MADV_DONTNEED)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def count_pages(path):
+    """Return the page count of the PDF at path.
+
+    Only the trailer, the catalog and the root page tree node are parsed to
+    read its /Count. Damaged files (broken xref, missing or invalid /Count)
+    fall back to walking the whole page tree.
+    """
+    with PdfSource(path) as source:
+        try:
+            return tree_page_count(source.reader(strict=True))
+        except Exception:
+            return len(source.reader().pages)
+
+
+def tree_page_count(reader):
+    """The /Count of the root page tree node, without loading the page tree"""
+    count = reader.trailer["/Root"]["/Pages"]["/Count"]
+    if not isinstance(count, int) or count < 0:
+        raise ValueError("Invalid page count in the page tree root")
+    return int(count)
+
+
+def page_count(reader):
+    """Page count of an open reader, loading the page tree only if its root /Count is unusable"""
+    try:
+        return tree_page_count(reader)
+    except Exception:
+        return len(reader.pages)
+
+
+def get_pages(reader, indices):
+    """Return the pages of reader at indices, in order.
+
+    Unlike reader.pages, which loads every node of the page tree first,
+    each page is found by descending from the root along the /Count of
+    the intermediate nodes, so only the nodes on the way to the wanted
+    pages (and their direct children) are parsed. Attributes inherited
+    from ancestors are copied into the page. Falls back to reader.pages
+    when the tree is inconsistent.
+    """
+    indices = list(indices)
+    if reader.flattened_pages is None:
+        try:
+            root = reader.trailer["/Root"].get_object().raw_get("/Pages")
+            count = tree_page_count(reader)
+            pages = []
+            for index in indices:
+                if not 0 <= index < count:
+                    raise IndexError(f"Page index {index} out of range")
+                pages.append(_find_page(reader, root, index))
+            return pages
+        except IndexError:
+            raise
+        except Exception:
+            pass
+    return [reader.pages[i] for i in indices]
+
+
+def _find_page(reader, ref, index):
+    inherited = {}
+    for _ in range(_MAX_TREE_DEPTH):
+        if not isinstance(ref, IndirectObject):
+            raise ValueError("Page tree node is not an indirect object")
+        node = ref.get_object()
+        if "/Kids" not in node:
+            if index != 0 or node.get("/Type", "/Page") != "/Page":
+                raise ValueError("Page tree counts do not match its pages")
+            # Filled with the entries of the page dictionary
+            page = PageObject(reader, ref)
+            for key, value in inherited.items():
+                if key not in page:
+                    page[NameObject(key)] = value
+            return page
+        for key in INHERITED_PAGE_KEYS:
+            if key in node:
+                inherited[key] = node.raw_get(key)
+        for kid in node["/Kids"]:
+            kid_node = kid.get_object()
+            count = kid_node["/Count"] if "/Kids" in kid_node else 1
+            if index < count:
+                ref = kid
+                break
+            index -= count
+        else:
+            raise ValueError("Page tree counts do not match its pages")
+    raise ValueError("Page tree is too deep")
+
+
+def count_pages_many(paths, max_workers=None, callback=None):
+    """Count the pages of many PDFs on a thread pool. Returns the counts in order.
+
+    Unreadable files get None. callback, if given, is called with
+    (index, path, count, error) as soon as each file is done, from a
+    pool thread; error is None or the reason the file could not be read.
+    """
+    paths = list(paths)
+    counts = [None] * len(paths)
+    if not paths:
+        return counts
+
+    def count_one(index):
+        try:
+            counts[index], error = count_pages(paths[index]), None
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        if callback is not None:
+            callback(index, paths[index], counts[index], error)
+
+    # Mostly waiting on the disk for small reads, so more threads than cores pay off
+    workers = min(max_workers or 2 * (os.cpu_count() or 1), 16, len(paths))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vpdf-count") as executor:
+        for future in [executor.submit(count_one, i) for i in range(len(paths))]:
+            future.result()
+    return counts
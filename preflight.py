@@ -0,0 +1,358 @@
+"""Pre-flight checks of merge inputs, run before any conversion or merging.
+
+A corrupt, encrypted or truncated input would otherwise only fail the
+merge when its turn comes, possibly after the other inputs were
+converted and copied. The checks read little more than what pypdf needs
+to open a file, so they take a fraction of the merge time:
+
+- PDF: the %PDF- header, the startxref pointer and %%EOF marker at the
+  end, xref offsets that lie inside the file, a user password, and the page
+  tree (every node reachable, counts consistent, every page object
+  present) plus the page ranges asked for.
+- DOCX: a readable zip (CRCs included, which also catches truncation)
+  with the parts of a Word document, and not password-protected.
+"""
+import logging
+import multiprocessing
+import os
+import re
+import signal
+import threading
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor
+from concurrent.futures import wait as wait_futures
+
+from pypdf import PasswordType
+
+from page_ranges import PageRangeError, resolve_page_ranges
+from pdf_input import PdfSource
+
+# Below this total input size the checks take milliseconds, less than starting worker processes
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+# The header may follow some garbage, the trailer may be followed by some
+_HEADER_WINDOW = 1024
+_TRAILER_WINDOW = 4096
+
+# Deeper page trees are treated as damaged (they are normally 2-4 levels deep)
+_MAX_TREE_DEPTH = 64
+
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)")
+_OBJECT_RE = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj")
+_WRONG_POINTER_RE = re.compile(r"Ignoring wrong pointing object (\d+) ")
+
+# Password-protected DOCX files are OLE compound files, as are old .doc files
+_OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_DOCX_PARTS = ("[Content_Types].xml", "word/document.xml")
+
+
+class FileReport(namedtuple("FileReport", ["path", "kind", "errors", "warnings", "pages", "seconds"])):
+    """Result of checking one input. errors make the merge fail, warnings do not.
+
+    kind is "pdf" or "docx", errors and warnings are tuples of messages and
+    pages is the page count of a PDF (None if unknown or for a DOCX).
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+class _Problems:
+    def __init__(self):
+        self.errors = []
+        self.warnings = []
+
+
+class _WarningCollector(logging.Handler):
+    """Collects what pypdf logs while a file is checked on the current thread (repairs, bad pointers)"""
+
+    def __init__(self, warnings):
+        super().__init__(logging.WARNING)
+        self.warnings = warnings
+        self.thread = threading.get_ident()
+
+    def emit(self, record):
+        if record.thread == self.thread:
+            message = record.getMessage()
+            if message not in self.warnings:
+                self.warnings.append(message)
+
+
+def check_file(path, page_ranges=None):
+    """Check one input (PDF or DOCX, by extension) and return its FileReport"""
+    timer = time.perf_counter()
+    kind = "docx" if path.lower().endswith(".docx") else "pdf"
+    problems = _Problems()
+    pages = None
+    try:
+        if not os.path.isfile(path):
+            problems.errors.append("File not found")
+        elif os.path.getsize(path) == 0:
+            problems.errors.append("Empty file")
+        elif kind == "docx":
+            _check_docx(path, problems)
+        else:
+            pages = _check_pdf(path, page_ranges, problems)
+    except Exception as e:
+        problems.errors.append(f"Unreadable: {str(e) or type(e).__name__}")
+    return FileReport(path, kind, tuple(problems.errors), tuple(problems.warnings), pages,
+                      time.perf_counter() - timer)
+
+
+def _check_docx(path, problems):
+    with open(path, "rb") as f:
+        magic = f.read(len(_OLE_MAGIC))
+    if magic == _OLE_MAGIC:
+        problems.errors.append("Password-protected document or old .doc file, not a DOCX")
+        return
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = set(archive.namelist())
+            missing = [part for part in _DOCX_PARTS if part not in names]
+            if missing:
+                problems.errors.append(f"Not a Word document (missing {', '.join(missing)})")
+                return
+            if any(info.flag_bits & 0x1 for info in archive.infolist()):
+                problems.errors.append("Encrypted zip entries")
+                return
+            # Decompresses every entry and checks its CRC
+            bad = archive.testzip()
+            if bad is not None:
+                problems.errors.append(f"Damaged zip entry {bad}")
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError) as e:
+        problems.errors.append(f"Damaged or truncated zip: {e}")
+
+
+def _check_pdf(path, page_ranges, problems):
+    with PdfSource(path) as source:
+        stream = source.stream
+        head = _read_at(stream, 0, _HEADER_WINDOW)
+        if b"%PDF-" not in head:
+            problems.errors.append("Not a PDF (no %PDF- header)")
+            return None
+        if not head.startswith(b"%PDF-"):
+            problems.warnings.append("Data before the %PDF- header")
+        tail = _read_at(stream, max(0, source.size - _TRAILER_WINDOW), _TRAILER_WINDOW)
+        if b"%%EOF" not in tail:
+            problems.errors.append("Truncated file (no %%EOF marker at the end)")
+            return None
+        match = None
+        for match in _STARTXREF_RE.finditer(tail):
+            pass
+        if match is None:
+            problems.warnings.append("No startxref pointer, the xref is rebuilt by scanning the file")
+        elif int(match.group(1)) >= source.size:
+            problems.errors.append("Truncated file (startxref points past the end)")
+            return None
+
+        pypdf_logger = logging.getLogger("pypdf")
+        collector = _WarningCollector(problems.warnings)
+        pypdf_logger.addHandler(collector)
+        try:
+            reader = source.reader()
+            if reader.is_encrypted:
+                # Owner-password-only files open with the empty user password and merge fine
+                if reader.decrypt("") == PasswordType.NOT_DECRYPTED:
+                    problems.errors.append("Password-protected PDF, a password is needed to open it")
+                    return None
+                problems.warnings.append("Encrypted with an owner password only, "
+                                         "the merged copy does not keep its restrictions")
+            _check_xref(reader, source.size, problems)
+            _damaged_objects(problems)
+            if problems.errors:
+                return None
+            pages = _check_page_tree(reader, stream, source.size, problems)
+        finally:
+            pypdf_logger.removeHandler(collector)
+        if pages is not None and page_ranges:
+            try:
+                resolve_page_ranges(page_ranges, pages)
+            except PageRangeError as e:
+                problems.errors.append(str(e))
+        return pages
+
+
+def _read_at(stream, offset, size):
+    stream.seek(offset)
+    return stream.read(size)
+
+
+def _check_xref(reader, size, problems):
+    beyond = sum(1 for objects in reader.xref.values() for offset in objects.values()
+                 if isinstance(offset, int) and offset >= size)
+    if beyond:
+        problems.errors.append(f"Truncated file ({beyond} objects lie past the end)")
+    root = reader.trailer.get("/Root")
+    if root is None or "/Pages" not in root.get_object():
+        problems.errors.append("No document catalog with a page tree")
+
+
+def _damaged_objects(problems):
+    # pypdf checks every xref offset on opening and drops the objects not found there;
+    # whatever uses them (often a page's content) would fail the merge
+    damaged = []
+    for message in list(problems.warnings):
+        match = _WRONG_POINTER_RE.match(message)
+        if match is not None:
+            damaged.append(match.group(1))
+            problems.warnings.remove(message)
+    if damaged:
+        problems.errors.append(f"Damaged object(s) {', '.join(damaged[:10])}"
+                               + (f" and {len(damaged) - 10} more" if len(damaged) > 10 else ""))
+
+
+def _check_page_tree(reader, stream, size, problems):
+    """Walk the page tree and return its page count, or None if it is damaged.
+
+    Intermediate nodes are parsed. Pages are only looked up in the xref
+    when the counts say a node holds nothing but pages, so a tree of
+    50,000 pages is checked without parsing 50,000 page dictionaries.
+    """
+    root = reader.trailer["/Root"].get_object().raw_get("/Pages")
+    pages = 0
+    count_mismatch = False
+    seen = set()
+    stack = [(root, 0)]
+    while stack:
+        ref, depth = stack.pop()
+        if depth > _MAX_TREE_DEPTH:
+            problems.errors.append("Page tree is too deep (loop or damaged)")
+            return None
+        key = (ref.idnum, ref.generation) if hasattr(ref, "idnum") else None
+        if key is None:
+            problems.errors.append("Page tree node is not an indirect object")
+            return None
+        if key in seen:
+            problems.errors.append(f"Page tree loops back to object {key[0]}")
+            return None
+        seen.add(key)
+        try:
+            node = ref.get_object()
+        except Exception as e:
+            problems.errors.append(f"Page tree object {key[0]} is unreadable: {e}")
+            return None
+        if node is None or not hasattr(node, "get"):
+            problems.errors.append(f"Page tree object {key[0]} is missing")
+            return None
+        if "/Kids" not in node:
+            if node.get("/Type", "/Page") != "/Page":
+                problems.errors.append(f"Object {key[0]} in the page tree is not a page")
+                return None
+            pages += 1
+            continue
+        kids = node["/Kids"]
+        count = node.get("/Count")
+        if not isinstance(count, int) or count != len(kids):
+            count_mismatch = count_mismatch or not isinstance(count, int)
+            stack.extend((kid, depth + 1) for kid in reversed(kids))
+            continue
+        # As many pages as kids: unless the counts lie, every kid is a page
+        for kid in kids:
+            if not hasattr(kid, "idnum"):
+                problems.errors.append("Page tree node is not an indirect object")
+                return None
+            if not _object_present(reader, stream, size, kid.idnum, kid.generation):
+                problems.errors.append(f"Page object {kid.idnum} is missing or damaged")
+                return None
+            seen.add((kid.idnum, kid.generation))
+        pages += len(kids)
+    if pages == 0:
+        problems.errors.append("The document has no pages")
+        return None
+    root_count = root.get_object().get("/Count")
+    if count_mismatch or root_count != pages:
+        problems.warnings.append(f"Page tree counts are wrong ({root_count} declared, {pages} found), "
+                                 "the pages are found by walking the tree")
+    return pages
+
+
+def _object_present(reader, stream, size, idnum, generation):
+    offset = reader.xref.get(generation, {}).get(idnum)
+    if offset is None:
+        # Compressed objects live in object streams, which pypdf has checked when reading the xref
+        return idnum in reader.xref_objStm
+    if not 0 < offset < size:
+        return False
+    match = _OBJECT_RE.match(_read_at(stream, offset, 32))
+    return match is not None and int(match.group(1)) == idnum
+
+
+def _init_worker():
+    # Ctrl+C is handled by the parent, which stops waiting for the results
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def run_preflight(paths, page_ranges=None, max_workers=None, cancel=None, on_report=None):
+    """Check every input and return their FileReports, in order.
+
+    page_ranges, if given, holds a page range spec (or None) per path. The
+    files are checked on up to max_workers processes (default: one per
+    CPU) unless they are small enough to check faster in this process.
+    on_report, if given, is called with each FileReport as it is done.
+    The CancelToken cancel is checked between files.
+    """
+    paths = list(paths)
+    page_ranges = list(page_ranges) if page_ranges is not None else [None] * len(paths)
+    reports = [None] * len(paths)
+    total = sum(_size(path) for path in paths)
+    workers = min(max_workers or os.cpu_count() or 1, len(paths))
+    if workers <= 1 or total < PARALLEL_MIN_BYTES:
+        for index, path in enumerate(paths):
+            if cancel is not None:
+                cancel.check()
+            reports[index] = check_file(path, page_ranges[index])
+            if on_report is not None:
+                on_report(reports[index])
+        return reports
+
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(),
+                                   initializer=_init_worker)
+    try:
+        # Largest files first, so one big file does not start last and hold up the end
+        order = sorted(range(len(paths)), key=lambda i: -_size(paths[i]))
+        pending = {executor.submit(check_file, paths[index], page_ranges[index]): index for index in order}
+        while pending:
+            if cancel is not None:
+                cancel.check()
+            done, _ = wait_futures(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    reports[index] = future.result()
+                except Exception as e:
+                    # The worker process itself died, e.g. out of memory on a malicious file
+                    reports[index] = FileReport(paths[index], "docx" if paths[index].lower().endswith(".docx")
+                                                else "pdf", (f"Check failed: {str(e) or type(e).__name__}",),
+                                                (), None, 0.0)
+                if on_report is not None:
+                    on_report(reports[index])
+    finally:
+        # Checks already running finish within seconds, the others are dropped
+        executor.shutdown(wait=True, cancel_futures=True)
+    return reports
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def format_report(reports, show_ok=False):
+    """Text report: one line per file with errors or warnings (and per good file if show_ok)"""
+    lines = []
+    for report in reports:
+        name = os.path.basename(report.path)
+        if report.errors:
+            lines.append(f"{name}: {'; '.join(report.errors)}")
+        elif report.warnings:
+            lines.append(f"{name}: OK, warning: {'; '.join(report.warnings)}")
+        elif show_ok:
+            pages = f", {report.pages} pages" if report.pages is not None else ""
+            lines.append(f"{name}: OK{pages}")
+    return "\n".join(lines)
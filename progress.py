@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import namedtuple
+
+# How much more a byte of DOCX costs to convert than a byte of PDF to merge
+CONVERSION_WEIGHT = 4
+
+ProgressUpdate = namedtuple("ProgressUpdate", [
+    "percent",        # 0-100, never decreases
+    "pages",          # pages merged so far
+    "bytes_done",     # input bytes converted or merged so far
+    "pages_per_sec",
+    "bytes_per_sec",
+    "eta",            # estimated seconds left, None until there is a rate
+    "phase",          # "checking", "converting", "merging", "finishing" or "done"
+])
+
+
+class ProgressTracker:
+    """Weighted progress of a job, reported through a throttled callback.
+
+    Work is measured in units (input bytes, with conversions weighted by
+    CONVERSION_WEIGHT). The total may grow or shrink while the job runs,
+    e.g. once the real size of a converted PDF is known. callback is
+    called with a ProgressUpdate at most once per interval seconds, from
+    whichever thread advanced the work. Without a callback every call is
+    a cheap no-op.
+    """
+
+    def __init__(self, callback=None, interval=0.25):
+        self.callback = callback
+        self.interval = interval
+        self.total = 0.0
+        self.done = 0.0
+        self.pages = 0
+        self.bytes_done = 0
+        self.phase = "converting"
+        self._percent = 0
+        self._started = time.monotonic()
+        self._last_emit = 0.0
+        self._lock = threading.Lock()
+
+    def add_total(self, units):
+        """Add units (possibly negative) to the expected amount of work"""
+        with self._lock:
+            self.total += units
+
+    def advance(self, units, pages=0, nbytes=0, phase=None):
+        """Record units of finished work, pages merged and input bytes processed"""
+        if self.callback is None:
+            return
+        with self._lock:
+            self.done += units
+            self.pages += pages
+            self.bytes_done += nbytes
+            if phase is not None:
+                self.phase = phase
+            now = time.monotonic()
+            if now - self._last_emit < self.interval:
+                return
+            self._last_emit = now
+            update = self._update(now)
+        self.callback(update)
+
+    def finish(self):
+        """Report 100%, regardless of throttling"""
+        if self.callback is None:
+            return
+        with self._lock:
+            self.done = self.total
+            self.phase = "done"
+            update = self._update(time.monotonic())
+        self.callback(update)
+
+    def _update(self, now):
+        elapsed = max(now - self._started, 1e-6)
+        if self.phase == "done":
+            percent = 100
+        elif self.total > 0:
+            # Finishing (trailer, linearization) is not weighted, keep 100 for the end
+            percent = min(99, int(self.done * 100 / self.total))
+        else:
+            percent = 0
+        self._percent = max(self._percent, percent)
+        rate = self.done / elapsed
+        eta = max(0.0, (self.total - self.done) / rate) if rate > 0 else None
+        return ProgressUpdate(self._percent, self.pages, self.bytes_done,
+                              self.pages / elapsed, self.bytes_done / elapsed, eta, self.phase)
+
+
+def format_eta(seconds):
+    """Format a number of seconds as m:ss or h:mm:ss"""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def format_progress(update):
+    """One-line summary of a ProgressUpdate, for logs and the command line"""
+    text = (f"{update.percent:3d}% {update.phase}, {update.pages} pages, "
+            f"{update.pages_per_sec:.1f} pages/s, {update.bytes_per_sec / 1e6:.1f} MB/s")
+    if update.eta is not None and update.phase != "done":
+        text += f", {format_eta(update.eta)} left"
+    return text
@@ -0,0 +1,414 @@
+import hashlib
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject,
+    NullObject, NumberObject, StreamObject
+)
+
+from merge_checkpoint import temp_output_path
+from output_profiles import (
+    STRIP_KEYS, get_profile, optimize_image, prune_resources,
+    recompress_stream, used_resource_names, wants_image_work
+)
+from page_ranges import resolve_page_ranges
+from pdf_input import PdfSource, get_pages, page_count
+from tracing import NULL_TRACER
+
+# Bytes of source objects that may be cached per reader before the cache is dropped
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+class StreamingPdfWriter:
+    """Write a merged PDF incrementally.
+
+    Every object is serialised to the output as soon as it is copied, so
+    only the xref offsets and the object-number map of the current source
+    are kept in memory. The page tree, catalog and xref are written by
+    close().
+
+    With dedup=True every copied object is hashed after its references
+    have been renumbered, and an object identical to one already written
+    (fonts, logos, ICC profiles of documents made from the same template)
+    is shared instead of written again. dedup_stats reports how many
+    objects and bytes were saved and the time spent hashing.
+
+    profile (a name from output_profiles.PROFILES or an OutputProfile)
+    recompresses streams, downsamples images on image_workers threads and
+    strips unused objects while copying.
+
+    tracer (a tracing.Tracer) records spans for opening files, parsing
+    xrefs, copying pages and writing the trailer. The CancelToken cancel
+    is checked before every page.
+
+    checkpoint() returns the state after the sources appended so far; a
+    writer created with resume_from=that state on the same file (opened
+    "r+b") truncates what came after it and continues from there.
+    """
+
+    def __init__(self, stream, memory_budget=DEFAULT_MEMORY_BUDGET, dedup=False, profile=None,
+                 image_workers=None, tracer=None, cancel=None, resume_from=None):
+        self.stream = stream
+        self.tracer = tracer or NULL_TRACER
+        self.cancel = cancel
+        self.memory_budget = memory_budget
+        self.dedup = dedup
+        self.profile = get_profile(profile)
+        self.image_workers = image_workers or os.cpu_count() or 1
+        self.dedup_stats = {"objects": 0, "bytes_saved": 0, "seconds": 0.0}
+        self.pages_written = 0
+        self._start = stream.tell()
+        self._offsets = [None]   # index is the object number, 0 is the free head
+        self._kids = []
+        self._object_map = {}    # (idnum, generation) in the source -> object number
+        self._page_ids = {}      # source page reference -> reserved object number
+        self._written_pages = set()
+        self._cached_bytes = 0
+        self._reader = None
+        self._digests = {}       # content hash -> object number, kept across sources
+        self._in_progress = set()
+        self._back_referenced = set()
+        self._image_executor = None
+        self._pending_images = deque()
+        if resume_from is not None:
+            self._restore(resume_from)
+            return
+        self._pages_id = self._reserve()
+        stream.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def append(self, reader, page_indices=None, on_page=None, page_ranges=None):
+        """Copy pages of reader (all of them by default) to the output.
+
+        The pages are given either as 0-based page_indices or as a
+        page_ranges spec like "1-3,10,-1" (see page_ranges). Selected pages
+        are looked up without loading the rest of the page tree.
+        on_page, if given, is called with (pages done, pages) after each page.
+        """
+        with self.tracer.span("load_pages"):
+            if page_ranges is not None:
+                page_indices = resolve_page_ranges(page_ranges, page_count(reader))
+            if page_indices is None:
+                pages = list(reader.pages)
+            else:
+                pages = get_pages(reader, page_indices)
+
+        self._reader = reader
+        # Reserve numbers for all pages first, so links between copied pages stay valid
+        for page in pages:
+            key = _ref_key(page.indirect_reference)
+            if key not in self._page_ids:
+                self._page_ids[key] = self._reserve()
+        try:
+            with self.tracer.span("copy_pages", pages=len(pages)):
+                for done, page in enumerate(pages, 1):
+                    if self.cancel is not None:
+                        self.cancel.check()
+                    if self.tracer.enabled:
+                        with self.tracer.span("add_page"):
+                            self._write_page(page)
+                    else:
+                        self._write_page(page)
+                    if on_page is not None:
+                        on_page(done, len(pages))
+        finally:
+            self.release()
+        self.tracer.count("pages", len(pages))
+        return len(pages)
+
+    def append_file(self, pdf_path, page_indices=None, on_page=None, page_ranges=None):
+        """Copy pages of the PDF at pdf_path, reading it lazily and closing it afterwards.
+
+        The file is memory-mapped, so only the objects of the copied pages
+        are read, and the mapped memory is released after every page.
+        """
+        name = os.path.basename(pdf_path)
+        with self.tracer.span("open", file=name):
+            source = PdfSource(pdf_path)
+
+        def page_written(done, pages):
+            source.trim()
+            if on_page is not None:
+                on_page(done, pages)
+
+        with source:
+            self.tracer.count("input_bytes", source.size)
+            with self.tracer.span("parse_xref", file=name):
+                reader = source.reader()
+            return self.append(reader, page_indices, page_written, page_ranges)
+
+    def checkpoint(self):
+        """Return the writer state after everything written so far, as JSON-compatible data.
+
+        Must be called between sources; pending images are written first.
+        """
+        self._flush_images()
+        self.stream.flush()
+        return {"length": self._tell(), "offsets": list(self._offsets), "kids": list(self._kids),
+                "pages_id": self._pages_id, "pages_written": self.pages_written,
+                "digests": {digest.hex(): number for digest, number in self._digests.items()},
+                "dedup_stats": dict(self.dedup_stats)}
+
+    def _restore(self, state):
+        self._offsets = list(state["offsets"])
+        self._kids = list(state["kids"])
+        self._pages_id = state["pages_id"]
+        self.pages_written = state["pages_written"]
+        self._digests = {bytes.fromhex(digest): number for digest, number in state["digests"].items()}
+        self.dedup_stats.update(state["dedup_stats"])
+        # Objects written after the checkpoint are not in its xref offsets, drop them
+        self.stream.seek(self._start + state["length"])
+        self.stream.truncate()
+
+    def release(self):
+        """Forget everything about the current source so it can be garbage collected"""
+        self._object_map = {}
+        self._page_ids = {}
+        self._written_pages = set()
+        self._cached_bytes = 0
+        self._reader = None
+
+    def close(self):
+        """Write the page tree, catalog, xref table and trailer"""
+        with self.tracer.span("write_trailer"):
+            self._close()
+        self.tracer.count("output_bytes", self._tell())
+
+    def abort(self):
+        """Drop pending image work of an output that will not be finished"""
+        self._pending_images.clear()
+        if self._image_executor is not None:
+            self._image_executor.shutdown(cancel_futures=True)
+            self._image_executor = None
+
+    def _close(self):
+        with self.tracer.span("finish_images"):
+            self._flush_images()
+        if self._image_executor is not None:
+            self._image_executor.shutdown()
+            self._image_executor = None
+
+        pages = DictionaryObject()
+        pages[NameObject("/Type")] = NameObject("/Pages")
+        pages[NameObject("/Kids")] = ArrayObject(IndirectObject(n, 0, None) for n in self._kids)
+        pages[NameObject("/Count")] = NumberObject(len(self._kids))
+        self._write_object(self._pages_id, pages)
+
+        catalog_id = self._reserve()
+        catalog = DictionaryObject()
+        catalog[NameObject("/Type")] = NameObject("/Catalog")
+        catalog[NameObject("/Pages")] = IndirectObject(self._pages_id, 0, None)
+        self._write_object(catalog_id, catalog)
+
+        xref_offset = self._tell()
+        self.stream.write(b"xref\n0 %d\n" % len(self._offsets))
+        self.stream.write(b"0000000000 65535 f \n")
+        for offset in self._offsets[1:]:
+            if offset is None:
+                self.stream.write(b"0000000000 65535 f \n")
+            else:
+                self.stream.write(b"%010d 00000 n \n" % offset)
+        self.stream.write(b"trailer\n<< /Size %d /Root %d 0 R >>\n" % (len(self._offsets), catalog_id))
+        self.stream.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+        self.stream.flush()
+
+    def _reserve(self):
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def _tell(self):
+        return self.stream.tell() - self._start
+
+    def _write_object(self, number, obj):
+        self._offsets[number] = self._tell()
+        self.stream.write(b"%d 0 obj\n" % number)
+        obj.write_to_stream(self.stream)
+        self.stream.write(b"\nendobj\n")
+
+    def _write_deduplicated(self, key, number, obj):
+        """Write obj unless an identical object exists; return the number to use"""
+        started = time.perf_counter()
+        buffer = io.BytesIO()
+        obj.write_to_stream(buffer)
+        data = buffer.getvalue()
+        digest = hashlib.sha256(data).digest()
+        existing = self._digests.get(digest)
+        self.dedup_stats["seconds"] += time.perf_counter() - started
+        if existing is not None:
+            # The reserved number stays unused and is written as a free xref entry
+            self._object_map[key] = existing
+            self.dedup_stats["objects"] += 1
+            self.dedup_stats["bytes_saved"] += len(data)
+            return existing
+        self._digests[digest] = number
+        if self._is_image_work(obj):
+            self._defer_image(number, obj)
+            return number
+        self._offsets[number] = self._tell()
+        self.stream.write(b"%d 0 obj\n" % number)
+        self.stream.write(data)
+        self.stream.write(b"\nendobj\n")
+        return number
+
+    def _strips(self, name):
+        return self.profile is not None and self.profile.strip_unused and name in STRIP_KEYS
+
+    def _is_image_work(self, obj):
+        return (self.profile is not None and isinstance(obj, StreamObject)
+                and wants_image_work(obj, self.profile))
+
+    def _emit(self, number, obj):
+        if self._is_image_work(obj):
+            self._defer_image(number, obj)
+        else:
+            self._write_object(number, obj)
+
+    def _defer_image(self, number, obj):
+        """Optimise an image on the worker threads and write it once it is done"""
+        if self._image_executor is None:
+            self._image_executor = ThreadPoolExecutor(self.image_workers, thread_name_prefix="vpdf-image")
+        future = self._image_executor.submit(optimize_image, obj, self.profile)
+        self._pending_images.append((number, obj, future))
+        # Bound the number of decoded images held in memory
+        self._flush_images(limit=2 * self.image_workers)
+
+    def _flush_images(self, limit=0):
+        """Write finished images, then wait until at most limit are pending"""
+        pending = deque()
+        for item in self._pending_images:
+            if item[2].done():
+                self._write_image(*item)
+            else:
+                pending.append(item)
+        self._pending_images = pending
+        while len(self._pending_images) > limit:
+            self._write_image(*self._pending_images.popleft())
+
+    def _write_image(self, number, obj, future):
+        try:
+            obj = future.result()
+        except Exception:
+            # Undecodable image: optimize_image only modifies obj on success
+            pass
+        self._write_object(number, obj)
+
+    def _write_page(self, page):
+        key = _ref_key(page.indirect_reference)
+        number = self._page_ids[key]
+        if number in self._written_pages:
+            # The same source page selected twice gets a second copy
+            number = self._reserve()
+        self._written_pages.add(number)
+
+        new_page = DictionaryObject()
+        for name, value in page.items():
+            if name == "/Parent" or self._strips(name):
+                continue
+            if name == "/Resources" and self.profile is not None and self.profile.strip_unused:
+                used_names = used_resource_names(page)
+                if used_names is not None:
+                    value = prune_resources(value.get_object(), used_names)
+            new_page[NameObject(name)] = self._copy(value)
+        new_page[NameObject("/Parent")] = IndirectObject(self._pages_id, 0, None)
+        self._write_object(number, new_page)
+        self._kids.append(number)
+        self.pages_written += 1
+
+        if self._cached_bytes > self.memory_budget:
+            # Objects already copied are in _object_map, dropping the reader's
+            # cache only costs a re-parse if something references them again
+            self._reader.resolved_objects.clear()
+            self._cached_bytes = 0
+
+    def _copy(self, obj):
+        if isinstance(obj, IndirectObject):
+            return self._copy_reference(obj)
+        if isinstance(obj, StreamObject):
+            new_obj = StreamObject()
+            for name, value in obj.items():
+                if name != "/Length" and not self._strips(name):
+                    new_obj[NameObject(name)] = self._copy(value)
+            new_obj._data = obj._data
+            self._cached_bytes += len(obj._data)
+            if (self.profile is not None and self.profile.compress_level is not None
+                    and not wants_image_work(new_obj, self.profile)):
+                recompress_stream(new_obj, self.profile.compress_level)
+            return new_obj
+        if isinstance(obj, DictionaryObject):
+            new_obj = DictionaryObject()
+            for name, value in obj.items():
+                if not self._strips(name):
+                    new_obj[NameObject(name)] = self._copy(value)
+            return new_obj
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._copy(value) for value in obj)
+        return obj
+
+    def _copy_reference(self, ref):
+        key = _ref_key(ref)
+        number = self._object_map.get(key) or self._page_ids.get(key)
+        if number is not None:
+            if key in self._in_progress:
+                # A cycle: the reserved number is already in use, never merge it away
+                self._back_referenced.add(key)
+            return IndirectObject(number, 0, None)
+        obj = ref.get_object()
+        if isinstance(obj, DictionaryObject) and obj.get("/Type") in ("/Page", "/Pages"):
+            # Reference to a page that is not part of the output (e.g. a link target)
+            return NullObject()
+        number = self._reserve()
+        self._object_map[key] = number
+        if not self.dedup:
+            self._emit(number, self._copy(obj))
+            return IndirectObject(number, 0, None)
+
+        self._in_progress.add(key)
+        try:
+            new_obj = self._copy(obj)
+        finally:
+            self._in_progress.discard(key)
+        if key in self._back_referenced or _is_annotation(obj):
+            self._back_referenced.discard(key)
+            self._emit(number, new_obj)
+        else:
+            number = self._write_deduplicated(key, number, new_obj)
+        return IndirectObject(number, 0, None)
+
+
+def _is_annotation(obj):
+    # Annotations are per-page objects even when their content is identical
+    return isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Annot"
+
+
+def _ref_key(ref):
+    return (ref.idnum, ref.generation)
+
+
+def merge_pdfs(pdf_paths, output_path, memory_budget=DEFAULT_MEMORY_BUDGET, page_cache=None,
+               dedup=False, profile=None, tracer=None, page_ranges=None):
+    """Merge pdf_paths into output_path, streaming pages to disk as they are copied.
+
+    Each source is read lazily from its file handle and closed as soon as
+    its pages are written. page_ranges, if given, holds a page range spec
+    (or None for all pages) per path. The output is written to a temporary
+    file that replaces output_path once complete, so a failed merge leaves
+    output_path untouched. Returns the number of pages written.
+    """
+    part_path = temp_output_path(output_path)
+    try:
+        with open(part_path, "wb") as output_file:
+            writer = StreamingPdfWriter(output_file, memory_budget, dedup, profile, tracer=tracer)
+            for pdf_path, ranges in zip(pdf_paths, page_ranges or repeat(None)):
+                pages = writer.append_file(pdf_path, page_ranges=ranges)
+                if page_cache is not None and ranges is None:
+                    page_cache.put(pdf_path, pages)
+            writer.close()
+        os.replace(part_path, output_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return writer.pages_written
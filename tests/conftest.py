@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import corpus  # noqa: E402
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """Write a generated PDF of n text pages into tmp_path and return its path"""
+    def make(name, pages, **options):
+        path = str(tmp_path / name)
+        corpus.make_pdf(path, pages, **options)
+        return path
+    return make
+
+
+@pytest.fixture
+def make_docx(tmp_path):
+    """Write a generated DOCX into tmp_path and return its path"""
+    def make(name, paragraphs=5, **options):
+        path = str(tmp_path / name)
+        corpus.make_docx(path, paragraphs, **options)
+        return path
+    return make
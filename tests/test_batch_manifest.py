@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+import batch_manifest
+from batch_manifest import ManifestError, parse_manifest
+
+
+def test_docstring_example_is_valid():
+    doc = batch_manifest.__doc__
+    example = json.loads(doc[doc.index("{"):doc.index("\n\n", doc.index("{"))])
+    outputs = parse_manifest(example, "/base")
+    assert [o.options["profile"] for o in outputs] == ["balanced", "balanced"]
+    assert outputs[1].options["linearize"] and outputs[0].inputs[2] == ("/base/annex.pdf", "1-3")
+
+
+@pytest.mark.parametrize("data, error", [
+    ({"outputs": []}, "non-empty"),
+    ({"outputs": [{"output": "a.pdf", "inputs": ["x.txt"]}]}, "not a DOCX or PDF"),
+    ({"defaults": {"profile": "print"}, "outputs": [{"output": "a.pdf", "inputs": ["x.pdf"]}]}, "unknown profile"),
+    ({"outputs": [{"output": "a.pdf", "inputs": [{"path": "x.pdf", "pages": "0"}]}]}, "x.pdf"),
+])
+def test_invalid_manifests(data, error):
+    with pytest.raises(ManifestError, match=error):
+        parse_manifest(data)
+
+
+def test_page_selection_beyond_the_end_fails_its_output_only(make_pdf, tmp_path):
+    annex = make_pdf("annex.pdf", 3)
+    outputs = parse_manifest({"outputs": [
+        {"output": "good.pdf", "inputs": [{"path": annex, "pages": "1-3"}]},
+        {"output": "bad.pdf", "inputs": [{"path": annex, "pages": "2-9"}]},
+    ]}, str(tmp_path))
+    good, bad = batch_manifest.run_manifest(outputs, merge_workers=1, use_cache=False)
+    assert good.error is None and good.pages == 3
+    assert "annex.pdf" in bad.error and bad.started is None
+    assert not (tmp_path / "bad.pdf").exists()
@@ -0,0 +1,36 @@
+from conversion_cache import ConversionCache
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    assert cache.lookup("a") is None
+    cache.insert_bytes("a", b"%PDF-a")
+    dest = tmp_path / "out.pdf"
+    assert cache.fetch("a", str(dest), link=True)
+    assert dest.read_bytes() == b"%PDF-a"
+    assert not cache.fetch("b", str(tmp_path / "other.pdf"))
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 2
+    assert cache.hit_rate() == 1 / 3
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = ConversionCache(str(tmp_path / "cache"), max_bytes=250)
+    for key in "abc":
+        cache.insert_bytes(key, bytes(100))
+    # Over the cap after c: a, the oldest, goes
+    assert cache.lookup("a") is None
+    assert cache.lookup("b") is not None
+    cache.insert_bytes("d", bytes(100))
+    # b was used after c, so c goes now
+    assert cache.lookup("c") is None
+    assert cache.lookup("b") is not None and cache.lookup("d") is not None
+    assert cache.stats["evictions"] == 2
+    assert cache.total_bytes == 200
+
+
+def test_entries_survive_a_restart(tmp_path):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    cache.insert_bytes("a", b"%PDF-a")
+    reopened = ConversionCache(str(tmp_path / "cache"))
+    assert reopened.total_bytes == 6
+    assert reopened.lookup("a") is not None
@@ -0,0 +1,55 @@
+import functools
+import os
+import threading
+
+import pytest
+
+from cancellation import Cancelled, CancelToken
+from converter_pool import ConversionTimeout, ConverterPool, FakeBackend
+
+
+@pytest.fixture
+def docx(make_docx):
+    return make_docx("a.docx", 10)
+
+
+def test_instances_are_reused_then_recycled(docx, tmp_path):
+    pool = ConverterPool(FakeBackend, size=1, max_jobs_per_instance=2)
+    for i in range(5):
+        pool.convert(docx, str(tmp_path / f"{i}.pdf"))
+    assert all(os.path.exists(tmp_path / f"{i}.pdf") for i in range(5))
+    assert pool.stats["jobs"] == 5
+    assert pool.stats["started"] == 3 and pool.stats["recycled"] == 2
+    pool.close()
+
+
+def test_crashed_instance_is_replaced_and_job_retried(docx, tmp_path):
+    pool = ConverterPool(functools.partial(FakeBackend, crash_after=1))
+    pool.convert(docx, str(tmp_path / "1.pdf"))
+    pool.convert(docx, str(tmp_path / "2.pdf"))
+    assert os.path.exists(tmp_path / "2.pdf")
+    assert pool.stats["started"] == 2 and pool.stats["failures"] == 1
+    pool.close()
+
+
+def test_timeout_kills_the_instance(docx, tmp_path):
+    pool = ConverterPool(functools.partial(FakeBackend, hang_after=0))
+    with pytest.raises(ConversionTimeout):
+        pool.convert(docx, str(tmp_path / "out.pdf"), timeout=0.2)
+    assert not os.path.exists(tmp_path / "out.pdf")
+    assert pool.stats["killed"] == 1
+    pool.close()
+
+
+def test_cancel_stops_a_running_conversion(docx, tmp_path):
+    pool = ConverterPool(functools.partial(FakeBackend, hang_after=0))
+    cancel = CancelToken()
+    threading.Timer(0.1, cancel.cancel).start()
+    with pytest.raises(Cancelled):
+        pool.convert(docx, str(tmp_path / "out.pdf"), cancel=cancel)
+    assert pool.stats["killed"] == 1
+    # Already cancelled: not even started
+    with pytest.raises(Cancelled):
+        pool.convert(docx, str(tmp_path / "out.pdf"), cancel=cancel)
+    assert pool.stats["jobs"] == 1
+    pool.close()
@@ -0,0 +1,98 @@
+import asyncio
+import http.client
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import job_service
+from cancellation import CancelToken
+from job_service import HttpError, JobService, run_service
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = JobService(str(tmp_path / "work"), max_queue=1)
+    # No workers: submitted jobs stay queued
+    service._queue = asyncio.Queue()
+    return service
+
+
+def test_unhashable_upload_ids_are_bad_requests(service):
+    for body in ({"inputs": [["a"]]}, {"inputs": [{"upload": {"a": 1}}]}, {"inputs": ["x"], "profile": []}):
+        with pytest.raises(HttpError) as error:
+            service._submit("merge", body)
+        assert error.value.status == 400
+    with pytest.raises(HttpError) as error:
+        service._submit("convert", {"input": [1]})
+    assert error.value.status == 400
+
+
+def test_cancelled_queued_job_frees_its_slot(service, make_pdf):
+    service.uploads["0" * 16] = (make_pdf("a.pdf", 1), "a.pdf", time.time())
+    job = service._submit("merge", {"inputs": ["0" * 16]})
+    with pytest.raises(HttpError) as error:
+        service._submit("merge", {"inputs": ["0" * 16]})
+    assert error.value.status == 503
+    service._delete_job(job)
+    assert job.state == "cancelled"
+    assert service._submit("merge", {"inputs": ["0" * 16]}).state == "queued"
+
+
+def test_upload_of_unfinished_job_is_not_deleted(service, make_pdf):
+    path = make_pdf("a.pdf", 1)
+    service.uploads["0" * 16] = (path, "a.pdf", time.time())
+    job = service._submit("merge", {"inputs": ["0" * 16]})
+    with pytest.raises(HttpError) as error:
+        service._delete_upload("0" * 16)
+    assert error.value.status == 409 and os.path.exists(path)
+    service._delete_job(job)
+    assert service._delete_upload("0" * 16) == {"deleted": "0" * 16}
+    assert not os.path.exists(path) and not service.uploads
+
+
+def test_linearize_is_refused_without_qpdf(service, make_pdf, monkeypatch):
+    monkeypatch.setattr(job_service, "linearize_available", lambda: False)
+    service.uploads["0" * 16] = (make_pdf("a.pdf", 1), "a.pdf", time.time())
+    with pytest.raises(HttpError, match="pikepdf") as error:
+        service._submit("merge", {"inputs": ["0" * 16], "linearize": True})
+    assert error.value.status == 400 and not service.jobs
+    assert service._submit("merge", {"inputs": ["0" * 16]}).state == "queued"
+
+
+def _request(address, method, path, body=None):
+    connection = http.client.HTTPConnection(*address, timeout=30)
+    connection.request(method, path, body)
+    response = connection.getresponse()
+    data = json.loads(response.read())
+    connection.close()
+    return response.status, data
+
+
+def test_merge_status_gives_the_result_url(tmp_path, make_pdf):
+    cancel = CancelToken()
+    ready = threading.Event()
+    address = []
+    work_dir = str(tmp_path / "work")
+    thread = threading.Thread(target=run_service, kwargs=dict(
+        port=0, cancel=cancel, work_dir=work_dir, on_ready=lambda a: (address.extend(a[:2]), ready.set())))
+    thread.start()
+    try:
+        assert ready.wait(10)
+        with open(make_pdf("a.pdf", 3), "rb") as f:
+            status, upload = _request(address, "POST", "/uploads?name=a.pdf", f.read())
+        assert status == 201
+        status, job = _request(address, "POST", "/jobs/merge", json.dumps({"inputs": [upload["id"]]}))
+        assert status == 202
+        deadline = time.monotonic() + 30
+        while job["state"] in ("queued", "running") and time.monotonic() < deadline:
+            time.sleep(0.05)
+            status, job = _request(address, "GET", f"/jobs/{job['id']}")
+        assert job["state"] == "done", job
+        assert job["message"] == f"3 pages merged to /jobs/{job['id']}/result"
+        assert work_dir not in json.dumps(job)
+    finally:
+        cancel.cancel()
+        thread.join(10)
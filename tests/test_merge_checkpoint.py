@@ -0,0 +1,67 @@
+from pypdf import PdfReader
+
+import converter_logic
+import stream_merge
+from cancellation import CancelToken
+from merge_checkpoint import MergeCheckpoint, partial_directory
+from stream_merge import StreamingPdfWriter
+
+
+def test_cancelled_merge_resumes_to_the_same_output(make_pdf, tmp_path, monkeypatch):
+    # Checkpoint between every input, not only every few seconds
+    monkeypatch.setattr(MergeCheckpoint, "INTERVAL", 0)
+    paths = [make_pdf(f"{i}.pdf", 3, seed=i) for i in range(5)]
+    expected = str(tmp_path / "expected.pdf")
+    output = str(tmp_path / "out.pdf")
+    assert converter_logic.process_and_merge_mixed_files(paths, expected, use_cache=False)[0]
+
+    cancel = CancelToken()
+    append_file = StreamingPdfWriter.append_file
+
+    def cancel_at_fourth_file(self, pdf_path, *args, **kwargs):
+        if pdf_path == paths[3]:
+            cancel.cancel()
+        return append_file(self, pdf_path, *args, **kwargs)
+
+    monkeypatch.setattr(stream_merge.StreamingPdfWriter, "append_file", cancel_at_fourth_file)
+    success, message = converter_logic.process_and_merge_mixed_files(paths, output, use_cache=False,
+                                                                     cancel=cancel, resumable=True)
+    assert not success and "cancelled" in message
+    assert not (tmp_path / "out.pdf").exists()
+    assert (tmp_path / "out.pdf.vpdf-partial" / "checkpoint.json").exists()
+
+    monkeypatch.setattr(stream_merge.StreamingPdfWriter, "append_file", append_file)
+    success, message = converter_logic.process_and_merge_mixed_files(paths, output, use_cache=False,
+                                                                     resumable=True)
+    assert success, message
+    assert "Resumed after 3 of 5 files" in message
+    with open(output, "rb") as f, open(expected, "rb") as g:
+        assert f.read() == g.read()
+    assert not (tmp_path / "out.pdf.vpdf-partial").exists()
+    assert partial_directory(output) == output + ".vpdf-partial"
+
+
+def test_checkpoint_of_other_inputs_is_discarded(make_pdf, tmp_path, monkeypatch):
+    monkeypatch.setattr(MergeCheckpoint, "INTERVAL", 0)
+    paths = [make_pdf(f"{i}.pdf", 2, seed=i) for i in range(3)]
+    output = str(tmp_path / "out.pdf")
+    checkpoint = MergeCheckpoint(output, "old signature")
+    with open(checkpoint.part_path, "wb") as f:
+        f.write(b"junk")
+    with open(checkpoint.part_path, "rb+") as f:
+        checkpoint.save(2, {"length": 4}, f)
+    success, message = converter_logic.process_and_merge_mixed_files(paths, output, use_cache=False,
+                                                                     resumable=True)
+    assert success and "Resumed" not in message
+    assert len(PdfReader(output).pages) == 6
+
+
+def test_checkpoint_is_saved_only_when_due(tmp_path):
+    checkpoint = MergeCheckpoint(str(tmp_path / "out.pdf"), "signature")
+    with open(checkpoint.part_path, "wb") as f:
+        assert not checkpoint.due(f)
+        f.write(bytes(16))
+        checkpoint.MAX_BYTES = 16
+        assert checkpoint.due(f)
+        checkpoint.save(1, {"length": 16}, f)
+        assert not checkpoint.due(f)
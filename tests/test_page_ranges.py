@@ -0,0 +1,46 @@
+import pytest
+
+from page_ranges import PageRangeError, parse_page_ranges, resolve_page_ranges
+
+
+@pytest.mark.parametrize("spec, expected", [
+    (None, None),
+    ("", None),
+    ("  ", None),
+    ("3", [(3, 3)]),
+    ("1-3, 10,-1", [(1, 3), (10, 10), (-1, -1)]),
+    ("5-", [(5, None)]),
+    ("-3--1", [(-3, -1)]),
+    ("5-2", [(5, 2)]),
+])
+def test_parse(spec, expected):
+    assert parse_page_ranges(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["0", "1-0", "a", "1-2-3", "1,,2", "--1"])
+def test_parse_errors(spec):
+    with pytest.raises(PageRangeError):
+        parse_page_ranges(spec)
+
+
+@pytest.mark.parametrize("spec, expected", [
+    (None, [0, 1, 2, 3, 4]),
+    ("1-3,10", None),
+    ("2,-1", [1, 4]),
+    ("4-", [3, 4]),
+    ("-2--1", [3, 4]),
+    ("3-1", [2, 1, 0]),
+    ("1,1", [0, 0]),
+])
+def test_resolve(spec, expected):
+    if expected is None:
+        with pytest.raises(PageRangeError, match="Page 10 is out of range"):
+            resolve_page_ranges(spec, 5)
+    else:
+        assert resolve_page_ranges(spec, 5) == expected
+
+
+def test_resolve_accepts_parsed_ranges():
+    assert resolve_page_ranges(parse_page_ranges("2-3"), 5) == [1, 2]
+    with pytest.raises(PageRangeError):
+        resolve_page_ranges("-6", 5)
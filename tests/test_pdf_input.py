@@ -0,0 +1,102 @@
+import pytest
+from pypdf import PdfReader
+
+from corpus import _RawPdf
+from pdf_input import PdfSource, count_pages, get_pages, page_count
+
+
+def test_source_reads_pages_through_the_map(make_pdf):
+    path = make_pdf("a.pdf", 3)
+    with PdfSource(path) as source:
+        assert source._map is not None
+        reader = source.reader()
+        assert reader.pages[0].extract_text().startswith("Page 1")
+        # Trimmed pages are read again from the page cache
+        source.trim()
+        assert reader.pages[2].extract_text().startswith("Page 3")
+    assert source._map is None and source._file.closed
+
+
+def test_empty_file_falls_back_to_the_file_object(tmp_path):
+    path = tmp_path / "empty.pdf"
+    path.write_bytes(b"")
+    with PdfSource(str(path)) as source:
+        assert source.size == 0
+        assert source.stream is source._file
+
+
+def test_count_pages_reads_the_root_count(make_pdf):
+    assert count_pages(make_pdf("a.pdf", 7)) == 7
+    with PdfSource(make_pdf("b.pdf", 4)) as source:
+        reader = source.reader()
+        assert page_count(reader) == 4
+        assert reader.flattened_pages is None
+
+
+def test_count_pages_walks_the_tree_when_the_count_is_invalid(make_pdf, tmp_path):
+    with open(make_pdf("a.pdf", 3), "rb") as f:
+        data = f.read()
+    # Same length, so the xref offsets stay valid
+    broken = data.replace(b"/Count 3 >>", b"/Count /X>>")
+    assert broken != data
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(broken)
+    assert count_pages(str(path)) == 3
+
+
+def _nested_tree_pdf(path):
+    """10 pages in two intermediate nodes that carry the inherited attributes"""
+    pdf = _RawPdf()
+    root_id = pdf.reserve()
+    font = pdf.add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    nodes = []
+    for node_number, (first, pages, attributes) in enumerate([
+            (1, 4, "/MediaBox [0 0 300 400] /Rotate 90"),
+            (5, 6, "/CropBox [10 10 200 300] /Resources << /Font << /F2 %d 0 R >> >>" % font)]):
+        node_id = pdf.reserve()
+        kids = []
+        for number in range(first, first + pages):
+            # Page 7 has no /Resources of its own and uses the font of its parent node
+            font_name = b"F2" if number == 7 else b"F1"
+            content = pdf.add("<< >>", b"BT /%s 12 Tf 50 50 Td (Page %d) Tj ET" % (font_name, number))
+            own = "/Rotate 180 " if number == 2 else ""
+            own += "/Resources << /Font << /F1 %d 0 R >> >>" % font if number != 7 else ""
+            kids.append(pdf.add(f"<< /Type /Page /Parent {node_id} 0 R {own} /Contents {content} 0 R >>"))
+        pdf.set(node_id, f"<< /Type /Pages /Parent {root_id} 0 R /Kids [{' '.join(f'{k} 0 R' for k in kids)}] "
+                         f"/Count {pages} {attributes} >>")
+        nodes.append(node_id)
+    pdf.set(root_id, f"<< /Type /Pages /Kids [{' '.join(f'{n} 0 R' for n in nodes)}] /Count 10 "
+                     f"/MediaBox [0 0 612 792] >>")
+    catalog = pdf.add(f"<< /Type /Catalog /Pages {root_id} 0 R >>")
+    pdf.write(path, catalog)
+    return path
+
+
+def _describe(page):
+    return (page.extract_text(), [float(v) for v in page.mediabox], [float(v) for v in page.cropbox],
+            page.rotation, sorted(page["/Resources"]["/Font"]) if "/Resources" in page else None)
+
+
+@pytest.fixture
+def nested(tmp_path):
+    return _nested_tree_pdf(str(tmp_path / "nested.pdf"))
+
+
+def test_get_pages_matches_pypdf(nested):
+    expected = [_describe(page) for page in PdfReader(nested).pages]
+    for index in (0, 1, 3, 4, 6, 9):
+        with PdfSource(nested) as source:
+            reader = source.reader()
+            page, = get_pages(reader, [index])
+            assert _describe(page) == expected[index]
+            # Only the nodes on the way were loaded, not the flattened page list
+            assert reader.flattened_pages is None
+
+
+def test_get_pages_order_and_range(nested):
+    with PdfSource(nested) as source:
+        reader = source.reader()
+        pages = get_pages(reader, [9, 0, 9])
+        assert [page.extract_text() for page in pages] == ["Page 10", "Page 1", "Page 10"]
+        with pytest.raises(IndexError):
+            get_pages(reader, [10])
@@ -0,0 +1,70 @@
+from pypdf import PdfWriter
+
+import converter_logic
+from preflight import check_file, run_preflight
+
+
+def _encrypt(source, path, user_password):
+    writer = PdfWriter(clone_from=source)
+    writer.encrypt(user_password, "owner", algorithm="RC4-128")
+    writer.write(path)
+    return path
+
+
+def test_good_pdf_and_docx(make_pdf, make_docx):
+    reports = run_preflight([make_pdf("a.pdf", 4), make_docx("b.docx")])
+    assert [r.ok for r in reports] == [True, True]
+    assert reports[0].pages == 4 and reports[0].kind == "pdf"
+    assert reports[1].pages is None and reports[1].kind == "docx"
+
+
+def test_owner_password_only_pdf_passes(make_pdf, tmp_path):
+    path = _encrypt(make_pdf("a.pdf", 2), str(tmp_path / "owner.pdf"), "")
+    report = check_file(path)
+    assert report.ok, report.errors
+    assert report.pages == 2
+    assert any("owner password" in w for w in report.warnings)
+
+
+def test_owner_password_only_pdf_merges_with_preflight(make_pdf, tmp_path):
+    path = _encrypt(make_pdf("a.pdf", 2), str(tmp_path / "owner.pdf"), "")
+    output = str(tmp_path / "out.pdf")
+    success, message = converter_logic.process_and_merge_mixed_files([path], output, use_cache=False)
+    assert success, message
+
+
+def test_user_password_pdf_fails(make_pdf, tmp_path):
+    path = _encrypt(make_pdf("a.pdf", 2), str(tmp_path / "user.pdf"), "secret")
+    report = check_file(path)
+    assert not report.ok
+    assert "password" in report.errors[0]
+
+
+def test_truncated_pdf(make_pdf, tmp_path):
+    with open(make_pdf("a.pdf", 20), "rb") as f:
+        data = f.read()
+    path = tmp_path / "cut.pdf"
+    path.write_bytes(data[:len(data) // 2])
+    report = check_file(str(path))
+    assert not report.ok and "Truncated" in report.errors[0]
+
+
+def test_not_a_pdf_and_empty(tmp_path):
+    (tmp_path / "junk.pdf").write_bytes(b"hello")
+    (tmp_path / "empty.pdf").write_bytes(b"")
+    reports = run_preflight([str(tmp_path / "junk.pdf"), str(tmp_path / "empty.pdf"), str(tmp_path / "gone.pdf")])
+    assert [r.errors[0] for r in reports] == ["Not a PDF (no %PDF- header)", "Empty file", "File not found"]
+
+
+def test_damaged_docx(make_docx, tmp_path):
+    with open(make_docx("a.docx", 50), "rb") as f:
+        data = f.read()
+    (tmp_path / "cut.docx").write_bytes(data[:-100])
+    (tmp_path / "ole.docx").write_bytes(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + bytes(512))
+    assert not check_file(str(tmp_path / "cut.docx")).ok
+    assert "Password-protected" in check_file(str(tmp_path / "ole.docx")).errors[0]
+
+
+def test_page_range_out_of_range(make_pdf):
+    report = check_file(make_pdf("a.pdf", 3), "1-5")
+    assert not report.ok and "out of range" in report.errors[0]
@@ -0,0 +1,93 @@
+from pypdf import PdfReader, PdfWriter
+
+import converter_logic
+from stream_merge import StreamingPdfWriter
+
+
+def _pages(path):
+    reader = PdfReader(path)
+    return [(page.extract_text(), [float(v) for v in page.mediabox]) for page in reader.pages]
+
+
+def _streaming_merge(paths, output, **options):
+    with open(output, "wb") as f:
+        writer = StreamingPdfWriter(f, **options)
+        for path in paths:
+            writer.append_file(path)
+        writer.close()
+    return writer
+
+
+def _pypdf_merge(paths, output):
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(path)
+    writer.write(output)
+
+
+def test_same_pages_as_pypdf(make_pdf, tmp_path):
+    paths = [make_pdf("a.pdf", 3, seed=1), make_pdf("b.pdf", 5, image_kb=20, seed=2)]
+    writer = _streaming_merge(paths, str(tmp_path / "stream.pdf"))
+    _pypdf_merge(paths, str(tmp_path / "pypdf.pdf"))
+    assert writer.pages_written == 8
+    assert _pages(str(tmp_path / "stream.pdf")) == _pages(str(tmp_path / "pypdf.pdf"))
+
+
+def test_merge_function_matches_pypdf(make_pdf, tmp_path):
+    paths = [make_pdf("a.pdf", 4, seed=3), make_pdf("b.pdf", 2, seed=4)]
+    output = str(tmp_path / "out.pdf")
+    success, message = converter_logic.process_and_merge_mixed_files(paths, output, use_cache=False)
+    assert success, message
+    _pypdf_merge(paths, str(tmp_path / "pypdf.pdf"))
+    assert _pages(output) == _pages(str(tmp_path / "pypdf.pdf"))
+
+
+def test_failed_merge_leaves_no_output(make_pdf, tmp_path):
+    output = tmp_path / "out.pdf"
+    success, message = converter_logic.process_and_merge_mixed_files(
+        [make_pdf("a.pdf", 2), str(tmp_path / "missing.pdf")], str(output), use_cache=False, preflight=False)
+    assert not success and "Merge failed" in message
+    assert list(tmp_path.iterdir()) == [tmp_path / "a.pdf"]
+
+
+def test_dedup_shares_template_assets(make_pdf, tmp_path):
+    paths = [make_pdf(f"{i}.pdf", 2, image_kb=30, shared_assets=True, seed=i) for i in range(4)]
+    plain = tmp_path / "plain.pdf"
+    shared = tmp_path / "dedup.pdf"
+    _streaming_merge(paths, str(plain))
+    writer = _streaming_merge(paths, str(shared), dedup=True)
+    # The logo and the font dictionary of the last three files are shared with the first
+    assert writer.dedup_stats["objects"] >= 6
+    assert shared.stat().st_size < plain.stat().st_size - 3 * 1024
+    assert _pages(str(shared)) == _pages(str(plain))
+
+
+def test_page_ranges_select_pages(make_pdf, tmp_path):
+    path = make_pdf("a.pdf", 5)
+    output = str(tmp_path / "out.pdf")
+    with open(output, "wb") as f:
+        writer = StreamingPdfWriter(f)
+        writer.append_file(path, page_ranges="-1,2-3")
+        writer.close()
+    assert [text.split("\n")[0] for text, _ in _pages(output)] == ["Page 5", "Page 2", "Page 3"]
+
+
+def test_merge_function_page_ranges_match_pypdf(make_pdf, tmp_path):
+    paths = [make_pdf("a.pdf", 4, seed=3), make_pdf("b.pdf", 2, seed=4)]
+    output = str(tmp_path / "out.pdf")
+    success, message = converter_logic.process_and_merge_mixed_files(paths, output, use_cache=False,
+                                                                     page_ranges=["2-3", None])
+    assert success, message
+    reference = PdfWriter()
+    reference.append(paths[0], pages=(1, 3))
+    reference.append(paths[1])
+    reference.write(str(tmp_path / "pypdf.pdf"))
+    assert _pages(output) == _pages(str(tmp_path / "pypdf.pdf"))
+
+
+def test_page_range_errors_fail_before_merging(make_pdf, tmp_path):
+    output = tmp_path / "out.pdf"
+    success, message = converter_logic.process_and_merge_mixed_files(
+        [make_pdf("a.pdf", 2)], str(output), use_cache=False, page_ranges=["1-x"])
+    assert not success and message.startswith("a.pdf: Invalid page range")
+    assert not output.exists()
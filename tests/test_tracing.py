@@ -0,0 +1,21 @@
+from tracing import Tracer
+
+
+def test_aggregate_only_tracer_keeps_no_events():
+    seen = []
+    tracer = Tracer(on_span=lambda name, seconds: seen.append(name), keep_events=False)
+    for _ in range(1000):
+        with tracer.span("add_page", page=1):
+            pass
+    tracer.count("pages", 1000)
+    assert tracer.events == []
+    assert tracer.summary()["add_page"][0] == 1000
+    assert len(seen) == 1000
+    assert "pages: 1000" in tracer.format_summary()
+
+
+def test_tracer_keeps_events_by_default():
+    tracer = Tracer()
+    with tracer.span("open", file="a.pdf"):
+        pass
+    assert [(e["name"], e["args"]) for e in tracer.events] == [("open", {"file": "a.pdf"})]
@@ -0,0 +1,66 @@
+import json
+import time
+import os
+
+import pytest
+
+import watch_folder
+from watch_folder import WatchDaemon, WatchRule
+
+
+@pytest.fixture
+def folders(tmp_path):
+    inbox, out = tmp_path / "in", tmp_path / "out"
+    inbox.mkdir()
+    return str(inbox), str(out), str(tmp_path / "state.json")
+
+
+def test_batches_of_removed_rules_are_dropped(folders):
+    inbox, out, state_path = folders
+    path = os.path.join(inbox, "ACME_1.pdf")
+    with open(state_path, "w") as f:
+        json.dump({"files": {path: {"status": "batched", "identity": [1, 1], "rule": 3, "group": "ACME"}},
+                   "batches": {"1": {"rule": 3, "group": "ACME", "files": [path], "output": "x.pdf"}},
+                   "next_batch": 2}, f)
+    daemon = WatchDaemon([WatchRule(inbox, out)], state_path)
+    assert daemon.state.batches == {} and daemon.state.files == {}
+    with open(state_path) as f:
+        assert json.load(f)["batches"] == {}
+
+
+def test_batch_leaves_running_set_when_bookkeeping_fails(folders, make_pdf, monkeypatch, tmp_path):
+    inbox, out, state_path = folders
+    path = make_pdf(os.path.join("in", "ACME_1.pdf"), 2)
+    daemon = WatchDaemon([WatchRule(inbox, out, archive_dir=str(tmp_path / "archive"))], state_path)
+    daemon.state.files[path] = {"status": "batched", "identity": [1, 1], "rule": 0, "group": "ACME"}
+    daemon.state.batches["1"] = {"rule": 0, "group": "ACME", "files": [path], "output": os.path.join(out, "ACME.pdf")}
+
+    def broken_archive(path, archive_dir):
+        raise RuntimeError("archive failed")
+
+    monkeypatch.setattr(watch_folder, "_archive", broken_archive)
+    daemon._running.add("1")
+    with pytest.raises(RuntimeError):
+        daemon._run_batch("1")
+    assert daemon._running == set()
+    assert "1" not in daemon.state.batches
+    assert os.path.exists(os.path.join(out, "ACME.pdf"))
+    daemon._executor.shutdown()
+
+
+def test_groups_larger_than_max_files_are_all_merged(folders, make_pdf):
+    inbox, out, state_path = folders
+    paths = [make_pdf(os.path.join("in", f"ACME_{i}.pdf"), 1, seed=i) for i in range(5)]
+    daemon = WatchDaemon([WatchRule(inbox, out, settle=0, quiet=0.2, max_files=2)], state_path)
+    deadline = time.monotonic() + 10
+    try:
+        while time.monotonic() < deadline:
+            daemon.step(None)
+            with daemon._lock:
+                if all(daemon.state.files.get(p, {}).get("status") == "done" for p in paths):
+                    break
+            time.sleep(0.05)
+    finally:
+        daemon._executor.shutdown(wait=True)
+    assert [daemon.state.files[p]["status"] for p in paths] == ["done"] * 5
+    assert sorted(os.listdir(out)) == ["ACME (2).pdf", "ACME (3).pdf", "ACME.pdf"]
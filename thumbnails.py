@@ -0,0 +1,217 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from conversion_cache import ConversionCache
+
+DEFAULT_THUMBNAIL_SIZE = 128
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+def default_thumbnail_dir():
+    """Location of the on-disk thumbnail cache"""
+    return os.path.join(os.path.expanduser("~"), ".vpdf", "thumbnails")
+
+
+def thumbnail_key(pdf_path, page_index, size):
+    """Cache key of a thumbnail: (path, mtime, file size, page, thumbnail size)"""
+    path = os.path.abspath(pdf_path)
+    st = os.stat(path)
+    ident = f"{path}\0{st.st_mtime_ns}\0{st.st_size}\0{page_index}\0{size}"
+    return hashlib.sha256(ident.encode("utf-8")).hexdigest()
+
+
+class ThumbnailCache(ConversionCache):
+    """LRU store of rendered PNG thumbnails, see ConversionCache"""
+
+    suffix = ".png"
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(cache_dir or default_thumbnail_dir(), max_bytes)
+
+    def load(self, key):
+        """Return the PNG bytes for key, or None"""
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+def render_thumbnail(pdf_path, page_index=0, size=DEFAULT_THUMBNAIL_SIZE):
+    """Render a page as PNG bytes, at most size pixels on its longer side.
+
+    Uses PyMuPDF when it is installed. Otherwise the page is drawn with
+    Pillow: its largest image (the scan, for scanned documents) or grey
+    bars where its text runs are, on a page of the right proportions.
+    """
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+    if fitz is not None:
+        with fitz.open(pdf_path) as document:
+            page = document[page_index]
+            scale = size / max(page.rect.width, page.rect.height)
+            return page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False).tobytes("png")
+    return _sketch_page(pdf_path, page_index, size)
+
+
+def _sketch_page(pdf_path, page_index, size):
+    from PIL import Image, ImageDraw
+
+    from pdf_input import PdfSource
+
+    with PdfSource(pdf_path) as source:
+        page = source.reader().pages[page_index]
+        width, height = float(page.mediabox.width), float(page.mediabox.height)
+        if page.get("/Rotate", 0) % 180:
+            width, height = height, width
+        scale = size / max(width, height, 1)
+        canvas = Image.new("RGB", (max(1, round(width * scale)), max(1, round(height * scale))), "white")
+
+        image = _largest_image(page)
+        if image is not None:
+            image.thumbnail(canvas.size)
+            canvas.paste(image.convert("RGB"), ((canvas.width - image.width) // 2,
+                                                (canvas.height - image.height) // 2))
+        else:
+            draw = ImageDraw.Draw(canvas)
+
+            def text_run(text, cm, tm, font, font_size):
+                text = text.strip()
+                if not text:
+                    return
+                # Text space to page space: horizontal position and scale from tm x cm
+                x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+                y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+                em = max(abs(font_size * tm[0] * cm[0]), 1)
+                left, top = x * scale, (height - y) * scale
+                draw.rectangle([left, top - max(1, em * scale * 0.6),
+                                left + len(text) * em * 0.5 * scale, top], fill=(190, 190, 190))
+
+            try:
+                page.extract_text(visitor_text=text_run)
+            except Exception:
+                pass
+        ImageDraw.Draw(canvas).rectangle([0, 0, canvas.width - 1, canvas.height - 1], outline=(160, 160, 160))
+    output = io.BytesIO()
+    canvas.save(output, "PNG", optimize=True)
+    return output.getvalue()
+
+
+def _largest_image(page):
+    try:
+        images = page.images
+        best = max(images, key=lambda i: i.image.width * i.image.height, default=None)
+    except Exception:
+        return None
+    return best.image if best is not None else None
+
+
+def _render_job(pdf_path, page_index, size):
+    try:
+        return render_thumbnail(pdf_path, page_index, size), None
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
+
+class ThumbnailService:
+    """Renders thumbnails off the UI thread and caches them in memory and on disk.
+
+    get() never blocks: it returns the thumbnail if it is in memory and
+    otherwise schedules loading it from the disk cache or rendering it on
+    a pool of max_workers processes, then calls callback(path, page, png)
+    from a background thread (png is None if the page cannot be rendered). The
+    most recently requested thumbnails, usually the visible rows, are
+    rendered first; requests beyond max_pending are dropped oldest first.
+    """
+
+    def __init__(self, cache=None, size=DEFAULT_THUMBNAIL_SIZE, max_workers=2, memory_entries=512,
+                 max_pending=256):
+        self.cache = cache if cache is not None else ThumbnailCache()
+        self.size = size
+        self.max_workers = max_workers
+        self.memory_entries = memory_entries
+        self.max_pending = max_pending
+        self._memory = OrderedDict()     # (path, page) -> PNG bytes
+        self._pending = deque()          # (path, page, callback), newest last
+        self._in_flight = set()
+        self._running = 0
+        self._executor = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def get(self, pdf_path, page_index=0, callback=None):
+        """Return the PNG bytes of a thumbnail if ready, else None and render it in the background"""
+        request = (pdf_path, page_index)
+        with self._lock:
+            png = self._memory.get(request)
+            if png is not None:
+                self._memory.move_to_end(request)
+                return png
+            if request not in self._in_flight and not self._closed:
+                self._in_flight.add(request)
+                self._pending.append((pdf_path, page_index, callback))
+                while len(self._pending) > self.max_pending:
+                    old_path, old_page, _ = self._pending.popleft()
+                    self._in_flight.discard((old_path, old_page))
+        self._schedule()
+        return None
+
+    def close(self):
+        """Drop pending requests and stop the workers"""
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule(self):
+        with self._lock:
+            if self._closed or not self._pending or self._running >= self.max_workers:
+                return
+            self._running += 1
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            executor = self._executor
+        threading.Thread(target=self._work, args=(executor,), name="vpdf-thumbnails", daemon=True).start()
+
+    def _work(self, executor):
+        # One dispatcher thread per render process, each taking the newest request
+        while True:
+            with self._lock:
+                if self._closed or not self._pending:
+                    self._running -= 1
+                    return
+                pdf_path, page_index, callback = self._pending.pop()
+            png = None
+            try:
+                key = thumbnail_key(pdf_path, page_index, self.size)
+                png = self.cache.load(key)
+                if png is None:
+                    png, error = executor.submit(_render_job, pdf_path, page_index, self.size).result()
+                    if png is not None:
+                        self.cache.insert_bytes(key, png)
+            except Exception:
+                # Missing file or the pool was shut down
+                pass
+            self._finish(pdf_path, page_index, png, callback)
+
+    def _finish(self, pdf_path, page_index, png, callback):
+        request = (pdf_path, page_index)
+        with self._lock:
+            self._in_flight.discard(request)
+            if png is not None:
+                self._memory[request] = png
+                while len(self._memory) > self.memory_entries:
+                    self._memory.popitem(last=False)
+        if callback is not None:
+            callback(pdf_path, page_index, png)
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullTracer:
+    """Tracer used when tracing is off: every call is a no-op"""
+
+    enabled = False
+
+    def span(self, name, **args):
+        return _NULL_SPAN
+
+    def add_span(self, name, start, seconds, **args):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start", "started")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.add_span(self.name, self.start, time.perf_counter() - self.started, **self.args)
+        return False
+
+
+class Tracer:
+    """Collects named spans and counters of a convert or merge job.
+
+    Spans use wall-clock start times, so spans measured in conversion
+    worker processes line up with the ones of the merging process.
+    on_span, if given, is called with (name, seconds) after every span,
+    e.g. to show a live breakdown. With keep_events=False only the totals
+    per span name are kept, so memory does not grow with the pages of a
+    long job; there are then no events to export.
+    """
+
+    enabled = True
+
+    def __init__(self, on_span=None, keep_events=True):
+        self.on_span = on_span
+        self.keep_events = keep_events
+        self.events = []
+        self.counters = defaultdict(int)
+        self._totals = defaultdict(float)
+        self._calls = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def span(self, name, **args):
+        """Context manager timing the enclosed block as span name"""
+        return _Span(self, name, args)
+
+    def add_span(self, name, start, seconds, pid=None, tid=None, **args):
+        """Record a span measured elsewhere (start is a time.time() value)"""
+        if self.keep_events:
+            event = {
+                "name": name, "ph": "X", "ts": int(start * 1e6), "dur": int(seconds * 1e6),
+                "pid": pid or os.getpid(), "tid": tid or threading.get_ident(),
+            }
+            if args:
+                event["args"] = args
+        with self._lock:
+            if self.keep_events:
+                self.events.append(event)
+            self._totals[name] += seconds
+            self._calls[name] += 1
+        if self.on_span is not None:
+            self.on_span(name, seconds)
+
+    def count(self, name, value=1):
+        """Add value to counter name"""
+        with self._lock:
+            self.counters[name] += value
+
+    def summary(self):
+        """Return {span name: (calls, total seconds)} in order of first appearance"""
+        with self._lock:
+            return {name: (self._calls[name], total) for name, total in self._totals.items()}
+
+    def format_summary(self):
+        """One line per span name and counter, for logs and status labels"""
+        lines = [f"{name}: {total:.2f} s ({calls}x)" for name, (calls, total) in self.summary().items()]
+        lines += [f"{name}: {value}" for name, value in sorted(self.counters.items())]
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path):
+        """Write the spans and counters as a Chrome/Perfetto trace JSON file"""
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        if events:
+            end = max(e["ts"] + e["dur"] for e in events)
+            events.append({"name": "counters", "ph": "C", "ts": end, "pid": os.getpid(), "args": counters})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
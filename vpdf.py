@@ -0,0 +1,357 @@
+"""VPDF command line: convert and merge documents without any GUI toolkit.
+
+    python vpdf.py convert letter.docx terms.docx -d out/
+    python vpdf.py merge cover.docx contract.pdf annex.pdf -o merged.pdf
+    python vpdf.py merge cover.docx contract.pdf:1-3,-1 -o signatures.pdf
+    python vpdf.py check cover.docx contract.pdf:1-3,-1 annex.pdf
+    python vpdf.py batch incoming/ -d converted/ --recursive
+    python vpdf.py run contracts.json --merge-workers 4
+    python vpdf.py watch scans/ -d merged/ --archive scans/done
+    python vpdf.py serve --port 8765
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import sys
+import time
+
+import batch_manifest
+import converter_logic
+import job_service
+import preflight
+import watch_folder
+from cancellation import CancelToken
+from linearize import UNAVAILABLE_MESSAGE, linearize_available
+from merge_checkpoint import partial_directory
+from output_profiles import PROFILES
+from page_ranges import PageRangeError, parse_page_ranges
+from progress import format_progress
+from tracing import Tracer
+
+
+def _add_common_options(parser):
+    parser.add_argument("--backend", default=os.environ.get("VPDF_CONVERTER", "word"),
+                        choices=sorted(converter_logic.BACKENDS),
+                        help="DOCX converter backend (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parallel conversion processes")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not use the conversion cache")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="seconds a single conversion may take (default: %d, 0 disables)"
+                        % converter_logic.DEFAULT_CONVERT_TIMEOUT)
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write a Chrome/Perfetto trace of the job to FILE and print a stage breakdown")
+
+
+def _cancel_on_interrupt():
+    """CancelToken cancelled by the first Ctrl+C; a second one interrupts at once"""
+    token = CancelToken()
+
+    def interrupt(signum, frame):
+        if token.cancelled:
+            raise KeyboardInterrupt
+        print("\nCancelling...", file=sys.stderr)
+        token.cancel()
+
+    signal.signal(signal.SIGINT, interrupt)
+    return token
+
+
+def _tracer(args):
+    return Tracer() if args.trace else None
+
+
+def _finish_trace(args, tracer):
+    if tracer is None:
+        return
+    tracer.export_chrome_trace(args.trace)
+    print(tracer.format_summary(), file=sys.stderr)
+    print(f"Trace written to {args.trace}", file=sys.stderr)
+
+
+def _print_results(results):
+    failed = 0
+    for result in results:
+        if result.error:
+            failed += 1
+            print(f"FAILED {result.input_path}: {result.error}", file=sys.stderr)
+        else:
+            print(f"{result.input_path} -> {result.output_path}")
+    return 1 if failed else 0
+
+
+def cmd_convert(args):
+    jobs = []
+    for input_path in args.inputs:
+        output_dir = args.output_dir or os.path.dirname(os.path.abspath(input_path))
+        base = os.path.splitext(os.path.basename(input_path))[0]
+        jobs.append((input_path, os.path.join(output_dir, base + ".pdf")))
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    tracer = _tracer(args)
+    results = converter_logic.convert_many(jobs, args.workers, use_cache=not args.no_cache, tracer=tracer,
+                                           timeout=args.timeout, cancel=_cancel_on_interrupt())
+    _finish_trace(args, tracer)
+    return _print_results(results)
+
+
+def _show_progress(update):
+    end = "\n" if update.phase == "done" else ""
+    print(f"\r{format_progress(update):<80}", end=end, file=sys.stderr, flush=True)
+
+
+def _split_input(arg):
+    """Split "contract.pdf:1-3,-1" into the path and its page ranges (None if there are none)"""
+    path, sep, ranges = arg.rpartition(":")
+    # A colon of a drive letter or in a file name is not followed by a valid spec
+    if not sep or os.path.exists(arg):
+        return arg, None
+    try:
+        parse_page_ranges(ranges)
+    except PageRangeError:
+        return arg, None
+    return path, ranges
+
+
+def cmd_merge(args):
+    if args.linearize and not linearize_available():
+        print(UNAVAILABLE_MESSAGE, file=sys.stderr)
+        return 1
+    tracer = _tracer(args)
+    inputs, page_ranges = zip(*map(_split_input, args.inputs))
+    success, message = converter_logic.process_and_merge_mixed_files(
+        list(inputs), args.output,
+        progress_callback=_show_progress if args.progress else None,
+        memory_budget=args.memory_budget * 1024 * 1024,
+        max_workers=args.workers,
+        use_cache=not args.no_cache,
+        dedup=args.dedup,
+        profile=args.profile,
+        linearize=args.linearize,
+        tracer=tracer,
+        convert_timeout=args.timeout,
+        cancel=_cancel_on_interrupt(),
+        page_ranges=page_ranges,
+        resumable=args.resume,
+        preflight=not args.no_preflight,
+    )
+    _finish_trace(args, tracer)
+    print(message, file=sys.stdout if success else sys.stderr)
+    if not success and args.resume and os.path.isdir(partial_directory(args.output)):
+        print(f"Partial merge kept in {partial_directory(args.output)}, "
+              f"run the same command again to resume or delete it", file=sys.stderr)
+    return 0 if success else 1
+
+
+def cmd_check(args):
+    inputs, page_ranges = zip(*map(_split_input, args.inputs))
+    reports = preflight.run_preflight(inputs, page_ranges, args.workers, _cancel_on_interrupt())
+    if args.json:
+        print(json.dumps([dict(report._asdict(), ok=report.ok) for report in reports], indent=2))
+    else:
+        print(preflight.format_report(reports, show_ok=True))
+    return 0 if all(report.ok for report in reports) else 1
+
+
+def cmd_batch(args):
+    jobs = []
+    for dirpath, dirnames, filenames in os.walk(args.source_dir):
+        for name in sorted(filenames):
+            if not name.lower().endswith(".docx") or name.startswith("~$"):
+                continue
+            relative_dir = os.path.relpath(dirpath, args.source_dir)
+            output_dir = os.path.normpath(os.path.join(args.output_dir or args.source_dir, relative_dir))
+            os.makedirs(output_dir, exist_ok=True)
+            jobs.append((os.path.join(dirpath, name),
+                         os.path.join(output_dir, os.path.splitext(name)[0] + ".pdf")))
+        if not args.recursive:
+            break
+        dirnames.sort()
+    if not jobs:
+        print(f"No DOCX files found in {args.source_dir}", file=sys.stderr)
+        return 1
+    tracer = _tracer(args)
+    results = converter_logic.convert_many(jobs, args.workers, use_cache=not args.no_cache, tracer=tracer,
+                                           timeout=args.timeout, cancel=_cancel_on_interrupt())
+    _finish_trace(args, tracer)
+    return _print_results(results)
+
+
+def cmd_run(args):
+    try:
+        outputs = batch_manifest.load_manifest(args.manifest)
+    except batch_manifest.ManifestError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if any(output.options["linearize"] for output in outputs) and not linearize_available():
+        print(UNAVAILABLE_MESSAGE, file=sys.stderr)
+        return 1
+
+    def report(result):
+        if result.error:
+            print(f"FAILED {result.output_path}: {result.error}", file=sys.stderr)
+        else:
+            print(f"{result.output_path}: {result.pages} pages")
+
+    tracer = _tracer(args)
+    results = batch_manifest.run_manifest(outputs, args.workers, args.merge_workers, use_cache=not args.no_cache,
+                                          memory_budget=args.memory_budget * 1024 * 1024, tracer=tracer,
+                                          timeout=args.timeout, cancel=_cancel_on_interrupt(), on_result=report)
+    _finish_trace(args, tracer)
+    uses = sum(r.reader_uses for r in results)
+    opened = sum(r.readers_opened for r in results)
+    failed = sum(1 for r in results if r.error)
+    print(f"{len(results) - failed} of {len(results)} outputs written, {opened} inputs parsed for {uses} uses",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_watch(args):
+    output_dir = os.path.abspath(args.output_dir)
+    try:
+        rules = [watch_folder.WatchRule(folder, output_dir, args.mode, args.group_pattern, args.settle,
+                                        args.quiet if args.mode == "merge" else 0, args.max_files, args.archive)
+                 for folder in args.folders]
+    except (ValueError, re.error) as e:
+        print(e, file=sys.stderr)
+        return 1
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = args.state or os.path.join(output_dir, ".vpdf-watch.json")
+    daemon = watch_folder.WatchDaemon(rules, state_path, args.max_batches, args.poll, args.interval,
+                                      use_cache=not args.no_cache, convert_timeout=args.timeout,
+                                      on_event=lambda message: print(f"{time.strftime('%H:%M:%S')} {message}",
+                                                                     flush=True))
+    daemon.run(_cancel_on_interrupt())
+    return 0
+
+
+def cmd_serve(args):
+    def ready(address):
+        print(f"Serving on http://{address[0]}:{address[1]}/ (Ctrl+C to stop)", flush=True)
+
+    job_service.run_service(args.host, args.port, _cancel_on_interrupt(), args.work_dir, on_ready=ready,
+                            workers=args.jobs, max_queue=args.max_queue,
+                            max_upload_bytes=args.max_upload * 1024 * 1024, result_ttl=args.result_ttl,
+                            use_cache=not args.no_cache, convert_timeout=args.timeout)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="vpdf", description="Convert DOCX files to PDF and merge PDFs.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="convert DOCX files to PDF")
+    convert.add_argument("inputs", nargs="+", help="DOCX files")
+    convert.add_argument("-d", "--output-dir", help="directory for the PDFs (default: next to each input)")
+    _add_common_options(convert)
+    convert.set_defaults(func=cmd_convert)
+
+    merge = subparsers.add_parser("merge", help="merge DOCX and PDF files, in order, into one PDF")
+    merge.add_argument("inputs", nargs="+", metavar="input[:pages]",
+                       help="DOCX or PDF file, optionally with the pages to take, e.g. contract.pdf:1-3,10,-1")
+    merge.add_argument("-o", "--output", required=True, help="merged PDF")
+    merge.add_argument("--memory-budget", type=int, default=converter_logic.DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                       help="MB of source objects cached per input (default: %(default)s)")
+    merge.add_argument("--dedup", action="store_true",
+                       help="share identical fonts, images and other streams across inputs")
+    merge.add_argument("--profile", choices=sorted(PROFILES), default=None,
+                       help="output optimisation profile (default: copy streams unchanged)")
+    merge.add_argument("--linearize", action="store_true",
+                       help="write a linearized (fast web view) PDF; needs pikepdf or the qpdf command")
+    merge.add_argument("--progress", action="store_true",
+                       help="show progress, throughput and time left on stderr")
+    merge.add_argument("--resume", action="store_true",
+                       help="checkpoint between inputs every few seconds, so an interrupted merge "
+                            "continues when run again")
+    merge.add_argument("--no-preflight", action="store_true",
+                       help="do not check the inputs for damage before converting and merging")
+    _add_common_options(merge)
+    merge.set_defaults(func=cmd_merge)
+
+    check = subparsers.add_parser("check", help="check DOCX and PDF files for damage, encryption or truncation")
+    check.add_argument("inputs", nargs="+", metavar="input[:pages]",
+                       help="DOCX or PDF file, optionally with the pages to take, e.g. contract.pdf:1-3,10,-1")
+    check.add_argument("--workers", type=int, default=None, help="parallel check processes (default: one per CPU)")
+    check.add_argument("--json", action="store_true", help="print the report as JSON")
+    # Nothing is converted, the backend is only needed by main()
+    check.set_defaults(func=cmd_check, backend=os.environ.get("VPDF_CONVERTER", "word"))
+
+    batch = subparsers.add_parser("batch", help="convert every DOCX file in a folder")
+    batch.add_argument("source_dir", help="folder with DOCX files")
+    batch.add_argument("-d", "--output-dir", help="folder for the PDFs (default: source_dir)")
+    batch.add_argument("-r", "--recursive", action="store_true", help="include subfolders")
+    _add_common_options(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    run = subparsers.add_parser("run", help="build the merged outputs described by a JSON manifest")
+    run.add_argument("manifest", help="JSON manifest, see batch_manifest")
+    run.add_argument("--merge-workers", type=int, default=None,
+                     help="outputs merged in parallel (default: up to 4)")
+    run.add_argument("--memory-budget", type=int, default=converter_logic.DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                     help="MB of source objects cached per input (default: %(default)s)")
+    _add_common_options(run)
+    run.set_defaults(func=cmd_run)
+
+    watch = subparsers.add_parser("watch", help="convert or merge files as they are dropped into folders")
+    watch.add_argument("folders", nargs="+", help="folders to watch")
+    watch.add_argument("-d", "--output-dir", required=True, help="folder for the results")
+    watch.add_argument("--mode", choices=("merge", "convert"), default="merge",
+                       help="merge each group of files, or convert every DOCX (default: %(default)s)")
+    watch.add_argument("--group-pattern", default=watch_folder.DEFAULT_GROUP_PATTERN,
+                       help="regular expression whose first group names the merge group (default: prefix up to _, - "
+                            "or space)")
+    watch.add_argument("--settle", type=float, default=2.0,
+                       help="seconds a file must stay unchanged before it is taken (default: %(default)s)")
+    watch.add_argument("--quiet", type=float, default=10.0,
+                       help="seconds without new files before a group is merged (default: %(default)s)")
+    watch.add_argument("--max-files", type=int, default=None, help="merge a group as soon as it has this many files")
+    watch.add_argument("--max-batches", type=int, default=2, help="batches processed at once (default: %(default)s)")
+    watch.add_argument("--archive", metavar="DIR", help="move processed input files to DIR")
+    watch.add_argument("--state", metavar="FILE",
+                       help="state file (default: .vpdf-watch.json in the output folder)")
+    watch.add_argument("--poll", action="store_true", help="poll the folders instead of using inotify")
+    watch.add_argument("--interval", type=float, default=1.0, help="polling interval in seconds (default: %(default)s)")
+    # A daemon has no use for --workers and --trace of the one-shot commands
+    watch.add_argument("--backend", default=os.environ.get("VPDF_CONVERTER", "word"),
+                       choices=sorted(converter_logic.BACKENDS), help="DOCX converter backend (default: %(default)s)")
+    watch.add_argument("--no-cache", action="store_true", help="do not use the conversion cache")
+    watch.add_argument("--timeout", type=float, default=None,
+                       help="seconds a single conversion may take (default: %d, 0 disables)"
+                       % converter_logic.DEFAULT_CONVERT_TIMEOUT)
+    watch.set_defaults(func=cmd_watch)
+
+    serve = subparsers.add_parser("serve", help="accept convert and merge jobs over HTTP on this machine")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    serve.add_argument("--port", type=int, default=job_service.DEFAULT_PORT, help="port (default: %(default)s)")
+    serve.add_argument("--jobs", type=int, default=2, help="jobs run at once (default: %(default)s)")
+    serve.add_argument("--max-queue", type=int, default=16,
+                       help="jobs allowed to wait; more are refused with 503 (default: %(default)s)")
+    serve.add_argument("--max-upload", type=int, default=job_service.DEFAULT_MAX_UPLOAD_BYTES // (1024 * 1024),
+                       help="largest upload in MB (default: %(default)s)")
+    serve.add_argument("--result-ttl", type=float, default=3600,
+                       help="seconds finished jobs and uploads are kept (default: %(default)s)")
+    serve.add_argument("--work-dir", help="folder for uploads and results (default: a temporary folder)")
+    serve.add_argument("--backend", default=os.environ.get("VPDF_CONVERTER", "word"),
+                       choices=sorted(converter_logic.BACKENDS), help="DOCX converter backend (default: %(default)s)")
+    serve.add_argument("--no-cache", action="store_true", help="do not use the conversion cache")
+    serve.add_argument("--timeout", type=float, default=None,
+                       help="seconds a single conversion may take (default: %d, 0 disables)"
+                       % converter_logic.DEFAULT_CONVERT_TIMEOUT)
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    converter_logic.configure_converter(args.backend, size=1)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    # Needed for the conversion process pool in frozen (PyInstaller) builds
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
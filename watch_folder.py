@@ -0,0 +1,465 @@
+"""Headless watch-folder ingestion: convert or merge documents as they are dropped into folders.
+
+Files are picked up once they stop changing (settle seconds), grouped by
+their rule (for merges: by file name prefix, so ACME_001.pdf, ACME_002.pdf
+and ACME_cover.docx become ACME.pdf) and a group is processed once no file
+has joined it for quiet seconds. Batches run through converter_logic on at
+most max_batches threads.
+
+Every state change is written to a JSON state file before it takes effect,
+so after a restart queued and interrupted batches run again with the same
+output names and files already processed are not picked up again. An
+interrupted merge continues from its checkpoint; the checkpoint of a
+batch that failed is removed.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import re
+import select
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import converter_logic
+from merge_checkpoint import discard_partial
+
+WATCHED_EXTENSIONS = (".docx", ".pdf")
+
+# Default group of a merge rule: the file name up to the first "_", "-" or space
+DEFAULT_GROUP_PATTERN = r"^(.+?)[_\- ]"
+
+# Seconds between full rescans when inotify events are available (catches anything missed)
+RESCAN_INTERVAL = 30.0
+
+_IN_MODIFY = 0x2
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_Q_OVERFLOW = 0x4000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class WatchRule:
+    """What to do with the files dropped into one folder.
+
+    mode "merge" merges each group into output_dir/<group>.pdf, where the
+    group is the first capture of group_pattern in the file name (files
+    that do not match form a group of their own). mode "convert" converts
+    every DOCX to output_dir/<name>.pdf and ignores PDFs. Processed files
+    are moved to archive_dir if given.
+    """
+
+    def __init__(self, folder, output_dir, mode="merge", group_pattern=DEFAULT_GROUP_PATTERN, settle=2.0,
+                 quiet=10.0, max_files=None, archive_dir=None):
+        if mode not in ("merge", "convert"):
+            raise ValueError(f"Unknown watch mode {mode}")
+        self.folder = os.path.abspath(folder)
+        self.output_dir = os.path.abspath(output_dir)
+        if self.output_dir == self.folder:
+            # The outputs would be picked up as new arrivals
+            raise ValueError("The output folder must differ from the watched folder")
+        self.mode = mode
+        self.group_pattern = re.compile(group_pattern)
+        self.settle = settle
+        self.quiet = quiet
+        self.max_files = max_files
+        self.archive_dir = os.path.abspath(archive_dir) if archive_dir else None
+
+    def accepts(self, name):
+        lower = name.lower()
+        if name.startswith(("~$", ".")) or not lower.endswith(WATCHED_EXTENSIONS):
+            # Office lock files, hidden and partial files
+            return False
+        return self.mode == "merge" or lower.endswith(".docx")
+
+    def group_of(self, name):
+        if self.mode == "convert":
+            return name
+        match = self.group_pattern.search(name)
+        return match.group(1) if match else os.path.splitext(name)[0]
+
+
+class InotifyWatcher:
+    """Changed file paths from Linux inotify, read through ctypes"""
+
+    def __init__(self, folders):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._folders = {}
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        for folder in folders:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), mask)
+            if wd < 0:
+                error = ctypes.get_errno()
+                self.close()
+                raise OSError(error, f"Cannot watch {folder}")
+            self._folders[wd] = folder
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds; return the changed paths, or None if events were lost"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        paths = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                return None
+            if name and wd in self._folders:
+                paths.add(os.path.join(self._folders[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """Fallback for systems without inotify (Windows, network shares): every poll is a rescan"""
+
+    def __init__(self, folders, interval=1.0):
+        self.interval = interval
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        return None
+
+    def close(self):
+        pass
+
+
+def open_watcher(folders, polling=False, interval=1.0):
+    """Return an InotifyWatcher for folders, or a PollingWatcher if inotify is unavailable"""
+    if not polling:
+        try:
+            return InotifyWatcher(folders)
+        except (OSError, AttributeError, TypeError):
+            pass
+    return PollingWatcher(folders, interval)
+
+
+class WatchState:
+    """Persistent record of the files and batches of a watch daemon.
+
+    files maps a path to its status ("pending", "batched", "done" or
+    "failed") with the size and mtime it had, so a file replaced by a new
+    one with the same name is processed again. batches maps a batch id to
+    its rule, files and output name.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.batches = {}
+        self.next_batch = 1
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.batches = data.get("batches", {})
+            self.next_batch = data.get("next_batch", 1)
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        data = {"files": self.files, "batches": self.batches, "next_batch": self.next_batch}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+def _identity(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _unique_path(path, taken):
+    base, ext = os.path.splitext(path)
+    number = 1
+    while path in taken or os.path.exists(path):
+        number += 1
+        path = f"{base} ({number}){ext}"
+    return path
+
+
+class WatchDaemon:
+    """Watch the folders of rules and process what arrives, see the module docstring.
+
+    on_event, if given, is called with a line of text for every batch
+    started or finished. run() blocks until the CancelToken is cancelled;
+    step() does one round of work and is what run() repeats.
+    """
+
+    def __init__(self, rules, state_path, max_batches=2, polling=False, poll_interval=1.0, use_cache=True,
+                 convert_timeout=None, on_event=None):
+        self.rules = list(rules)
+        self.use_cache = use_cache
+        self.convert_timeout = convert_timeout
+        self.state = WatchState(state_path)
+        self.max_batches = max(1, max_batches)
+        self.polling = polling
+        self.poll_interval = poll_interval
+        self.on_event = on_event
+        self._settling = {}   # path -> (identity, time it was first seen with it)
+        self._arrivals = {}   # (rule index, group) -> time the last file joined
+        self._running = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_batches, thread_name_prefix="vpdf-watch")
+        self._cancel = None
+        self._watcher = None
+        self._last_scan = 0.0
+        self._drop_stale_state()
+        # Batches in the state (queued or interrupted) are dispatched again by step();
+        # pending groups get a fresh quiet period
+        for record in self.state.files.values():
+            if record["status"] == "pending":
+                key = (record["rule"], record["group"])
+                self._arrivals[key] = time.monotonic()
+
+    def _drop_stale_state(self):
+        """Forget batches and pending files recorded under rules that changed since the state was saved.
+
+        Their files are picked up again by the next scan and grouped by the current rules.
+        """
+        def valid(index, paths):
+            return isinstance(index, int) and all(self._rule_of(path) == index for path in paths)
+
+        stale = [batch_id for batch_id, batch in self.state.batches.items()
+                 if not valid(batch.get("rule"), batch.get("files", ()))]
+        for batch_id in stale:
+            batch = self.state.batches.pop(batch_id)
+            for path in batch.get("files", ()):
+                self.state.files.pop(path, None)
+        forgotten = [path for path, record in self.state.files.items()
+                     if record.get("status") in ("pending", "batched") and not valid(record.get("rule"), [path])]
+        for path in forgotten:
+            del self.state.files[path]
+        if stale or forgotten:
+            self.state.save()
+
+    def run(self, cancel):
+        self._cancel = cancel
+        self._watcher = open_watcher([rule.folder for rule in self.rules], self.polling, self.poll_interval)
+        self._event(f"Watching {', '.join(rule.folder for rule in self.rules)} "
+                    f"({'polling' if isinstance(self._watcher, PollingWatcher) else 'inotify'})")
+        try:
+            while not cancel.cancelled:
+                self.step(self._watcher.poll(min(self.poll_interval, 0.5)))
+        finally:
+            self._watcher.close()
+            self._executor.shutdown(wait=True)
+
+    def step(self, changed=None):
+        """Look at the changed paths (None: rescan every folder), then batch and dispatch"""
+        now = time.monotonic()
+        rescan = changed is None or now - self._last_scan >= RESCAN_INTERVAL
+        if rescan:
+            changed = set(changed or ()) | set(self._scan())
+            self._last_scan = now
+        with self._lock:
+            if rescan:
+                self._forget_missing()
+            for path in changed:
+                self._saw(path, now)
+            self._settle(now)
+            self._close_groups(now)
+        self._dispatch()
+
+    def _scan(self):
+        for rule in self.rules:
+            try:
+                names = os.listdir(rule.folder)
+            except OSError:
+                continue
+            for name in names:
+                yield os.path.join(rule.folder, name)
+        # Files still settling are watched by polling their size and mtime
+        yield from list(self._settling)
+
+    def _forget_missing(self):
+        missing = [path for path, record in self.state.files.items()
+                   if record["status"] in ("done", "failed") and not os.path.exists(path)]
+        for path in missing:
+            del self.state.files[path]
+        if missing:
+            self.state.save()
+
+    def _rule_of(self, path):
+        folder, name = os.path.split(path)
+        for index, rule in enumerate(self.rules):
+            if rule.folder == folder and rule.accepts(name):
+                return index
+        return None
+
+    def _saw(self, path, now):
+        if self._rule_of(path) is None:
+            return
+        identity = _identity(path)
+        record = self.state.files.get(path)
+        if identity is None:
+            self._settling.pop(path, None)
+            return
+        if record is not None and (record["identity"] == identity or record["status"] in ("pending", "batched")):
+            return
+        settling = self._settling.get(path)
+        if settling is None or settling[0] != identity:
+            # New or still being written: (re)start its quiet period
+            self._settling[path] = (identity, now)
+
+    def _settle(self, now):
+        changed = False
+        for path, (identity, since) in list(self._settling.items()):
+            index = self._rule_of(path)
+            rule = self.rules[index]
+            if now - since < rule.settle:
+                continue
+            current = _identity(path)
+            if current is None:
+                del self._settling[path]
+                continue
+            if current != identity or not _readable(path):
+                self._settling[path] = (current, now)
+                continue
+            del self._settling[path]
+            group = rule.group_of(os.path.basename(path))
+            self.state.files[path] = {"status": "pending", "identity": identity, "rule": index, "group": group}
+            self._arrivals[(index, group)] = now
+            changed = True
+        if changed:
+            self.state.save()
+
+    def _close_groups(self, now):
+        groups = {}
+        for path, record in self.state.files.items():
+            if record["status"] == "pending":
+                groups.setdefault((record["rule"], record["group"]), []).append(path)
+        changed = False
+        for (index, group), paths in groups.items():
+            rule = self.rules[index]
+            full = rule.max_files is not None and len(paths) >= rule.max_files
+            if not full and now - self._arrivals.get((index, group), now) < rule.quiet:
+                continue
+            pending = sorted(paths, key=lambda p: os.path.basename(p).lower())
+            paths = pending[:rule.max_files]
+            taken = {batch["output"] for batch in self.state.batches.values()}
+            if rule.mode == "merge":
+                output = _unique_path(os.path.join(rule.output_dir, group + ".pdf"), taken)
+            else:
+                output = _unique_path(os.path.join(rule.output_dir, os.path.splitext(group)[0] + ".pdf"), taken)
+            batch_id = str(self.state.next_batch)
+            self.state.next_batch += 1
+            self.state.batches[batch_id] = {"rule": index, "group": group, "files": paths, "output": output}
+            for path in paths:
+                self.state.files[path]["status"] = "batched"
+            if len(pending) > len(paths):
+                # The rest has been quiet as long as these files, it goes in the next batch
+                self._arrivals.setdefault((index, group), now)
+            else:
+                self._arrivals.pop((index, group), None)
+            changed = True
+        if changed:
+            self.state.save()
+
+    def _dispatch(self):
+        with self._lock:
+            waiting = [b for b in sorted(self.state.batches, key=int) if b not in self._running]
+            for batch_id in waiting[:self.max_batches - len(self._running)]:
+                self._running.add(batch_id)
+                self._executor.submit(self._run_batch, batch_id)
+
+    def _run_batch(self, batch_id):
+        try:
+            self._process_batch(batch_id)
+        finally:
+            # Whatever happened, the batch may be dispatched again (if it is still in the state)
+            with self._lock:
+                self._running.discard(batch_id)
+
+    def _process_batch(self, batch_id):
+        with self._lock:
+            batch = dict(self.state.batches[batch_id])
+        rule = self.rules[batch["rule"]]
+        files = [path for path in batch["files"] if os.path.exists(path)]
+        self._event(f"Batch {batch_id}: {len(files)} file(s) -> {batch['output']}")
+        try:
+            os.makedirs(rule.output_dir, exist_ok=True)
+            if not files:
+                success, message = False, "Input files disappeared"
+            elif rule.mode == "merge":
+                success, message = converter_logic.process_and_merge_mixed_files(
+                    files, batch["output"], use_cache=self.use_cache, convert_timeout=self.convert_timeout,
+                    cancel=self._cancel, resumable=True)
+            else:
+                result = converter_logic.convert_many([(files[0], batch["output"])], 1, use_cache=self.use_cache,
+                                                      timeout=self.convert_timeout, cancel=self._cancel)[0]
+                success, message = not result.error, result.error or batch["output"]
+        except Exception as e:
+            success, message = False, str(e)
+        if not success and self._cancel is not None and self._cancel.cancelled:
+            # Stopped, not failed: the batch stays queued for the next start
+            return
+        if not success and rule.mode == "merge":
+            # A failed batch is not run again, its checkpoint would only take up space
+            discard_partial(batch["output"])
+        self._event(f"Batch {batch_id} {'done' if success else 'FAILED'}: {message}")
+        with self._lock:
+            del self.state.batches[batch_id]
+            for path in batch["files"]:
+                record = self.state.files.get(path)
+                if record is None:
+                    continue
+                record["status"] = "done" if success else "failed"
+                archived = rule.archive_dir and success and _archive(path, rule.archive_dir)
+                if archived or not os.path.exists(path):
+                    del self.state.files[path]
+            self.state.save()
+
+    def _event(self, message):
+        if self.on_event is not None:
+            self.on_event(message)
+
+
+def _readable(path):
+    # Windows refuses to open a file another process is still writing
+    try:
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+
+def _archive(path, archive_dir):
+    try:
+        os.makedirs(archive_dir, exist_ok=True)
+        shutil.move(path, _unique_path(os.path.join(archive_dir, os.path.basename(path)), ()))
+        return True
+    except OSError:
+        return False